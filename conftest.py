@@ -0,0 +1 @@
+# Lets the tests import the protocol_* modules from the repository root
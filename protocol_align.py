@@ -0,0 +1,189 @@
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from protocol_journal import read_journal
+
+# Recorder table, one row per device per session (a spreadsheet export works):
+#   session_id  which session the recording belongs to
+#   device      e.g. gopro_blue, gopro_green, equivital, labchart
+#   kind        video (indexes are frames) or samples
+#   start       recorder clock at frame/sample 0, ISO time; without an offset it is local time
+#   rate        fps or sample rate (Hz); 59.94 is fine
+#   offset_ms   measured recorder clock minus log clock (positive: recorder runs ahead)
+#   length_s    optional recording length; events after it are flagged
+RECORDER_COLUMNS = ["session_id", "device", "kind", "start", "rate", "offset_ms", "length_s"]
+ALIGN_COLUMNS = ["Session", "Seq", "Event", "Wall Clock", "Device", "Kind", "Seconds", "Index", "Status"]
+KINDS = ("video", "samples")
+
+
+# --- INPUTS ---
+def load_recorders(path):
+    if path.endswith((".yaml", ".yml")):
+        import yaml
+        with open(path, encoding="utf-8") as fh:
+            df = pd.DataFrame.from_records(yaml.safe_load(fh))
+    else:
+        df = pd.read_csv(path, dtype={"session_id": "string", "device": "string"})
+    return check_recorders(df, path)
+
+def check_recorders(df, where="recorders"):
+    missing = [c for c in ("session_id", "device", "start", "rate") if c not in df.columns]
+    if missing:
+        raise ValueError(f"{where}: missing column(s) {', '.join(missing)}")
+    df = df.reindex(columns=RECORDER_COLUMNS).copy()
+    df["session_id"] = df["session_id"].astype("string")
+    df["kind"] = df["kind"].fillna("video")
+    bad = df.loc[~df["kind"].isin(KINDS), "kind"]
+    if len(bad):
+        raise ValueError(f"{where}: unknown kind '{bad.iloc[0]}' (use {', '.join(KINDS)})")
+    df["start"] = pd.DatetimeIndex([_utc(value) for value in df["start"]]).tz_localize(None)
+    df["rate"] = df["rate"].astype("float64")
+    if (df["rate"] <= 0).any():
+        raise ValueError(f"{where}: rate must be positive")
+    df["offset_ms"] = df["offset_ms"].fillna(0).astype("float64")
+    df["length_s"] = df["length_s"].astype("float64")
+    return df
+
+def _utc(value):
+    # Everything is compared in UTC; a naive start is local time on this machine (DST included)
+    stamp = pd.Timestamp(value)
+    if stamp.tzinfo is None:
+        stamp = pd.Timestamp(stamp.to_pydatetime().astimezone())
+    return stamp.tz_convert("UTC")
+
+def load_events(path):
+    # A journal or an exported session log; ids match protocol_catalog's, so
+    # an export is matched by the Session column it carries, not its file name
+    from protocol_catalog import export_session_id
+    if path.endswith(".jsonl"):
+        header, events, _ = read_journal(path)
+        session_id = header.get("session_id") or os.path.splitext(os.path.basename(path))[0]
+        df = pd.DataFrame.from_records(events, columns=["Seq", "Event", "Wall Clock"])
+        df.insert(0, "Session", session_id)
+        return df
+    try:
+        df = pd.read_csv(path, usecols=lambda c: c in ("Session", "Seq", "Event", "Wall Clock"),
+                         dtype={"Session": "string"})
+    except ValueError:  # not a CSV at all
+        return None
+    if not {"Seq", "Event", "Wall Clock"} <= set(df.columns):  # not a session log
+        return None
+    session = df.pop("Session") if "Session" in df else pd.Series(pd.NA, index=df.index, dtype="string")
+    df.insert(0, "Session", session.fillna(export_session_id({}, path)))
+    return df
+
+def events_from_catalog(catalog, session_ids=None):
+    # One query for the whole batch instead of re-reading every file
+    from protocol_catalog import connect
+    conn = connect(catalog)
+    sql = ("SELECT s.session_id AS Session, e.seq AS Seq, e.event AS Event, e.wall_clock AS 'Wall Clock' "
+           "FROM events e JOIN unique_sessions s USING (sid)")
+    params = ()
+    if session_ids is not None:
+        ids = sorted(set(session_ids))
+        sql += f" WHERE s.session_id IN ({','.join('?' * len(ids))})"
+        params = ids
+    df = pd.read_sql_query(sql + " ORDER BY s.session_id, e.seq", conn, params=params)
+    conn.close()
+    return df
+
+
+# --- ALIGNMENT ---
+# Every event is joined to every recorder of its session and the offsets are
+# computed column-wise in int64 nanoseconds, so the whole batch, all devices,
+# is one merge and a few array operations. Index is the frame (or sample)
+# being recorded when the event happened: floor(seconds * rate).
+def align(events, recorders):
+    events = events.copy()
+    events["Session"] = events["Session"].astype("string")
+    events["Wall Clock"] = pd.to_datetime(events["Wall Clock"], format="ISO8601", utc=True)
+    df = events.merge(recorders, left_on="Session", right_on="session_id", how="inner")
+
+    wall_ns = df["Wall Clock"].dt.tz_localize(None).to_numpy("datetime64[ns]").astype(np.int64)
+    start_ns = df["start"].to_numpy("datetime64[ns]").astype(np.int64)
+    offset_ns = np.rint(df["offset_ms"].to_numpy() * 1e6).astype(np.int64)
+    seconds = (wall_ns + offset_ns - start_ns) / 1e9
+    index = np.floor(seconds * df["rate"].to_numpy())
+
+    length = df["length_s"].to_numpy()
+    before = seconds < 0
+    after = ~np.isnan(length) & (seconds >= length)
+    status = np.select([before, after], ["before start", "after end"], "ok")
+    out = pd.DataFrame({
+        "Session": df["Session"],
+        "Seq": df["Seq"].astype("Int64"),
+        "Event": df["Event"].astype("string"),
+        "Wall Clock": df["Wall Clock"],
+        "Device": df["device"].astype("string"),
+        "Kind": df["kind"].astype("string"),
+        "Seconds": seconds.round(6),
+        "Index": pd.Series(index).where(~(before | after)).astype("Int64"),
+        "Status": status,
+    }, columns=ALIGN_COLUMNS)
+    return out.sort_values(["Session", "Device", "Seq"], kind="stable").reset_index(drop=True)
+
+def unmatched_sessions(events, recorders):
+    return sorted(set(events["Session"]) - set(recorders["session_id"].dropna()))
+
+
+# --- SIDECARS ---
+def write_table(df, path):
+    if path.endswith(".parquet"):
+        df.to_parquet(path, index=False)
+    else:
+        df.to_csv(path, index=False)
+
+def write_sidecars(aligned, directory, suffix=".csv"):
+    # One <session>.align<suffix> per session, next to where the clip tools look
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for session_id, frame in aligned.groupby("Session", sort=True):
+        path = os.path.join(directory, f"{session_id}.align{suffix}")
+        write_table(frame.drop(columns="Session"), path)
+        paths.append(path)
+    return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Map logged events to video frames and recorder samples")
+    parser.add_argument("recorders", help="Recorder table (.csv or .yaml): " + ", ".join(RECORDER_COLUMNS))
+    parser.add_argument("sources", nargs="*", help="Journals, session_logs CSVs, or directories of them")
+    parser.add_argument("--catalog", help="Read events from a protocol_catalog database instead of files")
+    parser.add_argument("--out", default="alignment", help="Directory for the per-session sidecar tables")
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv")
+    parser.add_argument("--combined", metavar="FILE", help="Also write every session into one table")
+    args = parser.parse_args(argv)
+    if bool(args.sources) == bool(args.catalog):
+        parser.error("give either event sources or --catalog")
+
+    recorders = load_recorders(args.recorders)
+    if args.catalog:
+        events = events_from_catalog(args.catalog, recorders["session_id"].dropna())
+    else:
+        from protocol_catalog import scan
+        # Other CSVs in the tree (the recorder table itself, reports) are skipped
+        frames = [frame for frame in map(load_events, scan(args.sources)) if frame is not None]
+        if not frames:
+            parser.error("no journals or CSV logs found")
+        # A journal and its own export list the same events once each
+        events = pd.concat(frames, ignore_index=True).drop_duplicates(["Session", "Seq"])
+
+    for session_id in unmatched_sessions(events, recorders):
+        print(f"No recorders listed for session {session_id}; skipped", file=sys.stderr)
+    aligned = align(events, recorders)
+    paths = write_sidecars(aligned, args.out, f".{args.format}")
+    late = aligned["Status"] != "ok"
+    print(f"{len(aligned)} event/device rows, {len(paths)} session(s) -> {args.out}"
+          + (f" ({int(late.sum())} outside their recording)" if late.any() else ""))
+    if args.combined:
+        write_table(aligned, args.combined)
+        print(f"Combined table -> {args.combined}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
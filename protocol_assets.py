@@ -0,0 +1,34 @@
+import json
+import mimetypes
+import os
+
+ASSET_DIR = os.environ.get(
+    "PROTOCOL_ASSETS", os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", "trainer"))
+
+
+# --- ASSET STORE ---
+# Local bundle described by manifest.json ({name: {"file", "caption"}}).
+# Every file is read into memory once when the store is built, so rendering
+# never touches the disk or the network; the apps keep a single store in
+# st.cache_resource.
+class AssetStore:
+    def __init__(self, directory=ASSET_DIR):
+        self.directory = directory
+        with open(os.path.join(directory, "manifest.json"), encoding="utf-8") as fh:
+            self.manifest = json.load(fh)
+        self._data = {}
+        for name, entry in self.manifest.items():
+            with open(os.path.join(directory, entry["file"]), "rb") as fh:
+                self._data[name] = fh.read()
+
+    def caption(self, name):
+        return self.manifest[name].get("caption", "")
+
+    def mime(self, name):
+        return mimetypes.guess_type(self.manifest[name]["file"])[0] or "application/octet-stream"
+
+    def image(self, name):
+        # st.image takes SVG as markup text and raster formats as bytes
+        if self.mime(name) == "image/svg+xml":
+            return self._data[name].decode("utf-8")
+        return self._data[name]
@@ -0,0 +1,398 @@
+import argparse
+import contextlib
+import json
+import os
+import re
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+from protocol_clock import EventClock
+from protocol_journal import read_journal, start_session
+from protocol_registry import SessionRegistry, SharedSession
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+APPS = {"copilot": os.path.join(HERE, "protocol_copilot.py"), "trainer": os.path.join(HERE, "protocol_trainer.py")}
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+def summarize(latencies_ms):
+    return {
+        "n": len(latencies_ms),
+        "p50_ms": round(statistics.median(latencies_ms), 4),
+        "p95_ms": round(percentile(latencies_ms, 95), 4),
+        "p99_ms": round(percentile(latencies_ms, 99), 4),
+        "max_ms": round(max(latencies_ms), 4),
+    }
+
+
+# --- REGISTRY LOAD TEST ---
+# Simulates `sessions` stations, each with several operator/observer tabs
+# clicking every `pace` seconds (20/s, already far faster than any operator),
+# and measures log() latency under contention. Much faster paces only
+# measure how many client threads one CPU can schedule, not the registry.
+def registry_load(sessions, clients_per_session=3, events_per_client=100, pace=0.02):
+    with tempfile.TemporaryDirectory() as directory:
+        registry = SessionRegistry(directory)
+        live = [registry.open(f"station-{i:02d}", f"P{i:03d}") for i in range(sessions)]
+        latencies = []
+        latencies_lock = threading.Lock()
+        barrier = threading.Barrier(sessions * clients_per_session)
+
+        def client(session, client_id):
+            mine = []
+            barrier.wait()
+            for k in range(events_per_client):
+                started = time.perf_counter_ns()
+                session.log(f"client {client_id} event {k}")
+                mine.append((time.perf_counter_ns() - started) / 1e6)
+                time.sleep(pace)
+            with latencies_lock:
+                latencies.extend(mine)
+
+        threads = [threading.Thread(target=client, args=(session, c))
+                   for session in live for c in range(clients_per_session)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # Every client of a session must see one gap-free order, and the journal must agree with it
+        for session in live:
+            registry.finish(session)
+            seqs = [e["Seq"] for e in session.logs]
+            if seqs != list(range(1, len(seqs) + 1)):
+                raise AssertionError(f"{session.session_id}: Seq is not gap-free")
+            _, journaled, _ = read_journal(session.journal.path)
+            if [e["Seq"] for e in journaled] != seqs:
+                raise AssertionError(f"{session.session_id}: journal order differs from live order")
+            monotonic = [e["Monotonic (ns)"] for e in session.logs]
+            if monotonic != sorted(monotonic):
+                raise AssertionError(f"{session.session_id}: Seq order differs from clock order")
+
+    return {"sessions": sessions, "clients": sessions * clients_per_session, **summarize(latencies)}
+
+def run_registry(levels, max_ratio, **kwargs):
+    results = [registry_load(level, **kwargs) for level in levels]
+    baseline = results[0]["p95_ms"]
+    flat = all(r["p95_ms"] <= max(baseline * max_ratio, baseline + 1.0) for r in results)
+    return {"benchmark": "registry", "results": results, "max_p95_ratio": max_ratio, "passed": flat}
+
+
+# --- PROGRESS STORE LOAD TEST ---
+# A cohort answering at once while a trainer keeps the dashboard open:
+# submit latency must stay flat and the dashboard must keep refreshing.
+def progress_load(trainees=40, answers=100, pace=0.002, pool=8):
+    from protocol_progress import ProgressStore
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = ProgressStore(os.path.join(directory, "progress.sqlite"), pool)
+        modules = ["setup", "baseline", "giladi", "vr", "drill"]
+        latencies, reads = [], []
+        lock = threading.Lock()
+        barrier = threading.Barrier(trainees + 1)
+        done = threading.Event()
+
+        def trainee(n):
+            mine = []
+            barrier.wait()
+            for k in range(answers):
+                module = modules[k % len(modules)]
+                started = time.perf_counter_ns()
+                store.record_attempt(f"T{n:03d}", module, f"q{k % 7}", "quiz", "a", "a" if k % 3 else "b", k % 3)
+                if k % 20 == 19:
+                    store.complete(f"T{n:03d}", module)
+                mine.append((time.perf_counter_ns() - started) / 1e6)
+                time.sleep(pace)
+            with lock:
+                latencies.extend(mine)
+
+        def dashboard():
+            store.cohort(modules)  # pandas import and first query out of the timing
+            barrier.wait()
+            while not done.is_set():
+                started = time.perf_counter_ns()
+                store.cohort(modules)
+                store.module_stats()
+                reads.append((time.perf_counter_ns() - started) / 1e6)
+
+        threads = [threading.Thread(target=trainee, args=(n,)) for n in range(trainees)]
+        reader = threading.Thread(target=dashboard)
+        for thread in threads + [reader]:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        done.set()
+        reader.join()
+        rows = store.module_stats()["attempts"].sum()
+        store.close()
+    if rows != trainees * answers:
+        raise AssertionError(f"{rows} attempts stored, {trainees * answers} submitted")
+    return {"trainees": trainees, "submit": summarize(latencies), "dashboard": summarize(reads)}
+
+
+# --- APP BENCHMARKS (streamlit.testing.v1.AppTest) ---
+@contextlib.contextmanager
+def scratch_dir():
+    # Journals written by the apps land in a throwaway working directory
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        try:
+            yield directory
+        finally:
+            os.chdir(cwd)
+
+def timed_run(at):
+    started = time.perf_counter()
+    at.run()
+    if at.exception:
+        raise AssertionError(f"App raised: {at.exception[0].message}")
+    return (time.perf_counter() - started) * 1000
+
+def bench_app(name, repeats=5):
+    from streamlit.testing.v1 import AppTest
+
+    metrics = {}
+    at = AppTest.from_file(APPS[name], default_timeout=30)
+    metrics[f"{name}.cold_start_ms"] = timed_run(at)
+    nav = at.sidebar.radio[0]
+    for page in nav.options:
+        samples = []
+        for _ in range(repeats):
+            at.sidebar.radio[0].set_value(page)
+            samples.append(timed_run(at))
+        metrics[f"{name}.rerun_ms[{page}]"] = statistics.median(samples)
+    return metrics
+
+def bench_copilot_timer():
+    # Start a baseline timer and fast-forward it, so the whole START -> END cycle runs instantly
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(APPS["copilot"], default_timeout=30)
+    timed_run(at)
+    at.sidebar.radio[0].set_value(at.sidebar.radio[0].options[1])
+    timed_run(at)
+    started = time.perf_counter()
+    at.main.button[0].click()
+    timed_run(at)
+    at.session_state.session.timers.fast_forward()
+    timed_run(at)
+    elapsed = (time.perf_counter() - started) * 1000
+    events = [e["Event"] for e in at.session_state.session.logs]
+    if not events or not events[-1].endswith(" END"):
+        raise AssertionError(f"Timer did not complete: {events[-3:]}")
+    return {"copilot.timer_cycle_ms": elapsed}
+
+def bench_log_event(events=20_000):
+    with tempfile.TemporaryDirectory() as directory:
+        clock = EventClock()
+        session_id, journal = start_session(clock, directory)
+        session = SharedSession(session_id, "bench", "P000", journal, clock)
+        started = time.perf_counter()
+        for i in range(events):
+            session.log(f"Event {i}")
+        elapsed = time.perf_counter() - started
+        session.finish()
+    return {"log_event.us_per_event": elapsed / events * 1e6}
+
+def synthetic_logs(n):
+    clock = EventClock()
+    base = clock.now_ns()
+    logs = []
+    for i in range(n):
+        stamp = clock.stamp(base)
+        logs.append({"Seq": i + 1, "Event": f"Giladi Trial {i % 8 + 1} {'START' if i % 2 == 0 else 'END'}",
+                     "Time": stamp.pop("Time"), "Notes": "", **stamp})
+    return logs
+
+def bench_export(sizes):
+    from protocol_export import ExportCache, pa
+
+    metrics = {}
+    for n in sizes:
+        logs = synthetic_logs(n)
+        cache = ExportCache()
+        started = time.perf_counter()
+        cache.update(logs)
+        metrics[f"export.table_ms[{n}]"] = (time.perf_counter() - started) * 1000
+        started = time.perf_counter()
+        cache.csv()
+        metrics[f"export.csv_ms[{n}]"] = (time.perf_counter() - started) * 1000
+        if pa is not None:
+            started = time.perf_counter()
+            cache.parquet()
+            metrics[f"export.parquet_ms[{n}]"] = (time.perf_counter() - started) * 1000
+        # A rerun with no new events must hit the cache
+        started = time.perf_counter()
+        cache.update(logs)
+        cache.csv()
+        metrics[f"export.cached_rerun_ms[{n}]"] = (time.perf_counter() - started) * 1000
+        del logs, cache
+    return metrics
+
+def run_suite(sizes, repeats):
+    metrics = {}
+    with scratch_dir():
+        for name in APPS:
+            metrics.update(bench_app(name, repeats))
+        metrics.update(bench_copilot_timer())
+    metrics.update(bench_log_event())
+    metrics.update(bench_export(sizes))
+    return metrics
+
+# --- CATALOG BENCHMARK ---
+# A study-sized tree of journals: the scripted full session replayed once,
+# then copied under new session ids with the odd event dropped so the
+# missing-event report has something to find.
+def synthetic_study(directory, sessions, seed=0):
+    import random
+    from protocol_replay import load_script, replay
+    from protocol_spec import load_protocol
+
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "protocols", "scripts", "full_session.yaml")
+    template = replay(load_protocol(), load_script(script), os.path.join(directory, "template")).journal.path
+    with open(template, encoding="utf-8") as fh:
+        header, *records = fh.read().splitlines()
+    header = json.loads(header)
+    rng = random.Random(seed)
+    for i in range(sessions):
+        participant = f"P{i // 4:04d}"
+        folder = os.path.join(directory, participant)
+        os.makedirs(folder, exist_ok=True)
+        lines = [json.dumps({**header, "session_id": f"S{i:05d}", "participant": participant})]
+        lines += [line for line in records if rng.random() > 0.002]
+        with open(os.path.join(folder, f"S{i:05d}.jsonl"), "w", encoding="utf-8") as fh:
+            fh.write("\n".join(lines) + "\n")
+    os.remove(template)
+
+def bench_catalog(sessions=10_000, workers=None):
+    from protocol_catalog import connect, deviation_report, duration_report, ingest, missing_report
+    from protocol_spec import load_protocol
+
+    metrics = {}
+    with tempfile.TemporaryDirectory() as directory:
+        study = os.path.join(directory, "study")
+        synthetic_study(study, sessions)
+        catalog = os.path.join(directory, "catalog.sqlite")
+        metrics[f"catalog.ingest_s[{sessions}]"] = ingest([study], catalog, workers)["seconds"]
+        metrics[f"catalog.reingest_unchanged_s[{sessions}]"] = ingest([study], catalog, workers)["seconds"]
+        for name in sorted(os.listdir(study))[:sessions // 400]:
+            os.utime(os.path.join(study, name, os.listdir(os.path.join(study, name))[0]))
+        metrics[f"catalog.reingest_1pct_s[{sessions}]"] = ingest([study], catalog, workers)["seconds"]
+        protocol = load_protocol()
+        conn = connect(catalog)
+        for name, report in (("durations", lambda: duration_report(conn)),
+                             ("deviations", lambda: deviation_report(conn, protocol)),
+                             ("missing", lambda: missing_report(conn, protocol))):
+            started = time.perf_counter()
+            report()
+            metrics[f"catalog.report_{name}_s[{sessions}]"] = time.perf_counter() - started
+        conn.close()
+    return metrics
+
+# Smallest slowdown that counts as a regression, per unit (metric names carry
+# their unit: rerun_ms, us_per_event, ingest_s), so scheduler noise on a
+# fast metric can't fail the run and a real slowdown of a slow one can.
+MIN_DELTA = {"ms": 2.0, "us": 0.5, "s": 0.05}
+
+def metric_unit(name):
+    match = re.search(r"[._](ms|us|s)(?=_|$)", name.split("[")[0])
+    return match.group(1) if match else None
+
+def compare(metrics, baseline, max_regression, min_delta=MIN_DELTA):
+    # Every metric is "lower is better"; anything new in this run has nothing to compare against
+    regressions = {}
+    for name, value in metrics.items():
+        before = baseline.get(name)
+        floor = min_delta.get(metric_unit(name), 0.0)
+        if before and value > before * (1 + max_regression) and value - before > floor:
+            regressions[name] = {"baseline": before, "current": value}
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Protocol Copilot benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+    reg = sub.add_parser("registry", help="Concurrent session registry load test")
+    reg.add_argument("--levels", default="1,5,10,20,40", help="Comma-separated concurrent session counts")
+    reg.add_argument("--clients", type=int, default=3, help="Browser tabs per session")
+    reg.add_argument("--events", type=int, default=100, help="Events logged per client")
+    reg.add_argument("--max-ratio", type=float, default=3.0, help="Allowed p95 growth over the 1-session level")
+    reg.add_argument("--output", help="Write results as JSON to this path")
+    fan = sub.add_parser("fanout", help="Loopback event fan-out delivery latency")
+    fan.add_argument("--subscribers", type=int, default=3)
+    fan.add_argument("--events", type=int, default=200)
+    fan.add_argument("--max-p50", type=float, default=5.0, help="Fail above this median delivery latency (ms)")
+    suite = sub.add_parser("suite", help="AppTest rerun latency, log_event throughput and export benchmarks")
+    suite.add_argument("--sizes", default="1000,100000,1000000", help="Comma-separated event counts for export")
+    suite.add_argument("--repeats", type=int, default=5, help="Reruns per page")
+    suite.add_argument("--baseline", help="JSON results of an earlier run to compare against")
+    suite.add_argument("--max-regression", type=float, default=0.25, help="Allowed slowdown vs baseline (0.25 = 25%%)")
+    suite.add_argument("--min-delta", default=",".join(f"{u}={v}" for u, v in MIN_DELTA.items()),
+                       help="Ignore slowdowns smaller than this, per unit (default: %(default)s)")
+    suite.add_argument("--output", help="Write results as JSON to this path")
+    prog = sub.add_parser("progress", help="Trainee progress store under concurrent submits")
+    prog.add_argument("--trainees", type=int, default=40)
+    prog.add_argument("--answers", type=int, default=100, help="Answers submitted per trainee")
+    prog.add_argument("--max-p95", type=float, default=20.0, help="Fail above this submit p95 (ms)")
+    cat = sub.add_parser("catalog", help="Session catalog ingest and report timings on a synthetic study")
+    cat.add_argument("--sessions", type=int, default=10_000)
+    cat.add_argument("--workers", type=int, help="Parser processes (default: one per CPU)")
+    args = parser.parse_args(argv)
+
+    if args.command == "progress":
+        result = progress_load(args.trainees, args.answers)
+        print(json.dumps(result, indent=2))
+        return 0 if result["submit"]["p95_ms"] <= args.max_p95 else 1
+
+    if args.command == "catalog":
+        for name, value in bench_catalog(args.sessions, args.workers).items():
+            print(f"{name:<60} {value:>12.3f}")
+        return 0
+
+    if args.command == "fanout":
+        from protocol_fanout import loopback_test
+        result = loopback_test(args.subscribers, args.events)
+        print(json.dumps(result, indent=2))
+        complete = result["delivered"] == args.subscribers * args.events
+        return 0 if complete and result["p50_ms"] <= args.max_p50 else 1
+
+    if args.command == "suite":
+        metrics = run_suite([int(n) for n in args.sizes.split(",")], args.repeats)
+        for name, value in metrics.items():
+            print(f"{name:<60} {value:>12.3f}")
+        report = {"benchmark": "suite", "metrics": metrics, "regressions": {}, "passed": True}
+        if args.baseline:
+            with open(args.baseline, encoding="utf-8") as fh:
+                min_delta = {**MIN_DELTA, **{u: float(v) for u, v in (part.split("=") for part in args.min_delta.split(","))}}
+                report["regressions"] = compare(metrics, json.load(fh)["metrics"], args.max_regression, min_delta)
+            report["passed"] = not report["regressions"]
+            for name, r in report["regressions"].items():
+                print(f"REGRESSION {name}: {r['baseline']:.3f} -> {r['current']:.3f}")
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as fh:
+                json.dump(report, fh, indent=2)
+        return 0 if report["passed"] else 1
+
+    levels = [int(level) for level in args.levels.split(",")]
+    report = run_registry(levels, args.max_ratio, clients_per_session=args.clients, events_per_client=args.events)
+    for r in report["results"]:
+        print(f"{r['sessions']:>4} sessions / {r['clients']:>4} clients: "
+              f"p50 {r['p50_ms']:.3f} ms  p95 {r['p95_ms']:.3f} ms  p99 {r['p99_ms']:.3f} ms")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=2)
+    return 0 if report["passed"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,355 @@
+import argparse
+import csv
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+from protocol_intervals import IntervalIndex
+from protocol_journal import iter_records
+from protocol_spec import PROTOCOL_PATH, load_protocol
+
+CATALOG_PATH = os.environ.get("PROTOCOL_CATALOG", "catalog.sqlite")
+DEVIATION_TOLERANCE_S = 2.0  # a timed step this far off its protocol duration is a deviation
+POOL_THRESHOLD = 64          # fewer changed files than this are parsed in-process
+BATCH = 500                  # files per write transaction
+REANCHOR_NS = 1_000_000      # a jump in wall minus monotonic this large in an export means a resume
+PARSER_VERSION = 3           # bump when parse_file's output changes; every file is parsed again once
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    sid INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    format TEXT NOT NULL,
+    session_id TEXT,
+    station TEXT,
+    participant TEXT,
+    started TEXT,
+    finished INTEGER,
+    events INTEGER,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS events (
+    sid INTEGER NOT NULL,
+    seq INTEGER,
+    event TEXT NOT NULL,
+    wall_clock TEXT,
+    mono_ns INTEGER,
+    latency_ms REAL,
+    source TEXT,
+    notes TEXT,
+    confirms INTEGER
+);
+CREATE TABLE IF NOT EXISTS intervals (
+    sid INTEGER NOT NULL,
+    phase TEXT NOT NULL,
+    trial INTEGER,
+    start_seq INTEGER,
+    end_seq INTEGER,
+    start_time TEXT,
+    end_time TEXT,
+    duration_s REAL,
+    status TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS events_sid ON events (sid);
+CREATE INDEX IF NOT EXISTS events_event ON events (event, sid);
+CREATE INDEX IF NOT EXISTS intervals_sid ON intervals (sid);
+CREATE INDEX IF NOT EXISTS intervals_phase ON intervals (phase, trial, status);
+CREATE INDEX IF NOT EXISTS sessions_participant ON sessions (participant);
+CREATE INDEX IF NOT EXISTS sessions_session_id ON sessions (session_id, format);
+-- Reports read this view: a CSV export of a session whose journal is also
+-- catalogued is the same session twice, and the journal wins
+CREATE VIEW IF NOT EXISTS unique_sessions AS
+SELECT * FROM sessions s WHERE s.format = 'journal' OR (s.format = 'csv' AND NOT EXISTS (
+    SELECT 1 FROM sessions j WHERE j.format = 'journal' AND j.session_id = s.session_id));
+"""
+
+
+def connect(path=CATALOG_PATH):
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    if conn.execute("PRAGMA user_version").fetchone()[0] < PARSER_VERSION:
+        with conn:
+            if "error" not in {row[1] for row in conn.execute("PRAGMA table_info(sessions)")}:
+                conn.execute("ALTER TABLE sessions ADD COLUMN error TEXT")
+            conn.execute("UPDATE sessions SET mtime_ns = -1")  # no longer matches, so ingest re-parses
+            conn.execute(f"PRAGMA user_version = {PARSER_VERSION}")
+    return conn
+
+
+# --- PARSING (runs in worker processes) ---
+# Journals and exported CSVs both become (session, events, intervals) rows;
+# anything that is neither (drill histories, other CSVs) returns None, and a
+# file that can't be parsed returns the reason, so one bad file (not UTF-8, a
+# non-numeric Monotonic) is catalogued as 'other' instead of ending the ingest.
+def _int(value):
+    return int(value) if value not in (None, "") else None
+
+def _float(value):
+    return float(value) if value not in (None, "") else None
+
+def _wall_ns(value):
+    # Exact integer ns; naive values (older exports) are local time
+    wall = datetime.fromisoformat(value)
+    delta = (wall if wall.tzinfo else wall.astimezone()) - EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1_000_000_000 + delta.microseconds * 1000
+
+def _export_records(events):
+    # Exports carry no anchor records; rebuild them from wall minus monotonic,
+    # which is constant under one clock anchor and jumps after a reboot
+    offset = None
+    for event in events:
+        mono, wall = event.get("Monotonic (ns)"), event.get("Wall Clock")
+        if mono is not None and wall:
+            wall_ns = _wall_ns(wall)
+            if offset is None or abs(wall_ns - mono - offset) > REANCHOR_NS:
+                offset = wall_ns - mono
+                yield "resume", {"anchor_wall_ns": wall_ns, "anchor_monotonic_ns": mono}
+        yield "event", event
+
+def export_session_id(row, path):
+    # Exports name their session on every row (protocol_export.SESSION_COLUMNS);
+    # older ones didn't, and their file name stands in for it
+    session_id = row.get("Session")
+    return session_id if isinstance(session_id, str) and session_id else os.path.splitext(os.path.basename(path))[0]
+
+def parse_file(path):
+    try:
+        return _parse_file(path)
+    except (OSError, ValueError, KeyError, csv.Error) as exc:  # UnicodeDecodeError is a ValueError
+        return f"{type(exc).__name__}: {exc}"
+
+def _parse_file(path):
+    if path.endswith(".jsonl"):
+        records = list(iter_records(path))
+        header = next((record for kind, record in records if kind == "session"), {})
+        if not header.get("session_id"):
+            return None
+        events = [record for kind, record in records if kind == "event"]
+        finished = any(kind == "finish" for kind, _ in records)
+        index = IntervalIndex.from_records(records)
+        session = (header["session_id"], header.get("station", ""), header.get("participant", ""),
+                   header.get("started", ""), int(finished))
+    else:
+        with open(path, newline="", encoding="utf-8") as fh:
+            reader = csv.DictReader(fh)
+            if not {"Seq", "Event", "Monotonic (ns)"} <= set(reader.fieldnames or ()):
+                return None
+            events = [{**row, "Seq": _int(row["Seq"]), "Monotonic (ns)": _int(row["Monotonic (ns)"]),
+                       "Latency (ms)": _float(row.get("Latency (ms)")), "Confirms": _int(row.get("Confirms"))}
+                      for row in reader]
+        first = events[0] if events else {}
+        index = IntervalIndex.from_records(_export_records(events))
+        # No finish record in an export: finished when something was logged
+        # and every START has its END (or ABORTED)
+        finished = bool(events) and not index.open
+        session = (export_session_id(first, path), first.get("Station") or "", first.get("Participant") or "",
+                   first.get("Wall Clock", ""), int(finished))
+
+    event_rows = [(e.get("Seq"), e["Event"], str(e.get("Wall Clock") or ""), e.get("Monotonic (ns)"),
+                   e.get("Latency (ms)"), e.get("Source") or "ui", e.get("Notes") or "", e.get("Confirms"))
+                  for e in events]
+    interval_rows = [(r["Phase"], r["Trial"], r["Start Seq"], r["End Seq"], r["Start Time"], r["End Time"],
+                      r["Duration (s)"], r["Status"]) for r in index.rows()]
+    return session, event_rows, interval_rows
+
+
+# --- INGESTION ---
+def scan(roots):
+    for root in roots:
+        if os.path.isfile(root):
+            yield os.path.abspath(root)
+            continue
+        for directory, _, names in os.walk(root):
+            for name in names:
+                if name.endswith((".jsonl", ".csv")):
+                    yield os.path.abspath(os.path.join(directory, name))
+
+def ingest(roots, path=CATALOG_PATH, workers=None):
+    # Incremental: a file is parsed again only when its size or mtime moved,
+    # and sessions whose file disappeared from the scanned roots are dropped.
+    started = time.perf_counter()
+    conn = connect(path)
+    known = {p: (m, s) for p, m, s in conn.execute("SELECT path, mtime_ns, size FROM sessions")}
+    todo, seen = [], set()
+    for file in scan(roots):
+        stat = os.stat(file)
+        seen.add(file)
+        if known.get(file) != (stat.st_mtime_ns, stat.st_size):
+            todo.append((file, stat.st_mtime_ns, stat.st_size))
+
+    prefixes = tuple(os.path.join(os.path.abspath(r), "") for r in roots if os.path.isdir(r))
+    gone = [p for p in known if p not in seen and p.startswith(prefixes)]
+    with conn:
+        _delete(conn, gone)
+
+    files = [f for f, _, _ in todo]
+    if len(files) >= POOL_THRESHOLD:
+        pool = ProcessPoolExecutor(workers)
+        results = pool.map(parse_file, files, chunksize=max(1, len(files) // ((workers or os.cpu_count() or 1) * 8)))
+    else:
+        pool, results = None, map(parse_file, files)
+
+    ingested = errors = 0
+    try:
+        batch = []
+        for stat, result in zip(todo, results):
+            errors += isinstance(result, str)
+            batch.append((stat, result))
+            if len(batch) >= BATCH:
+                ingested += _write(conn, batch)
+                batch = []
+        ingested += _write(conn, batch)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    conn.close()
+    return {"scanned": len(seen), "changed": len(todo), "ingested": ingested, "skipped": len(seen) - len(todo),
+            "removed": len(gone), "errors": errors, "seconds": round(time.perf_counter() - started, 3)}
+
+def _delete(conn, paths):
+    for start in range(0, len(paths), 500):
+        chunk = paths[start:start + 500]
+        marks = ",".join("?" * len(chunk))
+        sids = f"SELECT sid FROM sessions WHERE path IN ({marks})"
+        conn.execute(f"DELETE FROM events WHERE sid IN ({sids})", chunk)
+        conn.execute(f"DELETE FROM intervals WHERE sid IN ({sids})", chunk)
+        conn.execute(f"DELETE FROM sessions WHERE path IN ({marks})", chunk)
+
+def _write(conn, batch):
+    written = 0
+    with conn:
+        _delete(conn, [file for (file, _, _), _ in batch])
+        for (file, mtime_ns, size), result in batch:
+            fmt = "journal" if file.endswith(".jsonl") else "csv"
+            if result is None or isinstance(result, str):
+                # Remembered (so it is skipped until it changes) but holds no session
+                conn.execute("INSERT INTO sessions (path, mtime_ns, size, format, error) VALUES (?, ?, ?, 'other', ?)",
+                             (file, mtime_ns, size, result))
+                continue
+            session, events, intervals = result
+            sid = conn.execute(
+                "INSERT INTO sessions (path, mtime_ns, size, format, session_id, station, participant, started,"
+                " finished, events) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (file, mtime_ns, size, fmt, *session, len(events))).lastrowid
+            conn.executemany("INSERT INTO events VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", [(sid, *e) for e in events])
+            conn.executemany("INSERT INTO intervals VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", [(sid, *i) for i in intervals])
+            written += 1
+    return written
+
+
+# --- REPORTS ---
+# Each report is a couple of indexed queries into pandas, then grouped and
+# joined column-wise; nothing loops over sessions in Python.
+def _frame(conn, sql, params=()):
+    import pandas as pd
+    return pd.read_sql_query(sql, conn, params=params)
+
+def duration_report(conn, phase=None):
+    # Distribution of completed interval durations per phase (and trial)
+    where, params = ("AND i.phase = ?", (phase,)) if phase else ("", ())
+    df = _frame(conn, "SELECT i.phase, i.trial, i.duration_s FROM intervals i JOIN unique_sessions s USING (sid) "
+                      f"WHERE i.status = 'complete' {where}", params)
+    grouped = df.groupby(["phase", "trial"], dropna=False, sort=True)["duration_s"]
+    report = grouped.describe(percentiles=[0.05, 0.5, 0.95])
+    return report.rename(columns={"count": "sessions", "5%": "p5", "50%": "median", "95%": "p95"}).round(3)
+
+def expected_durations(protocol):
+    return {step.event: step.duration for phase in protocol.phases if phase.kind == "timed" for step in phase.steps}
+
+def deviation_report(conn, protocol, tolerance=DEVIATION_TOLERANCE_S):
+    # Timed steps off their protocol duration, plus every aborted or unmatched interval
+    import pandas as pd
+    df = _frame(conn, "SELECT s.session_id, s.participant, s.path, i.phase, i.trial, i.duration_s, i.status "
+                      "FROM intervals i JOIN unique_sessions s USING (sid) WHERE i.status != 'open'")
+    expected = pd.Series(expected_durations(protocol), name="expected_s")
+    df = df.join(expected, on="phase")
+    df["deviation_s"] = (df["duration_s"] - df["expected_s"]).round(3)
+    off = df["deviation_s"].abs() > tolerance
+    broken = df["status"].isin(["aborted", "unmatched"])
+    return df[off | broken].sort_values(["session_id", "phase", "trial"]).reset_index(drop=True)
+
+def expected_events(protocol):
+    events = []
+    for phase in protocol.phases:
+        if phase.kind == "checklist" and phase.options.get("confirm"):
+            events.append((phase.id, phase.options["confirm"]["event"]))
+        for step in phase.steps:
+            events += [(phase.id, f"{step.event} START"), (phase.id, f"{step.event} END")]
+        if phase.kind == "trials":
+            for n in range(1, phase.options["trials"] + 1):
+                name = phase.options["event"].format(n=n)
+                events += [(phase.id, f"{name} START"), (phase.id, f"{name} END")]
+    return events
+
+def missing_report(conn, protocol, finished_only=True):
+    # Every (session, expected event) pair with no matching logged event: an anti-join
+    import pandas as pd
+    where = "WHERE finished = 1" if finished_only else ""
+    sessions = _frame(conn, f"SELECT sid, session_id, participant, path FROM unique_sessions {where}")
+    expected = pd.DataFrame(expected_events(protocol), columns=["phase_id", "event"])
+    logged = _frame(conn, "SELECT DISTINCT sid, event FROM events")
+    pairs = sessions.merge(expected, how="cross")
+    merged = pairs.merge(logged, on=["sid", "event"], how="left", indicator=True)
+    missing = merged[merged["_merge"] == "left_only"].drop(columns=["_merge", "sid"])
+    return missing.sort_values(["session_id", "phase_id"], kind="stable").reset_index(drop=True)
+
+def summary(conn):
+    return dict(zip(("sessions", "finished", "events", "participants"), conn.execute(
+        "SELECT COUNT(*), COALESCE(SUM(finished), 0), COALESCE(SUM(events), 0), COUNT(DISTINCT participant) "
+        "FROM unique_sessions").fetchone()))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Study-wide catalog of session journals and exported logs")
+    parser.add_argument("--catalog", default=CATALOG_PATH, help="SQLite catalog file")
+    sub = parser.add_subparsers(dest="command", required=True)
+    add = sub.add_parser("ingest", help="Add new or changed journals/CSV exports under the given paths")
+    add.add_argument("paths", nargs="+")
+    add.add_argument("--workers", type=int, help="Parser processes (default: one per CPU)")
+    report = sub.add_parser("report", help="Print or export a report")
+    report.add_argument("kind", choices=["summary", "durations", "deviations", "missing"])
+    report.add_argument("--phase", help="durations: only this phase, e.g. 'Giladi'")
+    report.add_argument("--tolerance", type=float, default=DEVIATION_TOLERANCE_S, help="deviations: seconds")
+    report.add_argument("--include-unfinished", action="store_true", help="missing: also check unfinished sessions")
+    report.add_argument("--spec", default=PROTOCOL_PATH)
+    report.add_argument("--out", help="Write the report as CSV instead of printing it")
+    args = parser.parse_args(argv)
+
+    if args.command == "ingest":
+        stats = ingest(args.paths, args.catalog, args.workers)
+        print(", ".join(f"{k}: {v}" for k, v in stats.items()))
+        if stats["errors"]:
+            conn = connect(args.catalog)
+            for path, error in conn.execute("SELECT path, error FROM sessions WHERE error IS NOT NULL ORDER BY path"):
+                print(f"Could not parse {path}: {error}", file=sys.stderr)
+            conn.close()
+        return 0
+
+    conn = connect(args.catalog)
+    if args.kind == "summary":
+        print(", ".join(f"{k}: {v}" for k, v in summary(conn).items()))
+        return 0
+    if args.kind == "durations":
+        df = duration_report(conn, args.phase)
+    elif args.kind == "deviations":
+        df = deviation_report(conn, load_protocol(args.spec), args.tolerance)
+    else:
+        df = missing_report(conn, load_protocol(args.spec), not args.include_unfinished)
+    if args.out:
+        df.to_csv(args.out, index=args.kind == "durations")
+        print(f"{len(df)} rows -> {args.out}")
+    else:
+        print(df.to_string())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,62 @@
+import time
+from datetime import datetime, timezone
+
+
+# --- EVENT CLOCK ---
+# Anchors time.monotonic_ns() to wall time once per session. Every event is
+# stamped from the monotonic clock and converted with the fixed anchor, so
+# NTP steps and DST changes mid-session cannot reorder or shift events.
+# Wall times carry their UTC offset (tz, default: the system's local zone at
+# that instant), so "Wall Clock" stays unambiguous across a DST change.
+class EventClock:
+    def __init__(self, monotonic_ns=time.monotonic_ns, wall_ns=time.time_ns, tz=None):
+        self._monotonic_ns = monotonic_ns
+        self._wall_ns = wall_ns
+        self.tz = tz
+        self.anchor()
+
+    def anchor(self):
+        # Read the wall clock between two monotonic reads and pin it to the
+        # midpoint; half the bracket width bounds the anchoring error.
+        before = self._monotonic_ns()
+        wall = self._wall_ns()
+        after = self._monotonic_ns()
+        self.anchor_monotonic_ns = (before + after) // 2
+        self.anchor_wall_ns = wall
+        self.anchor_error_ns = (after - before + 1) // 2
+
+    def now_ns(self):
+        return self._monotonic_ns()
+
+    def monotonic(self):
+        # Seconds on the same clock, for TimerEngine
+        return self._monotonic_ns() / 1e9
+
+    def to_wall_ns(self, monotonic_ns):
+        return self.anchor_wall_ns + (monotonic_ns - self.anchor_monotonic_ns)
+
+    def to_datetime(self, monotonic_ns):
+        wall = datetime.fromtimestamp(self.to_wall_ns(monotonic_ns) / 1e9, tz=self.tz or timezone.utc)
+        return wall if self.tz is not None else wall.astimezone()
+
+    def from_wall_ns(self, wall_ns):
+        return self.anchor_monotonic_ns + (wall_ns - self.anchor_wall_ns)
+
+    def stamp(self, source_ns=None, at_ns=None):
+        # source_ns is when the triggering action happened (e.g. the start of
+        # the rerun that handled a click); the gap is reported as latency.
+        # at_ns backdates the event itself, e.g. to a hardware key press.
+        now = self.now_ns()
+        when = at_ns if at_ns is not None else now
+        wall = self.to_datetime(when)
+        latency_ms = (now - source_ns) / 1e6 if source_ns is not None else None
+        return {
+            "Time": wall.strftime("%H:%M:%S.") + f"{wall.microsecond // 1000:03d}",
+            "Wall Clock": wall.isoformat(timespec="microseconds"),
+            "Monotonic (ns)": when,
+            "Latency (ms)": round(latency_ms, 3) if latency_ms is not None else None,
+        }
+
+    def describe(self):
+        anchored = self.to_datetime(self.anchor_monotonic_ns)
+        return f"Clock anchored at {anchored.isoformat(timespec='microseconds')} (±{self.anchor_error_ns / 1000:.1f} µs)"
@@ -1,9 +1,28 @@
 import streamlit as st
 import pandas as pd
-from datetime import datetime
+import os
 import time
 import io
 
+from protocol_export import ExportCache, pa, session_columns
+from protocol_fanout import FANOUT, EventPublisher
+from protocol_intervals import INTERVAL_COLUMNS
+from protocol_journal import JournalLocked, list_sessions
+from protocol_metrics import (METRICS, SNAPSHOT_KEY, LOG_EVENT_SECONDS, RENDER_SECONDS, RERUN_SECONDS,
+                              RUN_TIMER_SECONDS, TIMER_DRIFT_SECONDS, TIMER_TICK_JITTER_SECONDS,
+                              MetricsExporter, rerun_trigger, widget_snapshot)
+from protocol_registry import SessionRegistry, DEFAULT_STATION
+from protocol_runner import ProtocolCore
+from protocol_sensors import SENSOR_SOURCE, SensorFeed, open_sources
+from protocol_spec import PROTOCOL_PATH, load_protocol
+from protocol_triggers import TRIGGER_SOURCE, TRIGGER_WINDOW_NS, FakeSource, TriggerListener, open_source
+from protocol_timers import DONE, ABORTED, PAUSED, format_remaining
+
+# Taken first thing on every script run: a button click's latency is measured from here
+RERUN_STARTED_NS = time.monotonic_ns()
+RERUN_TRIGGER = rerun_trigger(st.session_state)
+TIMER_TICK = 0.25  # seconds between timer panel runs
+
 # --- CONFIG & STYLING ---
 st.set_page_config(page_title="Study Protocol Copilot", layout="wide")
 
@@ -16,190 +35,506 @@ st.markdown("""
     </style>
     """, unsafe_allow_html=True)
 
+# --- INSTRUMENTATION ---
+@st.cache_resource
+def get_metrics_exporter():
+    # PROTOCOL_METRICS_FILE and/or PROTOCOL_METRICS_PORT; both off by default
+    return MetricsExporter()
+
+metrics_exporter = get_metrics_exporter()
+
+def end_of_run():
+    # Called at the bottom of the script and before any st.stop()
+    RERUN_SECONDS.observe((time.monotonic_ns() - RERUN_STARTED_NS) / 1e9, app="copilot", trigger=RERUN_TRIGGER)
+    st.session_state[SNAPSHOT_KEY] = widget_snapshot(st.session_state)
+
+# --- PROTOCOL SPEC ---
+@st.cache_resource
+def get_protocol(path, mtime):
+    # Compiled once per spec file version; editing the YAML recompiles on the next rerun
+    return load_protocol(path)
+
+protocol = get_protocol(PROTOCOL_PATH, os.path.getmtime(PROTOCOL_PATH))
+EXPORT_PAGE = f"{len(protocol.phases) + 1}. Finish & Export Logs"
+
 # --- SESSION STATE INITIALIZATION ---
-if 'logs' not in st.session_state:
-    st.session_state.logs = []
-
-def log_event(event_name, notes=""):
-    timestamp = datetime.now().strftime("%H:%M:%S")
-    st.session_state.logs.append({"Event": event_name, "Time": timestamp, "Notes": notes})
-    st.toast(f"Logged: {event_name} at {timestamp}")
-
-# --- TIMER FUNCTION ---
-def run_timer(seconds, label):
-    placeholder = st.empty()
-    progress_bar = st.progress(0)
-    
-    for i in range(seconds, -1, -1):
-        mins, secs = divmod(i, 60)
-        time_format = '{:02d}:{:02d}'.format(mins, secs)
-        placeholder.markdown(f"<div class='timer-box'>{label}: {time_format}</div>", unsafe_allow_html=True)
-        progress_bar.progress((seconds - i) / seconds)
-        time.sleep(1)
-    
-    placeholder.markdown(f"<div class='timer-box'>TIME IS UP! 🛑</div>", unsafe_allow_html=True)
-    st.balloons()
+@st.cache_resource
+def get_registry():
+    # Shared by every browser tab served by this process
+    return SessionRegistry()
+
+registry = get_registry()
+
+@st.cache_resource
+def get_publisher(spec):
+    # Publishes every event of every session to the other lab computers (PROTOCOL_FANOUT)
+    if not spec:
+        return None
+    publisher = EventPublisher.from_spec(spec)
+    registry.add_hook(publisher.publish)
+    return publisher
+
+publisher = get_publisher(FANOUT)
+
+def attach_session(session):
+    # Timers live on the shared session; a resumed one gets its open countdowns back
+    st.session_state.session = session
+    st.query_params["session"] = session.session_id  # a refresh comes back to it
+    session.restore_timers(protocol)
+
+def open_session(station, participant):
+    # A journal another process is writing (the terminal runner, a second
+    # server) is never joined from here; the station gets a new session instead
+    try:
+        return registry.open(station, participant)
+    except JournalLocked as exc:
+        st.warning(f"{exc}; started a new session.")
+        return registry.start(station, participant)
+
+if 'session' not in st.session_state:
+    # A refresh or server restart lands here: pick up the session named in the
+    # URL, else this station's latest unfinished one. Other stations' sessions
+    # are only resumed explicitly, from "Unfinished sessions" in the sidebar.
+    unfinished = [s for s in list_sessions(registry.directory) if not s["finished"]]
+    mine = ([s for s in unfinished if s["session_id"] == st.query_params.get("session")]
+            or [s for s in unfinished if s["station"] == DEFAULT_STATION])
+    try:
+        attach_session(registry.resume(mine[0]["path"]) if mine else open_session(DEFAULT_STATION, ""))
+    except JournalLocked as exc:
+        st.warning(f"{exc}; started a new session.")
+        attach_session(registry.start(DEFAULT_STATION, ""))
+elif st.session_state.session.finished:
+    # Another tab finished this session; follow its replacement for the same station/participant
+    attach_session(open_session(*st.session_state.session.key))
+
+session = st.session_state.session
+st.session_state.logs = session.logs
+
+@LOG_EVENT_SECONDS.time(app="copilot")
+def log_event(event_name, notes="", source_ns=RERUN_STARTED_NS):
+    issues = st.session_state.session.intervals.issues
+    known = len(issues)
+    entry = st.session_state.session.log(event_name, notes, source_ns)
+    st.toast(f"Logged: {event_name} at {entry['Time']}")
+    for issue in issues[known:]:
+        st.toast(f"⚠️ {issue}")
+
+# Timer and trial rules are shared with the terminal runner (protocol_runner)
+core = ProtocolCore(protocol, session, log=log_event, say=st.info)
+
+# --- TIMER FUNCTIONS ---
+@RUN_TIMER_SECONDS.time(app="copilot")
+def run_timer(step, trigger=None):
+    # Schedules the countdown and returns immediately; timer_panel() ticks it
+    core.start_step(step, RERUN_STARTED_NS, trigger)
+
+@st.fragment(run_every=TIMER_TICK)
+def timer_panel():
+    tick_ns = time.monotonic_ns()
+    interval = (tick_ns - st.session_state.get("_last_tick_ns", 0)) / 1e9
+    st.session_state._last_tick_ns = tick_ns
+    # Scheduled ticks only: a fragment run doesn't reset RERUN_STARTED_NS, so a
+    # panel drawn right after it is part of a full run (a click, the first run)
+    scheduled = (tick_ns - RERUN_STARTED_NS) / 1e9 > TIMER_TICK / 2
+    if scheduled and TIMER_TICK / 2 < interval < 10 * TIMER_TICK:
+        TIMER_TICK_JITTER_SECONDS.observe(abs(interval - TIMER_TICK), app="copilot")
+    engine = core.timers
+    for timer in core.tick():
+        TIMER_DRIFT_SECONDS.observe(timer.drift, app="copilot")
+        st.balloons()
+
+    if not engine.timers:
+        st.caption("No timers running.")
+        return
+
+    now = engine.clock()
+    for key, timer in engine.items():
+        if timer.state == DONE:
+            st.markdown(f"<div class='timer-box'>{timer.label}: TIME IS UP! 🛑</div>", unsafe_allow_html=True)
+            if timer.done_message:
+                st.warning(timer.done_message)
+            st.caption(f"Drift: {timer.drift * 1000:+.1f} ms")
+        elif timer.state == ABORTED:
+            st.markdown(f"**{timer.label}: ABORTED**")
+        else:
+            st.markdown(f"<div class='timer-box'>{timer.label}: {format_remaining(timer.remaining(now))}</div>", unsafe_allow_html=True)
+            st.progress(timer.fraction(now))
 
-# --- SIDEBAR: NAVIGATION ---
-st.sidebar.title("Protocol Phases")
-phase = st.sidebar.radio("Go to:", [
-    "1. Setup & Pre-Flight",
-    "2. Baseline (Sit/Stand/Walk)",
-    "3. Giladi Protocol (8 Trials)",
-    "4. VR Familiarization",
-    "5. VR Repositioned",
-    "6. Finish & Export Logs"
-])
-
-# --- PAGE 1: SETUP ---
-if phase == "1. Setup & Pre-Flight":
-    st.title("🛠️ Equipment Setup Checklist")
-    
-    col1, col2 = st.columns(2)
-    with col1:
-        st.subheader("OPAL Sensors")
-        st.checkbox("Access Point connected & Green Light")
-        st.checkbox("Sensors flashing Green (Charged)")
-        st.checkbox("Sensors placed on subject (2 Shins, 2 Feet, 1 Sacrum)")
-        st.checkbox("MobilityLab: Subject Created & PD_HRV Selected")
-    
-    with col2:
-        st.subheader("Cameras & Equivital")
-        st.checkbox("GoPros Paired (Frontal + Sagittal)")
-        st.checkbox("Equivital SEM Connected & Configured")
-        st.checkbox("LabChart: Template Loaded")
-        st.checkbox("Subject barefoot?")
-
-    if st.button("Confirm Setup Complete"):
-        log_event("Setup Complete")
-        st.success("Ready for Baseline!")
-
-# --- PAGE 2: BASELINE ---
-elif phase == "2. Baseline (Sit/Stand/Walk)":
-    st.title("📊 Baseline Measurements")
-    
-    tab1, tab2, tab3 = st.tabs(["Sitting (5m)", "Standing (5m)", "Walking (5m)"])
-    
-    with tab1:
-        st.markdown("<div class='big-instruction'>Phase 1: Sitting</div>", unsafe_allow_html=True)
-        st.info("Ensure Equivital & Sync App are ready.")
-        
-        st.markdown("**COMMANDS TO PRESS:**")
         col_a, col_b = st.columns(2)
-        col_a.markdown("<div class='key-combo'>Equivital: [Shift + A]</div>", unsafe_allow_html=True)
-        col_b.markdown("<div class='key-combo'>Sync App: 'Start 5 min Sitting'</div>", unsafe_allow_html=True)
-        
-        if st.button("▶️ START 5-Min Timer (Sitting)"):
-            log_event("Baseline Sitting START")
-            run_timer(300, "Sitting Timer")
-            log_event("Baseline Sitting END")
-            st.warning("PRESS: Equivital [Shift + E] + Sync App 'End'")
-
-    with tab2:
-        st.markdown("<div class='big-instruction'>Phase 2: Standing</div>", unsafe_allow_html=True)
-        st.warning("Take Blood Pressure before starting this!")
-        
-        st.markdown("**COMMANDS TO PRESS:**")
+        if timer.state == PAUSED:
+            if col_a.button("▶️ Resume", key=f"resume-{key}"):
+                core.pause_resume(key)
+                st.rerun(scope="fragment")
+        elif timer.state not in (DONE, ABORTED):
+            if col_a.button("⏸️ Pause", key=f"pause-{key}"):
+                core.pause_resume(key)
+                st.rerun(scope="fragment")
+
+        if timer.state in (DONE, ABORTED):
+            if col_b.button("Dismiss", key=f"dismiss-{key}"):
+                core.dismiss(key)
+                st.rerun(scope="fragment")
+        elif col_b.button("⛔ Abort", key=f"abort-{key}"):
+            core.abort(key, source_ns=tick_ns)
+            st.rerun(scope="fragment")
+
+# --- INTERVALS ---
+@st.fragment(run_every=1)
+def interval_panel():
+    index = session.intervals
+    for key, elapsed in index.running(session.clock.now_ns()):
+        st.markdown(f"⏳ **{key}** — {format_remaining(elapsed)} elapsed")
+    recent = [row for row in index.intervals if row["Status"] == "complete"][-3:]
+    for row in reversed(recent):
+        trial = f" Trial {row['Trial']}" if row["Trial"] else ""
+        st.caption(f"✅ {row['Phase']}{trial}: {row['Duration (s)']:.1f} s")
+    if index.issues:
+        st.error(f"{len(index.issues)} interval issue(s): {index.issues[-1]}")
+    if not (index.open or recent or index.issues):
+        st.caption("No intervals yet.")
+
+# --- HARDWARE TRIGGERS ---
+@st.cache_resource
+def get_trigger_listener(source_spec):
+    # One listener per process; presses go to the live session of this station
+    if not source_spec:
+        return None
+
+    def sink(key, hw_ns, device):
+        target = registry.for_station(DEFAULT_STATION)
+        return target.log_trigger(key, hw_ns, device) if target is not None else None
+
+    return TriggerListener(open_source(source_spec, registry.clock), sink).start()
+
+trigger_listener = get_trigger_listener(TRIGGER_SOURCE)
+
+@st.fragment(run_every=0.5)
+def trigger_panel():
+    if trigger_listener is None:
+        st.caption("No trigger source (set PROTOCOL_TRIGGER_SOURCE).")
+        return
+    st.caption(f"{trigger_listener.received} captured, {trigger_listener.dropped} dropped")
+    if isinstance(trigger_listener.source, FakeSource):
+        for key in ("Shift + A", "Shift + S", "Remote > (Slide Forward)"):
+            if st.button(f"Simulate {key}", key=f"fake-{key}"):
+                trigger_listener.source.press(key)
+    for entry in session.pending_triggers(window_ns=TRIGGER_WINDOW_NS)[:3]:
+        st.markdown(f"🎛️ **{entry['Event'][len('Trigger '):]}** at {entry['Time']} — unconfirmed")
+
+@st.fragment(run_every=0.5)
+def confirm_trigger(key, label, on_confirm):
+    # Offers the newest unconfirmed press of `key` so the operator confirms it instead of re-logging
+    pending = session.pending_triggers(key, TRIGGER_WINDOW_NS)
+    if not pending:
+        return
+    trigger = pending[0]
+    label = label() if callable(label) else label
+    if st.button(f"🎛️ Confirm {label} from {key} at {trigger['Time']}", key=f"confirm-{key}"):
+        on_confirm(trigger)
+
+# --- SENSOR PREVIEW ---
+@st.cache_resource
+def get_sensor_feeds(source_spec):
+    # One feed per device for the whole process, each writing its own ring buffer
+    if not source_spec:
+        return {}
+    return {key: SensorFeed(key, source).start() for key, source in open_sources(source_spec).items()}
+
+sensor_feeds = get_sensor_feeds(SENSOR_SOURCE)
+
+@st.fragment(run_every=0.2)
+def sensor_panel():
+    # Fixed-size frames: a window from the ring, min/max-downsampled to a constant point count
+    if not sensor_feeds:
+        st.caption("No live sensor stream (set PROTOCOL_SENSOR_SOURCE=synthetic or lsl).")
+        return
+    with RENDER_SECONDS.time(app="copilot", page="sensor_preview"):
+        for col, feed in zip(st.columns(len(sensor_feeds)), sensor_feeds.values()):
+            device = feed.device
+            plot_t, plot_v, report = feed.preview()
+            with col:
+                st.markdown(f"**{device['label']}** ({device['rate']} Hz, {device['unit']})")
+                if feed.last_error:
+                    st.error(feed.last_error)
+                if len(plot_t):
+                    st.line_chart(pd.DataFrame(plot_v, index=plot_t, columns=device["channels"]),
+                                  x_label="Seconds", height=180)
+                for name, channel in zip(device["channels"], report):
+                    flags = channel["flags"]
+                    st.markdown(f"⚠️ **{name}**: {', '.join(flags)}" if flags else f"✅ {name}")
+
+# --- PAGE RENDERERS ---
+# One renderer per phase kind; only the selected phase (and, for timed
+# phases, only the selected step) is rendered on a rerun.
+MESSAGE_WRITERS = {"info": st.info, "warning": st.warning, "error": st.error, "markdown": st.markdown}
+
+def show_messages(messages):
+    for level, text in messages:
+        MESSAGE_WRITERS[level](text)
+
+def show_keys(keys):
+    if "single" in keys:
+        st.markdown(f"<div class='key-combo'>{keys['single']}</div>", unsafe_allow_html=True)
+    elif keys:
         col_a, col_b = st.columns(2)
-        col_a.markdown("<div class='key-combo'>Equivital: [Shift + A]</div>", unsafe_allow_html=True)
-        col_b.markdown("<div class='key-combo'>Sync App: 'Start 5 min Standing'</div>", unsafe_allow_html=True)
-
-        if st.button("▶️ START 5-Min Timer (Standing)"):
-            log_event("Baseline Standing START")
-            run_timer(300, "Standing Timer")
-            log_event("Baseline Standing END")
-            st.warning("PRESS: Equivital [Shift + E] + Sync App 'End'")
-
-    with tab3:
-        st.markdown("<div class='big-instruction'>Phase 3: Walking</div>", unsafe_allow_html=True)
-        st.error("⚠️ CAMERAS: Blue Mark (Entry + Gait Carpet)")
-        
+        col_a.markdown(f"<div class='key-combo'>{keys['left']}</div>", unsafe_allow_html=True)
+        col_b.markdown(f"<div class='key-combo'>{keys['right']}</div>", unsafe_allow_html=True)
+
+def render_checklist(phase):
+    st.title(phase.heading)
+    show_messages(phase.messages)
+
+    checklists = phase.options.get("checklists", [])
+    for col, checklist in zip(st.columns(len(checklists) or 1), checklists):
+        with col:
+            st.subheader(checklist["title"])
+            for item in checklist["items"]:
+                st.checkbox(item, key=f"check-{phase.id}-{item}")
+
+    if phase.options.get("sensor_preview"):
+        st.subheader("📈 Live Sensor Check")
+        sensor_panel()
+
+    confirm = phase.options.get("confirm")
+    if confirm and st.button(confirm["label"], key=f"confirm-{phase.id}"):
+        log_event(confirm["event"])
+        st.success(confirm.get("success", "Logged."))
+
+def render_step(phase, step):
+    if step.instruction:
+        st.markdown(f"<div class='big-instruction'>{step.instruction}</div>", unsafe_allow_html=True)
+    if step.camera:
+        st.error(f"⚠️ CAMERAS: {protocol.camera(phase.id, step.id)}")
+    show_messages(step.messages)
+
+    if step.commands or ("left" in step.keys):
         st.markdown("**COMMANDS TO PRESS:**")
-        st.markdown("- **VideoSync:** Type 'Record' (Enter)")
-        st.markdown("- **Remote:** Press Right Arrow (>)")
-        
-        col_a, col_b = st.columns(2)
-        col_a.markdown("<div class='key-combo'>Equivital: [Shift + A]</div>", unsafe_allow_html=True)
-        col_b.markdown("<div class='key-combo'>Sync App: 'Start 5 min Walk'</div>", unsafe_allow_html=True)
-
-        if st.button("▶️ START 5-Min Timer (Walking)"):
-            log_event("Baseline Walking START")
-            run_timer(300, "Walking Timer")
-            log_event("Baseline Walking END")
-            st.warning("PRESS: Equivital [Shift + E] + Sync App 'End' + Remote (>)")
-
-# --- PAGE 3: GILADI ---
-elif phase == "3. Giladi Protocol (8 Trials)":
-    st.title("🔄 Giladi Protocol")
-    
-    st.error("⚠️ CAMERAS: Green Tape (Whiteboard + Window)")
-    
-    trial_num = st.number_input("Current Trial Number", 1, 8, 1)
-    
+    for command in step.commands:
+        st.markdown(f"- {command}")
+    show_keys(step.keys)
+
+    if st.button(step.button, key=f"start-{phase.id}-{step.id}"):
+        run_timer(step)
+    if step.trigger:
+        confirm_trigger(step.trigger[0], f"{step.event} START", lambda trigger: run_timer(step, trigger))
+
+    next_phase, next_step = protocol.next_step(phase.id, step.id)
+    if next_step is not None:
+        where = "" if next_phase is phase else f" ({next_phase.title})"
+        st.caption(f"Next step: {next_step.label}{where}")
+
+def render_timed(phase):
+    st.title(phase.heading)
+    if phase.intro:
+        st.markdown(phase.intro)
+    show_messages(phase.messages)
+
+    steps = {step.id: step for step in phase.steps}
+    active = st.radio("Step:", list(steps), format_func=lambda sid: steps[sid].label,
+                      horizontal=True, key=f"step-{phase.id}")
+    render_step(phase, steps[active])
+
+def render_trials(phase):
+    opts = phase.options
+    st.title(phase.heading)
+    show_messages(phase.messages)
+
+    trial_num = st.number_input("Current Trial Number", 1, opts["trials"], 1, key=f"trial-{phase.id}")
+
     st.markdown(f"### Running Trial {trial_num}")
-    
-    st.info("1. VideoSync: Recall 'Record' -> Enter (Pending)")
-    st.info("2. MobilityLab: Select Test")
-    st.info("3. Wait for instructions...")
-    
+    show_messages(opts.get("trial_messages", ()))
+
+    event = opts["event"].format(n=trial_num)
     col1, col2 = st.columns(2)
     with col1:
-        if st.button(f"🚀 START Trial {trial_num} (Trigger)"):
-            log_event(f"Giladi Trial {trial_num} START")
-            st.success("LOGGED: Start Timestamp. (Press Remote + Sync App NOW)")
-    
+        if st.button(opts["start_button"].format(n=trial_num), key=f"start-{phase.id}"):
+            log_event(f"{event} START")
+            st.success(opts["start_logged"])
+
     with col2:
-        if st.button(f"🛑 STOP Trial {trial_num}"):
-            log_event(f"Giladi Trial {trial_num} END")
-            st.warning("LOGGED: Stop Timestamp. (Press Remote + Sync App NOW)")
+        if st.button(opts["stop_button"].format(n=trial_num), key=f"stop-{phase.id}"):
+            log_event(f"{event} END")
+            st.warning(opts["stop_logged"])
+
+    if phase.trigger:
+        # The same remote press starts and stops a trial
+        confirm_trigger(phase.trigger[0], lambda: core.next_mark(phase, trial_num),
+                        lambda trigger: core.mark_trial(phase, trial_num, trigger=trigger))
 
-    if trial_num == 7:
+    alert = opts.get("alerts", {}).get(trial_num)
+    if alert:
         st.markdown("---")
-        st.error("🚨 NEXT IS TRIAL 8 (DOORWAY): MOVE FRONTAL CAMERA TO GREEN TAPE BY DESKS!")
+        st.error(alert)
 
-# --- PAGE 4: VR FAMILIARIZATION ---
-elif phase == "4. VR Familiarization":
-    st.title("🥽 VR Familiarization")
-    st.markdown("Sequence: Sit (2m) -> Stand (2m) -> Walk (2m)")
-    
-    mode = st.radio("Select Mode", ["Sitting", "Standing", "Walking"], horizontal=True)
-    
-    if mode == "Sitting":
-        st.markdown("<div class='key-combo'>Equivital: [Shift + S] | Sync: 'Start 2 min sit'</div>", unsafe_allow_html=True)
-        if st.button("Start 2m Timer"):
-            log_event("VR Fam Sitting START")
-            run_timer(120, "VR Sitting")
-            log_event("VR Fam Sitting END")
-
-    elif mode == "Standing":
-        st.markdown("<div class='key-combo'>Equivital: [Shift + S] | Sync: 'Start 2 min stand'</div>", unsafe_allow_html=True)
-        if st.button("Start 2m Timer"):
-            log_event("VR Fam Standing START")
-            run_timer(120, "VR Standing")
-            log_event("VR Fam Standing END")
-
-    elif mode == "Walking":
-        st.markdown("<div class='key-combo'>Equivital: [Shift + S] | Sync: 'Start 2 min walk'</div>", unsafe_allow_html=True)
-        if st.button("Start 2m Timer"):
-            log_event("VR Fam Walking START")
-            run_timer(120, "VR Walking")
-            log_event("VR Fam Walking END")
-
-# --- PAGE 6: EXPORT ---
-elif phase == "6. Finish & Export Logs":
+RENDERERS = {"checklist": render_checklist, "timed": render_timed, "trials": render_trials}
+
+# --- SIDEBAR: NAVIGATION ---
+st.sidebar.title("Protocol Phases")
+phase = st.sidebar.radio("Go to:", protocol.titles + [EXPORT_PAGE], key="page")
+
+with st.sidebar:
+    st.markdown("---")
+    st.subheader("⏱️ Timers")
+    timer_panel()
+
+    st.markdown("---")
+    st.subheader("📏 Intervals")
+    interval_panel()
+
+    st.markdown("---")
+    st.subheader("🎛️ Hardware Triggers")
+    trigger_panel()
+
+    if publisher is not None:
+        st.caption(f"📡 Fan-out: {publisher.sent} sent")
+        for name, stats in publisher.stats().items():
+            st.caption(f"↳ {name}: {stats['n']} acked, p50 {stats['p50_ms']:.2f} ms, max {stats['max_ms']:.2f} ms")
+
+    st.markdown("---")
+    st.subheader("🗂️ Session")
+    st.caption(f"{session.station} / {session.participant or '(no participant)'} — "
+               f"{session.session_id} ({len(session.logs)} events)")
+    with st.form("open-session"):
+        station = st.text_input("Station", value=session.station, key="open-station")
+        participant = st.text_input("Participant ID", value=session.participant, key="open-participant")
+        if st.form_submit_button("🔗 Open / Join Session"):
+            try:
+                attach_session(registry.open(station.strip(), participant.strip()))
+            except JournalLocked as exc:
+                st.error(f"{exc}. Finish or close it there first.")
+            else:
+                st.rerun()
+    unfinished = {s["session_id"]: s for s in list_sessions(registry.directory) if not s["finished"]
+                  and s["session_id"] != session.session_id}
+    if unfinished:
+        resume_id = st.selectbox("Unfinished sessions:", list(unfinished),
+                                 format_func=lambda sid: f"{unfinished[sid]['station']} / {unfinished[sid]['participant']} "
+                                                         f"— {sid} ({unfinished[sid]['events']} events)",
+                                 key="resume-session")
+        if st.button("↩️ Resume Selected Session", key="resume"):
+            try:
+                attach_session(registry.resume(unfinished[resume_id]["path"]))
+            except JournalLocked as exc:
+                st.error(f"{exc}. Finish or close it there first.")
+            else:
+                st.rerun()
+
+    coordinator = st.toggle("👀 Coordinator view (all stations)", key="coordinator")
+
+    with st.expander("🩺 Diagnostics"):
+        diagnostics = st.toggle("Show diagnostics page", key="diagnostics")
+
+# --- COORDINATOR VIEW ---
+@st.fragment(run_every=1)
+def coordinator_panel():
+    live = registry.sessions()
+    if not live:
+        st.info("No live sessions on this server.")
+        return
+    st.dataframe([{
+        "Station": s.station,
+        "Participant": s.participant,
+        "Session": s.session_id,
+        "Events": len(s.logs),
+        "Last Event": s.logs[-1]["Event"] if s.logs else "",
+        "Last Time": s.logs[-1]["Time"] if s.logs else "",
+    } for s in live], hide_index=True)
+
+    by_id = {s.session_id: s for s in live}
+    watched = st.selectbox("Watch session:", list(by_id),
+                           format_func=lambda sid: f"{by_id[sid].station} / {by_id[sid].participant} — {sid}",
+                           key="watch-session")
+    st.dataframe(by_id[watched].snapshot()[-20:], hide_index=True)
+
+if coordinator:
+    st.title("🛰️ Coordinator View")
+    st.write("Live sessions served by this process, refreshed every second. Read-only.")
+    coordinator_panel()
+    end_of_run()
+    st.stop()
+
+# --- DIAGNOSTICS ---
+if diagnostics:
+    st.title("🩺 Diagnostics")
+    st.write("Timings recorded by this server process since it started (all sessions).")
+    if metrics_exporter.path:
+        st.caption(f"Prometheus text file: `{metrics_exporter.path}` (every {metrics_exporter.interval:g} s)")
+    if metrics_exporter.address:
+        st.caption(f"Prometheus endpoint: {metrics_exporter.address}")
+    if metrics_exporter.last_error:
+        st.error(metrics_exporter.last_error)
+    st.dataframe(METRICS.rows(), hide_index=True)
+    st.download_button("📥 Download Metrics (Prometheus text)", METRICS.render, "copilot_metrics.prom",
+                       "text/plain", key="download-metrics")
+    end_of_run()
+    st.stop()
+
+# --- PROTOCOL PAGES ---
+if phase != EXPORT_PAGE:
+    active_phase = protocol.by_title(phase)
+    with RENDER_SECONDS.time(app="copilot", page=active_phase.id):
+        RENDERERS[active_phase.kind](active_phase)
+
+# --- EXPORT PAGE ---
+else:
+    render_started = time.perf_counter_ns()
     st.title("💾 Session Complete")
     st.write("Here is the timeline of events for this session. Download this to sync your Equivital/Video data.")
+    st.caption(session.clock.describe())
     
-    df_log = pd.DataFrame(st.session_state.logs)
+    if 'export' not in st.session_state:
+        st.session_state.export = ExportCache()
+    export = st.session_state.export
+    df_log = export.update(st.session_state.logs,
+                           session_columns(session.session_id, session.station, session.participant))
     st.dataframe(df_log)
     
-    # Create CSV
-    csv = df_log.to_csv(index=False).encode('utf-8')
-    
     st.download_button(
         "📥 Download Session Log (CSV)",
-        csv,
-        "session_logs.csv",
+        export.csv,
+        f"session_logs_{session.session_id}.csv",
         "text/csv",
         key='download-csv'
     )
+
+    if pa is not None:
+        col_a, col_b = st.columns(2)
+        col_a.download_button(
+            "📥 Download Session Log (Parquet)",
+            export.parquet,
+            f"session_logs_{session.session_id}.parquet",
+            "application/vnd.apache.parquet",
+            key='download-parquet'
+        )
+        col_b.download_button(
+            "📥 Download Session Log (Arrow IPC)",
+            export.arrow,
+            f"session_logs_{session.session_id}.arrow",
+            "application/vnd.apache.arrow.file",
+            key='download-arrow'
+        )
+    st.markdown("### 📏 Intervals")
+    df_intervals = pd.DataFrame(session.intervals.rows(), columns=INTERVAL_COLUMNS).astype({"Trial": "Int64"})
+    st.dataframe(df_intervals, hide_index=True)
+    for issue in session.intervals.issues:
+        st.error(issue)
+    st.download_button(
+        "📥 Download Intervals (CSV)",
+        df_intervals.to_csv(index=False).encode('utf-8'),
+        f"session_intervals_{session.session_id}.csv",
+        "text/csv",
+        key='download-intervals'
+    )
+
+    st.caption(f"Multi-hour sessions can be exported straight from the journal without loading it: "
+               f"`python protocol_export.py {session.journal.path} session_logs_{session.session_id}.parquet`")
+
+    st.markdown("---")
+    st.write("Once the log is downloaded, close the session so it is no longer offered for resume.")
+    if st.button("✅ Mark Session Finished", key="finish-session"):
+        registry.finish(session)
+        attach_session(open_session(*session.key))
+        st.rerun()
+    RENDER_SECONDS.observe((time.perf_counter_ns() - render_started) / 1e9, app="copilot", page="export")
+
+end_of_run()
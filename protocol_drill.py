@@ -0,0 +1,163 @@
+import hashlib
+import json
+import os
+import re
+import statistics
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+from protocol_journal import Journal, iter_records
+
+DRILL_DIR = os.environ.get("PROTOCOL_DRILL_DIR", "drills")
+SKEW_P95_MS = float(os.environ.get("PROTOCOL_SKEW_P95_MS", "80"))       # certification threshold
+MIN_ATTEMPTS = int(os.environ.get("PROTOCOL_DRILL_MIN_ATTEMPTS", "20"))  # valid attempts before p95 counts
+ATTEMPT_TIMEOUT_MS = 1500  # one hand alone for this long is recorded as a miss
+OPEN_JOURNALS = 16         # trainee files kept open for appending; the least recent is closed
+
+
+# --- ATTEMPTS ---
+# The browser stamps both presses with performance.now() and sends them
+# together, so the skew is measured client-side and never includes the
+# websocket round trip or rerun time.
+def skew_ms(left_ms, right_ms):
+    # Positive: the right hand (tablet) was late; negative: the left key was late
+    if left_ms is None or right_ms is None:
+        return None
+    return round(right_ms - left_ms, 3)
+
+def make_attempt(phase_id, expected_left, expected_right, pressed, now=None):
+    skew = skew_ms(pressed.get("left_ms"), pressed.get("right_ms"))
+    left_key = pressed.get("left_key")
+    return {
+        "attempt": pressed.get("id"),
+        "at": (now or datetime.now()).isoformat(timespec="milliseconds"),
+        "phase": phase_id,
+        "expected_left": expected_left,
+        "expected_right": expected_right,
+        "left_key": left_key,
+        "skew_ms": skew,
+        "status": "miss" if skew is None else ("wrong_key" if left_key != expected_left else "ok"),
+    }
+
+def p95(values):
+    if not values:
+        return None
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=20, method="inclusive")[18]
+
+
+# --- PER-TRAINEE DISTRIBUTION ---
+class SkewHistory:
+    def __init__(self, trainee, attempts=()):
+        self.trainee = trainee
+        self.attempts = list(attempts)
+
+    def add(self, attempt):
+        self.attempts.append(attempt)
+
+    def skews(self, phase_id=None):
+        # Absolute skew of valid attempts; misses and wrong keys are counted separately
+        return [abs(a["skew_ms"]) for a in self.attempts
+                if a["status"] == "ok" and (phase_id is None or a["phase"] == phase_id)]
+
+    def summary(self, phase_id=None):
+        attempts = [a for a in self.attempts if phase_id is None or a["phase"] == phase_id]
+        skews = self.skews(phase_id)
+        return {
+            "attempts": len(attempts),
+            "valid": len(skews),
+            "misses": sum(a["status"] == "miss" for a in attempts),
+            "wrong_keys": sum(a["status"] == "wrong_key" for a in attempts),
+            "p50_ms": round(statistics.median(skews), 1) if skews else None,
+            "p95_ms": round(p95(skews), 1) if skews else None,
+            "max_ms": round(max(skews), 1) if skews else None,
+        }
+
+    def certified(self, threshold_ms=SKEW_P95_MS, min_attempts=MIN_ATTEMPTS):
+        skews = self.skews()
+        return len(skews) >= min_attempts and p95(skews) < threshold_ms
+
+
+# --- DRILL STORE ---
+# Process-wide, like the session registry: one history per trainee, loaded
+# from drills/<trainee>-<hash>.jsonl on first use and appended to on every
+# attempt. The hash of the raw name keeps "A. Smith" and "a smith" apart.
+def trainee_path(trainee, directory=DRILL_DIR):
+    slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", trainee.strip()) or "anonymous"
+    digest = hashlib.sha1(trainee.encode("utf-8")).hexdigest()[:8]
+    return os.path.join(directory, f"{slug}-{digest}.jsonl")
+
+def legacy_trainee_path(trainee, directory=DRILL_DIR):
+    # Before the hash: shared by every name with the same slug
+    slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", trainee.strip()) or "anonymous"
+    return os.path.join(directory, f"{slug}.jsonl")
+
+def read_attempts(path, trainee=None):
+    if not os.path.exists(path):
+        return []
+    return [record for kind, record in iter_records(path)
+            if kind == "drill" and (trainee is None or record.get("trainee") == trainee)]
+
+class DrillStore:
+    def __init__(self, directory=DRILL_DIR, open_journals=OPEN_JOURNALS):
+        self.directory = directory
+        self.open_journals = open_journals
+        os.makedirs(directory, exist_ok=True)
+        self._histories = {}
+        self._journals = OrderedDict()  # trainee -> Journal, least recently used first
+        self._lock = threading.Lock()
+
+    def history(self, trainee):
+        with self._lock:
+            return self._load(trainee)
+
+    def _load(self, trainee):
+        if trainee not in self._histories:
+            # An older slug-only file can hold several trainees; each record names its own
+            attempts = (read_attempts(legacy_trainee_path(trainee, self.directory), trainee)
+                        + read_attempts(trainee_path(trainee, self.directory)))
+            self._histories[trainee] = SkewHistory(trainee, attempts)
+        return self._histories[trainee]
+
+    def _journal(self, trainee):
+        journal = self._journals.get(trainee)
+        if journal is None:
+            journal = self._journals[trainee] = Journal(trainee_path(trainee, self.directory))
+            while len(self._journals) > self.open_journals:
+                self._journals.popitem(last=False)[1].close()
+        self._journals.move_to_end(trainee)
+        return journal
+
+    def record(self, trainee, attempt):
+        with self._lock:
+            history = self._load(trainee)
+            if attempt["attempt"] is not None and any(a["attempt"] == attempt["attempt"] for a in history.attempts[-5:]):
+                return None  # the same client attempt delivered twice (rerun replay)
+            self._journal(trainee).append({"type": "drill", "trainee": trainee, **attempt})
+            history.add(attempt)
+        return attempt
+
+    def trainees(self):
+        names = set()
+        for name in os.listdir(self.directory):
+            if name.endswith(".jsonl"):
+                names.update(a["trainee"] for a in read_attempts(os.path.join(self.directory, name)) if "trainee" in a)
+        return sorted(names)
+
+    def close(self):
+        with self._lock:
+            for journal in self._journals.values():
+                journal.close()
+            self._journals.clear()
+
+
+if __name__ == "__main__":
+    import sys
+    # python protocol_drill.py [TRAINEE ...]: print each trainee's skew summary
+    store = DrillStore()
+    names = sys.argv[1:] or store.trainees()
+    for name in names:
+        history = store.history(name)
+        print(json.dumps({"trainee": name, "certified": history.certified(), **history.summary()}))
@@ -0,0 +1,170 @@
+import io
+import os
+import sys
+from itertools import islice
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as pa_ipc
+    import pyarrow.parquet as pq
+except ImportError:  # CSV export still works without pyarrow
+    pa = None
+
+from protocol_journal import iter_records
+
+# --- EVENT SCHEMA ---
+# Column order of the exported log; keys outside this list are kept as text.
+# Every row also names its session, so a downloaded file keeps its identity
+# whatever it is renamed to (protocol_catalog and protocol_align read it back).
+EVENT_COLUMNS = ["Seq", "Event", "Time", "Notes", "Wall Clock", "Monotonic (ns)", "Latency (ms)", "Source", "Confirms"]
+SESSION_COLUMNS = ["Session", "Station", "Participant"]
+
+def session_columns(session_id, station="", participant=""):
+    return {"Session": session_id, "Station": station or "", "Participant": participant or ""}
+
+def to_frame(rows, session=None):
+    # session: session_columns(...) for the rows, added as constant columns
+    df = pd.DataFrame.from_records(rows)
+    if session is not None:
+        for column, value in session.items():
+            df[column] = value
+    extra = [c for c in df.columns if c not in EVENT_COLUMNS + SESSION_COLUMNS]
+    df = df.reindex(columns=EVENT_COLUMNS + SESSION_COLUMNS + extra)
+    # Offsets differ across a DST change, so the column is normalised to UTC
+    df["Wall Clock"] = pd.to_datetime(df["Wall Clock"], format="ISO8601", utc=True)
+    df["Seq"] = df["Seq"].astype("Int64")
+    df["Monotonic (ns)"] = df["Monotonic (ns)"].astype("Int64")
+    df["Latency (ms)"] = df["Latency (ms)"].astype("float64")
+    df["Confirms"] = df["Confirms"].astype("Int64")
+    for column in ["Event", "Time", "Notes", "Source"] + SESSION_COLUMNS + extra:
+        df[column] = df[column].astype("string")
+    return df
+
+def arrow_schema():
+    return pa.schema([
+        ("Seq", pa.int64()),
+        ("Event", pa.string()),
+        ("Time", pa.string()),
+        ("Notes", pa.string()),
+        ("Wall Clock", pa.timestamp("us", tz="UTC")),
+        ("Monotonic (ns)", pa.int64()),
+        ("Latency (ms)", pa.float64()),
+        ("Source", pa.string()),
+        ("Confirms", pa.int64()),
+        ("Session", pa.string()),
+        ("Station", pa.string()),
+        ("Participant", pa.string()),
+    ])
+
+
+# --- INCREMENTAL EXPORT CACHE ---
+# Keeps the typed table for the live log and only converts events appended
+# since the last call. Encoded files are cached per format and dropped as
+# soon as the log grows, so a rerun with no new events costs nothing.
+class ExportCache:
+    def __init__(self):
+        self.reset()
+
+    def reset(self, source=None):
+        self.frame = to_frame([])
+        self.rows = 0
+        self._encoded = {}
+        self._source = source
+
+    def update(self, logs, session=None):
+        # A different list (new or resumed session) or a shrunk one means a rebuild
+        if logs is not self._source or len(logs) < self.rows:
+            self.reset(logs)
+        # One slice: other threads (triggers, tabs, the registry) keep appending
+        new_rows = logs[self.rows:]
+        if new_rows:
+            new = to_frame(new_rows, session)
+            self.frame = new if self.rows == 0 else pd.concat([self.frame, new], ignore_index=True)
+            self.rows += len(new_rows)
+            self._encoded.clear()
+        return self.frame
+
+    def _encode(self, fmt, encoder):
+        if fmt not in self._encoded:
+            self._encoded[fmt] = encoder(self.frame)
+        return self._encoded[fmt]
+
+    def csv(self):
+        return self._encode("csv", lambda df: df.to_csv(index=False).encode('utf-8'))
+
+    def parquet(self):
+        return self._encode("parquet", encode_parquet)
+
+    def arrow(self):
+        return self._encode("arrow", encode_arrow)
+
+
+def _arrow_table(df):
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+def encode_parquet(df):
+    buffer = io.BytesIO()
+    pq.write_table(_arrow_table(df), buffer)
+    return buffer.getvalue()
+
+def encode_arrow(df):
+    table = _arrow_table(df)
+    buffer = io.BytesIO()
+    with pa_ipc.new_file(buffer, table.schema) as writer:
+        writer.write_table(table)
+    return buffer.getvalue()
+
+
+# --- STREAMING WRITERS ---
+# Convert a journal batch by batch, so only batch_size events are in memory
+# at once no matter how long the session ran.
+def iter_batches(events, batch_size=10_000, session=None):
+    events = iter(events)
+    while True:
+        batch = list(islice(events, batch_size))
+        if not batch:
+            return
+        frame = to_frame(batch, session)
+        yield frame[EVENT_COLUMNS + SESSION_COLUMNS]
+
+def stream_csv(events, out_path, batch_size=10_000, session=None):
+    with open(out_path, "w", encoding="utf-8", newline="") as fh:
+        for i, frame in enumerate(iter_batches(events, batch_size, session)):
+            frame.to_csv(fh, index=False, header=(i == 0))
+
+def stream_parquet(events, out_path, batch_size=10_000, session=None):
+    schema = arrow_schema()
+    with pq.ParquetWriter(out_path, schema) as writer:
+        for frame in iter_batches(events, batch_size, session):
+            writer.write_table(pa.Table.from_pandas(frame, schema=schema, preserve_index=False))
+
+def stream_arrow(events, out_path, batch_size=10_000, session=None):
+    schema = arrow_schema()
+    with pa.OSFile(out_path, "wb") as sink, pa_ipc.new_file(sink, schema) as writer:
+        for frame in iter_batches(events, batch_size, session):
+            writer.write_table(pa.Table.from_pandas(frame, schema=schema, preserve_index=False))
+
+STREAM_WRITERS = {".csv": stream_csv, ".parquet": stream_parquet, ".arrow": stream_arrow}
+
+def export_journal(journal_path, out_path, batch_size=10_000):
+    suffix = out_path[out_path.rfind("."):].lower()
+    if suffix not in STREAM_WRITERS:
+        raise ValueError(f"Unsupported export format '{suffix}' (use {', '.join(STREAM_WRITERS)})")
+    if suffix != ".csv" and pa is None:
+        raise RuntimeError("pyarrow is required for Parquet/Arrow export")
+    records = iter_records(journal_path)
+    kind, header = next(records, (None, {}))
+    header = header if kind == "session" else {}
+    session = session_columns(header.get("session_id") or os.path.basename(journal_path)[:-len(".jsonl")],
+                              header.get("station"), header.get("participant"))
+    events = (record for kind, record in records if kind == "event")
+    STREAM_WRITERS[suffix](events, out_path, batch_size, session)
+
+
+if __name__ == "__main__":
+    # python protocol_export.py journals/<session>.jsonl session_logs.parquet
+    if len(sys.argv) != 3:
+        sys.exit("usage: python protocol_export.py JOURNAL.jsonl OUTPUT.{csv,parquet,arrow}")
+    export_journal(sys.argv[1], sys.argv[2])
@@ -0,0 +1,246 @@
+import argparse
+import ipaddress
+import json
+import logging
+import os
+import socket
+import statistics
+import struct
+import sys
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+DEFAULT_GROUP = "239.255.42.99"
+DEFAULT_PORT = 5556
+FANOUT = os.environ.get("PROTOCOL_FANOUT", "")  # "multicast", "<group>:<port>" or "host:port,host:port"
+FANOUT_IFACE = os.environ.get("PROTOCOL_FANOUT_IFACE", "0.0.0.0")
+PENDING_LIMIT = 10_000  # sent events kept around for matching late acks
+
+log = logging.getLogger(__name__)
+
+
+def parse_targets(spec):
+    # Returns (list of (host, port), is_multicast)
+    if spec in ("", "multicast"):
+        return [(DEFAULT_GROUP, DEFAULT_PORT)], True
+    targets = []
+    for item in spec.split(","):
+        host, _, port = item.strip().rpartition(":")
+        targets.append((host, int(port)))
+    return targets, all(_is_multicast(host) for host, _ in targets)
+
+def _is_multicast(host):
+    try:
+        return ipaddress.ip_address(host).is_multicast
+    except ValueError:  # a hostname
+        return False
+
+
+# --- PUBLISHER ---
+# Sends every logged event as one JSON datagram to the multicast group (or a
+# list of unicast hosts). Subscribers answer with an ack carrying their receive
+# time; the publisher turns acks into one-way and round-trip latencies and
+# journals them as "fanout" records next to the events.
+class EventPublisher:
+    def __init__(self, targets, multicast=True, iface=FANOUT_IFACE, ttl=1):
+        self.targets = targets
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+        self._sock.bind((iface if iface != "0.0.0.0" else "", 0))
+        if multicast:
+            self._sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, ttl)
+            self._sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 1)
+            self._sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF, socket.inet_aton(iface))
+        self._pending = OrderedDict()
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)  # subscriber -> one-way ms
+        self.sent = 0
+        self._closed = False
+        self._thread = threading.Thread(target=self._ack_loop, name="fanout-acks", daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def from_spec(cls, spec):
+        targets, multicast = parse_targets(spec)
+        return cls(targets, multicast)
+
+    def publish(self, session, entry):
+        message = {
+            "station": session.station,
+            "participant": session.participant,
+            "session": session.session_id,
+            "seq": entry["Seq"],
+            "event": entry["Event"],
+            "time": entry["Time"],
+            "mono_ns": entry["Monotonic (ns)"],
+            "event_wall_ns": session.clock.to_wall_ns(entry["Monotonic (ns)"]),
+            "sent_wall_ns": time.time_ns(),
+        }
+        payload = json.dumps(message).encode("utf-8")
+        sent_mono = time.monotonic_ns()
+        with self._lock:
+            self._pending[(session.session_id, entry["Seq"])] = (sent_mono, message["sent_wall_ns"], session.journal)
+            while len(self._pending) > PENDING_LIMIT:
+                self._pending.popitem(last=False)
+        for target in self.targets:
+            self._sock.sendto(payload, target)
+        self.sent += 1
+
+    def _ack_loop(self):
+        self._sock.settimeout(0.2)
+        while not self._closed:
+            try:
+                data, sender = self._sock.recvfrom(2048)
+            except socket.timeout:
+                continue
+            except OSError:
+                if not self._closed:
+                    log.exception("Fan-out ack listener stopped")
+                return
+            received_mono = time.monotonic_ns()
+            try:
+                ack = json.loads(data)
+                key = (str(ack["session"]), int(ack["seq"]))
+                recv_wall_ns = int(ack["recv_wall_ns"])
+            except (ValueError, KeyError, TypeError):
+                continue
+            with self._lock:
+                pending = self._pending.get(key)
+            if pending is None:
+                continue
+            sent_mono, sent_wall, journal = pending
+            subscriber = ack.get("subscriber", f"{sender[0]}:{sender[1]}")
+            one_way_ms = (recv_wall_ns - sent_wall) / 1e6
+            rtt_ms = (received_mono - sent_mono) / 1e6
+            self.latencies[subscriber].append(one_way_ms)
+            try:
+                journal.append({"type": "fanout", "session": key[0], "seq": key[1], "subscriber": subscriber,
+                                "one_way_ms": round(one_way_ms, 3), "rtt_ms": round(rtt_ms, 3)})
+            except ValueError:  # the session finished while the ack was in flight
+                continue
+
+    def stats(self):
+        return {name: {"n": len(v), "p50_ms": statistics.median(v), "max_ms": max(v)}
+                for name, v in list(self.latencies.items()) if v}
+
+    def close(self):
+        self._closed = True
+        self._thread.join()
+        self._sock.close()
+
+
+# --- SUBSCRIBER ---
+# Small client for the other lab machines: receives events, hands them to
+# on_event(message, latency_ms) and acks so the publisher can log delivery.
+class EventSubscriber:
+    def __init__(self, on_event, group=DEFAULT_GROUP, port=DEFAULT_PORT, iface=FANOUT_IFACE,
+                 name=None, multicast=True, ack=True):
+        self.on_event = on_event
+        self.name = name or socket.gethostname()
+        self.ack = ack
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if hasattr(socket, "SO_REUSEPORT"):
+            self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        self._sock.bind(("", port))
+        if multicast:
+            membership = struct.pack("4s4s", socket.inet_aton(group), socket.inet_aton(iface))
+            self._sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, membership)
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name=f"fanout-sub-{self.name}", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        self._sock.settimeout(0.2)
+        while not self._closed:
+            try:
+                data, sender = self._sock.recvfrom(4096)
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            recv_wall_ns = time.time_ns()
+            try:
+                message = json.loads(data)
+            except ValueError:
+                continue
+            if self.ack:
+                reply = {"session": message["session"], "seq": message["seq"],
+                         "subscriber": self.name, "recv_wall_ns": recv_wall_ns}
+                self._sock.sendto(json.dumps(reply).encode("utf-8"), sender)
+            self.on_event(message, (recv_wall_ns - message["sent_wall_ns"]) / 1e6)
+
+    def close(self):
+        self._closed = True
+        self._thread.join()
+        self._sock.close()
+
+
+# --- LOOPBACK SELF-TEST ---
+def loopback_test(subscribers=3, events=200, pace=0.002, port=DEFAULT_PORT + 1):
+    import tempfile
+    from protocol_registry import SessionRegistry
+
+    received = defaultdict(list)
+    subs = [EventSubscriber(lambda m, ms, i=i: received[i].append(ms), port=port, iface="127.0.0.1",
+                            name=f"loopback-{i}").start() for i in range(subscribers)]
+    publisher = EventPublisher([(DEFAULT_GROUP, port)], multicast=True, iface="127.0.0.1")
+    with tempfile.TemporaryDirectory() as directory:
+        registry = SessionRegistry(directory)
+        registry.add_hook(publisher.publish)
+        session = registry.open("loopback", "P000")
+        for i in range(events):
+            session.log(f"Fan-out event {i}")
+            time.sleep(pace)
+        time.sleep(0.5)
+        registry.finish(session)
+    for sub in subs:
+        sub.close()
+    publisher.close()
+    delivered = [ms for values in received.values() for ms in values]
+    return {
+        "subscribers": subscribers,
+        "events": events,
+        "delivered": len(delivered),
+        "acked": sum(s["n"] for s in publisher.stats().values()),
+        "p50_ms": round(statistics.median(delivered), 4) if delivered else None,
+        "max_ms": round(max(delivered), 4) if delivered else None,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Protocol Copilot event fan-out")
+    sub = parser.add_subparsers(dest="command", required=True)
+    listen = sub.add_parser("subscribe", help="Print events published by a copilot")
+    listen.add_argument("--group", default=DEFAULT_GROUP)
+    listen.add_argument("--port", type=int, default=DEFAULT_PORT)
+    listen.add_argument("--iface", default=FANOUT_IFACE)
+    listen.add_argument("--unicast", action="store_true", help="Listen for unicast datagrams instead of multicast")
+    listen.add_argument("--name", help="Name reported in acks (default: hostname)")
+    test = sub.add_parser("selftest", help="Loopback delivery latency test on this machine")
+    test.add_argument("--subscribers", type=int, default=3)
+    test.add_argument("--events", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    if args.command == "selftest":
+        print(json.dumps(loopback_test(args.subscribers, args.events), indent=2))
+        return 0
+
+    def show(message, latency_ms):
+        print(f"{message['station']} #{message['seq']:<5} {message['time']}  {message['event']}  "
+              f"(+{latency_ms:.2f} ms)", flush=True)
+
+    subscriber = EventSubscriber(show, args.group, args.port, args.iface, args.name, multicast=not args.unicast).start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        subscriber.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+import re
+
+# "<phase>[ Trial <n>] START|END|ABORTED", e.g. "Giladi Trial 3 END", "Baseline Sitting START"
+MARK_RE = re.compile(r"^(?P<key>(?P<phase>.+?)(?: Trial (?P<trial>\d+))?) (?P<mark>START|END|ABORTED)$")
+
+INTERVAL_COLUMNS = ["Phase", "Trial", "Start Seq", "End Seq", "Start Time", "End Time", "Duration (s)", "Status"]
+
+
+# --- INTERVAL INDEX ---
+# Pairs START/END events as they are logged. Each add() is O(1): open
+# intervals live in a dict keyed by phase+trial, so a missing or doubled
+# mark is flagged the moment it happens rather than during analysis.
+# Monotonic values restart with the machine, so times are kept on the wall
+# base of the anchor in force when they were stamped (offset_ns = anchor
+# wall minus anchor monotonic); an interval spanning a resume after a reboot
+# still gets its real duration.
+class IntervalIndex:
+    def __init__(self, entries=(), offset_ns=0):
+        self.offset_ns = offset_ns
+        self.open = {}        # key -> START entry
+        self.intervals = []   # closed (or abandoned) interval rows
+        self.issues = []      # human-readable problems, in the order they were found
+        self._opened = {}     # key -> START time on the wall base
+        for entry in entries:
+            self.add(entry)
+
+    @classmethod
+    def from_records(cls, records):
+        # (type, record) pairs from protocol_journal.iter_records; each session
+        # and resume record carries the anchor that stamped the events after it
+        index = cls()
+        for kind, record in records:
+            if kind in ("session", "resume") and "anchor_wall_ns" in record:
+                index.anchor(record["anchor_wall_ns"], record["anchor_monotonic_ns"])
+            elif kind == "event":
+                index.add(record)
+        return index
+
+    def anchor(self, wall_ns, monotonic_ns):
+        self.offset_ns = wall_ns - monotonic_ns
+
+    def add(self, entry):
+        match = MARK_RE.match(entry["Event"])
+        if match is None or entry.get("Source") == "trigger":
+            return None
+        key, mark = match["key"], match["mark"]
+
+        if mark == "START":
+            if key in self.open:
+                self._close(key, None, "unmatched")
+                self.issues.append(f"{key}: START at {entry['Time']} while already started; previous START has no END")
+            others = [k for k in self.open if k != key]
+            if others:
+                self.issues.append(f"{key}: START at {entry['Time']} overlaps open {', '.join(others)}")
+            self.open[key] = entry
+            self._opened[key] = entry["Monotonic (ns)"] + self.offset_ns
+            return None
+
+        if key not in self.open:
+            self.issues.append(f"{key}: {mark} at {entry['Time']} without a START")
+            row = self._row(match, None, entry, "unmatched")
+            self.intervals.append(row)
+            return row
+        return self._close(key, entry, "complete" if mark == "END" else "aborted")
+
+    def _close(self, key, end, status):
+        start = self.open.pop(key)
+        row = self._row(MARK_RE.match(start["Event"]), start, end, status, self._opened.pop(key))
+        self.intervals.append(row)
+        return row
+
+    def _row(self, match, start, end, status, opened_ns=None):
+        duration = None
+        if start is not None and end is not None:
+            duration = round((end["Monotonic (ns)"] + self.offset_ns - opened_ns) / 1e9, 3)
+        return {
+            "Phase": match["phase"],
+            "Trial": int(match["trial"]) if match["trial"] else None,
+            "Start Seq": start.get("Seq") if start else None,
+            "End Seq": end.get("Seq") if end else None,
+            "Start Time": start["Time"] if start else "",
+            "End Time": end["Time"] if end else "",
+            "Duration (s)": duration,
+            "Status": status,
+        }
+
+    def running(self, now_ns):
+        # Open intervals with their elapsed time, oldest first
+        now_ns += self.offset_ns
+        return [(key, (now_ns - self._opened[key]) / 1e9) for key in self.open]
+
+    def started_ns(self, key):
+        # When an open interval started, on the current monotonic base
+        return self._opened[key] - self.offset_ns if key in self._opened else None
+
+    def rows(self):
+        # Closed intervals plus whatever is still open, for export
+        rows = list(self.intervals)
+        for key, entry in self.open.items():
+            rows.append(self._row(MARK_RE.match(entry["Event"]), entry, None, "open", self._opened[key]))
+        return rows
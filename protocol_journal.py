@@ -0,0 +1,243 @@
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from protocol_metrics import JOURNAL_APPEND_SECONDS, JOURNAL_FSYNC_SECONDS
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, run one copilot per journal directory
+    fcntl = None
+
+JOURNAL_DIR = os.environ.get("PROTOCOL_JOURNAL_DIR", "journals")
+FSYNC_INTERVAL = 0.2  # seconds; upper bound on how much a crash can lose
+
+
+# --- JOURNAL ---
+# Append-only JSONL file, one record per line. Writes go to the OS page cache
+# immediately (so another process or a restart can read them back) and one
+# background thread for the whole process fsyncs every open journal at most
+# every FSYNC_INTERVAL, keeping the disk flush off the button-click path.
+# The file is locked for as long as it is open: a second process (another
+# copilot server, the terminal runner) appending with its own Seq counter
+# would corrupt it, so it gets JournalLocked instead.
+class JournalLocked(RuntimeError):
+    pass
+
+class Journal:
+    def __init__(self, path):
+        self.path = path
+        self._fh = open(path, "a", encoding="utf-8")
+        lock_file(self._fh, path)
+        repair_tail(path)
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()  # held across fsync, so close() can't pull the fd from under it
+        self._dirty = False
+        self._closed = False
+        _syncer.add(self)
+
+    def append(self, record):
+        started = time.perf_counter_ns()
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            if self._closed:
+                raise ValueError(f"Journal {self.path} is closed")
+            self._fh.write(line)
+            self._fh.flush()
+            self._dirty = True
+        JOURNAL_APPEND_SECONDS.observe((time.perf_counter_ns() - started) / 1e9)
+
+    def sync(self):
+        with self._sync_lock:
+            with self._lock:
+                if not self._dirty or self._fh.closed:
+                    return
+                self._dirty = False
+                fd = self._fh.fileno()
+            with JOURNAL_FSYNC_SECONDS.time():
+                os.fsync(fd)
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        _syncer.discard(self)
+        self.sync()
+        with self._sync_lock:
+            self._fh.close()
+
+    @property
+    def closed(self):
+        return self._closed
+
+
+class _Syncer:
+    # The shared fsync thread, started with the first journal
+    def __init__(self, interval=FSYNC_INTERVAL):
+        self.interval = interval
+        self._journals = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def add(self, journal):
+        with self._lock:
+            self._journals.add(journal)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="journal-fsync", daemon=True)
+                self._thread.start()
+
+    def discard(self, journal):
+        with self._lock:
+            self._journals.discard(journal)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                journals = list(self._journals)
+            for journal in journals:
+                journal.sync()
+
+_syncer = _Syncer()
+
+
+def lock_file(fh, path):
+    if fcntl is None:
+        return
+    try:
+        fcntl.flock(fh.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        fh.close()
+        raise JournalLocked(f"Session journal {path} is open in another process") from None
+
+def repair_tail(path, chunk=4096):
+    # A crash mid-append leaves a torn last line. Cut it off before appending,
+    # or the next record (typically the "resume" with the new clock anchor)
+    # would be glued onto it and skipped by every reader.
+    try:
+        fh = open(path, "r+b")
+    except FileNotFoundError:
+        return
+    with fh:
+        end = fh.seek(0, os.SEEK_END)
+        pos = end
+        while pos > 0:
+            size = min(chunk, pos)
+            pos -= size
+            fh.seek(pos)
+            newline = fh.read(size).rfind(b"\n")
+            if newline != -1:
+                pos += newline + 1
+                break
+        if pos != end:
+            fh.truncate(pos)
+
+
+# --- SESSION FILES ---
+def new_session_id():
+    return datetime.now().strftime("%Y%m%d-%H%M%S-") + uuid.uuid4().hex[:6]
+
+def session_path(session_id, directory=JOURNAL_DIR):
+    return os.path.join(directory, f"{session_id}.jsonl")
+
+def iter_records(path):
+    # A crash can leave a torn final line; anything that doesn't parse is skipped
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            yield record.pop("type", None), record
+
+def read_journal(path):
+    header, events, finished = {}, [], False
+    for kind, record in iter_records(path):
+        if kind == "session":
+            header = record
+        elif kind == "event":
+            events.append(record)
+        elif kind == "finish":
+            finished = True
+    return header, events, finished
+
+# Summaries keyed by path and only re-read when the file's size or mtime moves,
+# so listing sessions on every rerun doesn't re-parse every journal.
+_summary_cache = {}
+
+def summarize_journal(path):
+    stat = os.stat(path)
+    signature = (stat.st_mtime_ns, stat.st_size)
+    cached = _summary_cache.get(path)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+    header, events, finished = read_journal(path)
+    summary = {
+        "session_id": header.get("session_id", os.path.basename(path)[:-len(".jsonl")]),
+        "path": path,
+        "station": header.get("station", ""),
+        "participant": header.get("participant", ""),
+        "started": header.get("started", ""),
+        "events": len(events),
+        "finished": finished,
+    }
+    _summary_cache[path] = (signature, summary)
+    return summary
+
+def list_sessions(directory=JOURNAL_DIR):
+    if not os.path.isdir(directory):
+        return []
+    return [summarize_journal(os.path.join(directory, name))
+            for name in sorted(os.listdir(directory), reverse=True)
+            if name.endswith(".jsonl")]
+
+
+# One open Journal per file for the whole process, so several browser tabs
+# resuming the same session append through the same handle.
+_open_journals = {}
+_open_lock = threading.Lock()
+
+def open_journal(path):
+    with _open_lock:
+        journal = _open_journals.get(path)
+        if journal is None or journal.closed:
+            journal = Journal(path)
+            _open_journals[path] = journal
+        return journal
+
+def start_session(clock, directory=JOURNAL_DIR, session_id=None, station="", participant=""):
+    os.makedirs(directory, exist_ok=True)
+    session_id = session_id or new_session_id()
+    journal = open_journal(session_path(session_id, directory))
+    journal.append({
+        "type": "session",
+        "session_id": session_id,
+        "station": station,
+        "participant": participant,
+        "started": clock.to_datetime(clock.anchor_monotonic_ns).isoformat(timespec="seconds"),
+        "anchor_wall_ns": clock.anchor_wall_ns,
+        "anchor_monotonic_ns": clock.anchor_monotonic_ns,
+    })
+    return session_id, journal
+
+def resume_session(path, clock):
+    header, events, _ = read_journal(path)
+    journal = open_journal(path)
+    # Monotonic values restart with the process, so record the new anchor
+    journal.append({
+        "type": "resume",
+        "resumed": clock.to_datetime(clock.anchor_monotonic_ns).isoformat(timespec="seconds"),
+        "anchor_wall_ns": clock.anchor_wall_ns,
+        "anchor_monotonic_ns": clock.anchor_monotonic_ns,
+    })
+    return header, journal, events
+
+def finish_session(journal, clock=None):
+    # Dates come from the session clock when there is one, so a replay on a virtual clock is reproducible
+    finished = clock.to_datetime(clock.now_ns()) if clock is not None else datetime.now()
+    journal.append({"type": "finish", "finished": finished.isoformat(timespec="seconds")})
+    journal.close()
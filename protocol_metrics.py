@@ -0,0 +1,219 @@
+import bisect
+import os
+import statistics
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRICS_FILE = os.environ.get("PROTOCOL_METRICS_FILE", "")  # e.g. /var/lib/node_exporter/textfile/copilot.prom
+METRICS_PORT = int(os.environ.get("PROTOCOL_METRICS_PORT", "0") or 0)  # serves http://127.0.0.1:<port>/metrics
+METRICS_INTERVAL = 5.0  # seconds between text-file writes
+
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+RECENT = 2048  # observations per series kept for the diagnostics page percentiles
+
+
+# --- HISTOGRAMS ---
+# Prometheus-style cumulative buckets plus a short window of raw values, per
+# label set. observe() is a bisect and a few increments under a lock, cheap
+# enough to sit on the click path.
+class Histogram:
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0,
+                                              "recent": deque(maxlen=RECENT)}
+            series["counts"][bisect.bisect_left(self.buckets, value)] += 1
+            series["sum"] += value
+            series["recent"].append(value)
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.observe((time.perf_counter_ns() - started) / 1e9, **labels)
+
+    def snapshot(self):
+        with self._lock:
+            return {key: {"counts": list(s["counts"]), "sum": s["sum"], "recent": list(s["recent"])}
+                    for key, s in self._series.items()}
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        with self._lock:
+            if name not in self._histograms:
+                self._histograms[name] = Histogram(name, help, labelnames, buckets)
+            return self._histograms[name]
+
+    def render(self):
+        # Prometheus text exposition format 0.0.4
+        lines = []
+        for hist in self._histograms.values():
+            lines += [f"# HELP {hist.name} {hist.help}", f"# TYPE {hist.name} histogram"]
+            for key, series in sorted(hist.snapshot().items()):
+                labels = list(zip(hist.labelnames, key))
+                cumulative = 0
+                for bound, count in zip(hist.buckets + (float("inf"),), series["counts"]):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f"{hist.name}_bucket{_labels(labels + [('le', le)])} {cumulative}")
+                lines.append(f"{hist.name}_sum{_labels(labels)} {series['sum']!r}")
+                lines.append(f"{hist.name}_count{_labels(labels)} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+    def rows(self):
+        # One row per series for the diagnostics page, in milliseconds
+        rows = []
+        for hist in self._histograms.values():
+            for key, series in sorted(hist.snapshot().items()):
+                recent = sorted(series["recent"])
+                count = sum(series["counts"])
+                rows.append({
+                    "Metric": hist.name,
+                    "Labels": ", ".join(f"{n}={v}" for n, v in zip(hist.labelnames, key) if v),
+                    "Count": count,
+                    "Mean (ms)": round(series["sum"] / count * 1000, 3) if count else None,
+                    "p50 (ms)": round(statistics.median(recent) * 1000, 3) if recent else None,
+                    "p95 (ms)": round(recent[min(len(recent) - 1, int(len(recent) * 0.95))] * 1000, 3) if recent else None,
+                    "Max (ms)": round(recent[-1] * 1000, 3) if recent else None,
+                })
+        return rows
+
+
+def _labels(pairs):
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+# --- PROCESS-WIDE METRICS ---
+METRICS = MetricsRegistry()
+RERUN_SECONDS = METRICS.histogram(
+    "protocol_rerun_seconds", "Full script run, from the first line to the last widget", ("app", "trigger"))
+RENDER_SECONDS = METRICS.histogram(
+    "protocol_render_seconds", "Rendering of the selected page or module", ("app", "page"))
+LOG_EVENT_SECONDS = METRICS.histogram(
+    "protocol_log_event_seconds", "log_event call, stamping through journal append and hooks", ("app",))
+RUN_TIMER_SECONDS = METRICS.histogram(
+    "protocol_run_timer_seconds", "run_timer call, START logged and countdown scheduled", ("app",))
+TIMER_TICK_JITTER_SECONDS = METRICS.histogram(
+    "protocol_timer_tick_jitter_seconds", "Deviation of the timer panel tick interval from its schedule", ("app",))
+TIMER_DRIFT_SECONDS = METRICS.histogram(
+    "protocol_timer_drift_seconds", "How late a finished timer was noticed after its deadline", ("app",))
+JOURNAL_APPEND_SECONDS = METRICS.histogram(
+    "protocol_journal_append_seconds", "Journal append (write + flush to the page cache)")
+JOURNAL_FSYNC_SECONDS = METRICS.histogram(
+    "protocol_journal_fsync_seconds", "Background journal fsync")
+
+
+# --- RERUN TRIGGERS ---
+# Streamlit doesn't say which widget caused a rerun, so compare keyed widget
+# values with the ones left at the end of the previous run. Only plain values
+# are kept, which skips the session objects stored next to the widgets, and
+# "_" keys are app bookkeeping (tick stamps, nonces), never widgets. Every
+# action widget has a stable key, so the label is the same on every run.
+SNAPSHOT_KEY = "_metrics_widgets"
+PLAIN = (bool, int, float, str, type(None))
+
+def widget_snapshot(state):
+    return {k: state[k] for k in sorted(state.keys())
+            if not k.startswith("_") and isinstance(state[k], PLAIN)}
+
+def rerun_trigger(state):
+    previous = state.get(SNAPSHOT_KEY)
+    if previous is None:
+        return "initial"
+    changed = [(key, value) for key, value in widget_snapshot(state).items()
+               if previous.get(key, False if value is True else None) != value]
+    # A button clicked last run reads False again now; that is not what triggered this one
+    changed = [(key, value) for key, value in changed if not (value is False and previous.get(key) is True)]
+    # A click wins over a value that moved with it (e.g. a form's text inputs)
+    clicked = [key for key, value in changed if value is True]
+    return (clicked + [key for key, _ in changed] + ["other"])[0]  # other: fragment rerun, refresh
+
+
+# --- EXPORTERS ---
+def write_textfile(path, registry=METRICS):
+    # Atomic replace, as the node_exporter textfile collector expects
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        fh.write(registry.render())
+    os.replace(tmp, path)
+
+class MetricsExporter:
+    def __init__(self, path=METRICS_FILE, port=METRICS_PORT, registry=METRICS, interval=METRICS_INTERVAL):
+        self.path = path
+        self.port = port
+        self.registry = registry
+        self.interval = interval
+        self.last_error = None
+        self._stop = threading.Event()
+        self._server = None
+        if path:
+            threading.Thread(target=self._write_loop, name="metrics-textfile", daemon=True).start()
+        if port:
+            try:
+                self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+            except OSError as exc:  # port taken, e.g. by the other app: metrics must not stop the app
+                self.last_error = f"metrics endpoint on port {port}: {exc}"
+            else:
+                threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+
+    @property
+    def address(self):
+        return f"http://127.0.0.1:{self._server.server_address[1]}/metrics" if self._server else None
+
+    def _write_loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                write_textfile(self.path, self.registry)
+                self.last_error = None
+            except OSError as exc:
+                self.last_error = repr(exc)
+
+    def _handler(self):
+        registry = self.registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def close(self):
+        self._stop.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
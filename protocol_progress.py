@@ -0,0 +1,161 @@
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+PROGRESS_DB = os.environ.get("PROTOCOL_PROGRESS_DB", "progress.sqlite")
+POOL_SIZE = int(os.environ.get("PROTOCOL_PROGRESS_POOL", "8"))
+BUSY_TIMEOUT_MS = 5000  # another process (a second trainer server, a report) holding the write lock
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS trainees (
+    trainee TEXT PRIMARY KEY,
+    started_at REAL NOT NULL,
+    certified_at REAL
+);
+CREATE TABLE IF NOT EXISTS attempts (
+    id INTEGER PRIMARY KEY,
+    trainee TEXT NOT NULL,
+    module TEXT NOT NULL,
+    item TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    answer TEXT,
+    expected TEXT,
+    correct INTEGER NOT NULL,
+    at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS completions (
+    trainee TEXT NOT NULL,
+    module TEXT NOT NULL,
+    at REAL NOT NULL,
+    PRIMARY KEY (trainee, module)
+);
+CREATE INDEX IF NOT EXISTS attempts_trainee ON attempts (trainee, module);
+CREATE INDEX IF NOT EXISTS attempts_module ON attempts (module, correct);
+CREATE INDEX IF NOT EXISTS attempts_at ON attempts (at);
+"""
+
+
+# --- CONNECTION POOL ---
+# One SQLite file shared by every trainee's session. WAL lets the dashboard
+# read while answers are written; writes from this process go through one
+# lock, so they queue here in microseconds instead of spinning on SQLite's
+# busy handler. Each write is a single short transaction.
+class ConnectionPool:
+    def __init__(self, path=PROGRESS_DB, size=POOL_SIZE):
+        self.path = path
+        self._idle = queue.Queue()
+        self._write_lock = threading.Lock()
+        for _ in range(size):
+            conn = sqlite3.connect(path, check_same_thread=False, timeout=BUSY_TIMEOUT_MS / 1000)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._idle.put(conn)
+        with self.write() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def read(self):
+        conn = self._idle.get()
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+    @contextmanager
+    def write(self):
+        with self.read() as conn, self._write_lock, conn:
+            yield conn
+
+    def close(self):
+        while not self._idle.empty():
+            self._idle.get_nowait().close()
+
+
+# --- PROGRESS STORE ---
+class ProgressStore:
+    def __init__(self, path=PROGRESS_DB, size=POOL_SIZE):
+        self.pool = ConnectionPool(path, size)
+
+    def _enrol(self, conn, trainee, at):
+        conn.execute("INSERT OR IGNORE INTO trainees (trainee, started_at) VALUES (?, ?)", (trainee, at))
+
+    def record_attempt(self, trainee, module, item, kind, answer, expected, correct, at=None):
+        # kind: "simulation" (a dual-hand check) or "quiz"
+        at = time.time() if at is None else at
+        with self.pool.write() as conn:
+            self._enrol(conn, trainee, at)
+            conn.execute("INSERT INTO attempts (trainee, module, item, kind, answer, expected, correct, at)"
+                         " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                         (trainee, module, item, kind, answer, expected, int(bool(correct)), at))
+
+    def complete(self, trainee, module, at=None):
+        # The first completion counts; later ones are ignored
+        at = time.time() if at is None else at
+        with self.pool.write() as conn:
+            self._enrol(conn, trainee, at)
+            conn.execute("INSERT OR IGNORE INTO completions (trainee, module, at) VALUES (?, ?, ?)",
+                         (trainee, module, at))
+
+    def certify(self, trainee, at=None):
+        at = time.time() if at is None else at
+        with self.pool.write() as conn:
+            self._enrol(conn, trainee, at)
+            conn.execute("UPDATE trainees SET certified_at = ? WHERE trainee = ? AND certified_at IS NULL",
+                         (at, trainee))
+
+    def completed(self, trainee):
+        with self.pool.read() as conn:
+            return {module for (module,) in conn.execute(
+                "SELECT module FROM completions WHERE trainee = ?", (trainee,))}
+
+    # --- COHORT QUERIES ---
+    # Aggregated in SQL over the indexes; the dashboard only receives one row
+    # per trainee or per module.
+    def cohort(self, modules):
+        import pandas as pd
+        with self.pool.read() as conn:
+            df = pd.read_sql_query("""
+                SELECT t.trainee, t.started_at, t.certified_at,
+                       (SELECT COUNT(*) FROM completions c WHERE c.trainee = t.trainee) AS completed,
+                       (SELECT COUNT(*) FROM attempts a WHERE a.trainee = t.trainee) AS attempts,
+                       (SELECT SUM(1 - a.correct) FROM attempts a WHERE a.trainee = t.trainee) AS errors,
+                       (SELECT MAX(a.at) FROM attempts a WHERE a.trainee = t.trainee) AS last_seen
+                FROM trainees t ORDER BY t.started_at""", conn)
+        df["completion"] = df["completed"] / len(modules)
+        df["error_rate"] = (df["errors"] / df["attempts"]).where(df["attempts"] > 0)
+        df["hours_to_certify"] = ((df["certified_at"] - df["started_at"]) / 3600).round(2)
+        for column in ("started_at", "certified_at", "last_seen"):
+            df[column] = pd.to_datetime(df[column], unit="s", utc=True).dt.tz_convert(None)
+        return df
+
+    def module_stats(self):
+        import pandas as pd
+        with self.pool.read() as conn:
+            df = pd.read_sql_query("""
+                SELECT module, kind, COUNT(*) AS attempts, COUNT(DISTINCT trainee) AS trainees,
+                       SUM(1 - correct) AS errors
+                FROM attempts GROUP BY module, kind ORDER BY module, kind""", conn)
+            done = pd.read_sql_query("SELECT module, COUNT(*) AS completed FROM completions GROUP BY module", conn)
+        df["error_rate"] = (df["errors"] / df["attempts"]).round(3)
+        return df.merge(done, on="module", how="left").fillna({"completed": 0})
+
+    def hardest_items(self, limit=10):
+        import pandas as pd
+        with self.pool.read() as conn:
+            return pd.read_sql_query("""
+                SELECT module, item, COUNT(*) AS attempts, ROUND(AVG(1 - correct), 3) AS error_rate
+                FROM attempts GROUP BY module, item HAVING COUNT(*) >= 3
+                ORDER BY error_rate DESC, attempts DESC LIMIT ?""", conn, params=(limit,))
+
+    def close(self):
+        self.pool.close()
+
+
+if __name__ == "__main__":
+    # python protocol_progress.py [DB]: print the per-module summary
+    store = ProgressStore(sys.argv[1] if len(sys.argv) > 1 else PROGRESS_DB)
+    print(store.module_stats().to_string(index=False))
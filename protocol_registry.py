@@ -0,0 +1,196 @@
+import logging
+import os
+import socket
+import threading
+
+from protocol_clock import EventClock
+from protocol_intervals import IntervalIndex
+from protocol_timers import TimerEngine
+from protocol_journal import (JOURNAL_DIR, list_sessions, summarize_journal, iter_records,
+                              start_session, resume_session, finish_session)
+
+DEFAULT_STATION = os.environ.get("PROTOCOL_STATION", socket.gethostname())
+
+log = logging.getLogger(__name__)
+
+
+# --- SHARED SESSION ---
+# One live session per (station, participant), shared by every browser tab
+# attached to it. Stamping, sequencing and journaling happen under one lock,
+# so Seq order, time order and journal order always agree across clients.
+# Running timers belong to the session too, so a refresh or a second tab
+# sees the same countdowns and END is logged once.
+class SharedSession:
+    def __init__(self, session_id, station, participant, journal, clock, logs=None, hooks=(), intervals=None):
+        self.session_id = session_id
+        self.station = station
+        self.participant = participant
+        self.journal = journal
+        self.clock = clock
+        self.logs = logs if logs is not None else []
+        self.seq = max((e.get("Seq") or 0 for e in self.logs), default=0)
+        self.confirmed = {e["Confirms"] for e in self.logs if e.get("Confirms") is not None}
+        # A resumed session passes the index built from its journal's anchors
+        self.intervals = intervals if intervals is not None else IntervalIndex(self.logs)
+        self.intervals.anchor(clock.anchor_wall_ns, clock.anchor_monotonic_ns)
+        self.timers = TimerEngine(clock=clock.monotonic)
+        self.finished = False
+        self.hooks = hooks
+        self._lock = threading.Lock()
+
+    @property
+    def key(self):
+        return (self.station, self.participant)
+
+    def log(self, event_name, notes="", source_ns=None, at_ns=None, source="ui", confirms=None):
+        with self._lock:
+            entry = self._log(event_name, notes, source_ns, at_ns, source, confirms)
+        self._notify(entry)
+        return entry
+
+    def _notify(self, entry):
+        # Hooks (e.g. the fan-out publisher) run outside the lock and can't break logging
+        for hook in self.hooks:
+            try:
+                hook(self, entry)
+            except Exception:
+                log.exception("Session %s: hook %r failed on Seq %s", self.session_id, hook, entry["Seq"])
+
+    def _log(self, event_name, notes, source_ns, at_ns, source, confirms):
+        if self.finished:
+            raise ValueError(f"Session {self.session_id} is finished")
+        stamp = self.clock.stamp(source_ns, at_ns)
+        entry = {"Seq": self.seq + 1, "Event": event_name, "Time": stamp.pop("Time"), "Notes": notes, **stamp,
+                 "Source": source, "Confirms": confirms}
+        self.journal.append({"type": "event", **entry})
+        self.logs.append(entry)
+        self.intervals.add(entry)
+        self.seq += 1
+        return entry
+
+    def log_trigger(self, key, hw_ns, device=""):
+        # Written straight from the listener thread, stamped with the press time
+        return self.log(f"Trigger {key}", notes=device, source_ns=hw_ns, at_ns=hw_ns, source="trigger")
+
+    def confirm_trigger(self, trigger, event_name, notes=""):
+        # Logs event_name at the trigger's hardware time; each trigger can be confirmed once
+        with self._lock:
+            if trigger["Seq"] in self.confirmed:
+                return None
+            self.confirmed.add(trigger["Seq"])
+            notes = f"Confirmed trigger #{trigger['Seq']} ({trigger['Event'][len('Trigger '):]})" + (f"; {notes}" if notes else "")
+            entry = self._log(event_name, notes, trigger["Monotonic (ns)"], trigger["Monotonic (ns)"], "ui", trigger["Seq"])
+        self._notify(entry)
+        return entry
+
+    def pending_triggers(self, key=None, window_ns=None):
+        # Unconfirmed triggers, newest first, optionally only one key and only recent ones
+        now = self.clock.now_ns()
+        pending = []
+        for entry in reversed(self.snapshot()):
+            if entry.get("Source") != "trigger" or entry["Seq"] in self.confirmed:
+                continue
+            if window_ns is not None and now - entry["Monotonic (ns)"] > window_ns:
+                break
+            if key is None or entry["Event"] == f"Trigger {key}":
+                pending.append(entry)
+        return pending
+
+    def restore_timers(self, protocol):
+        # After a server restart the engine is empty: a timed step whose START
+        # has no END yet gets its countdown back, running from the logged START
+        for phase in protocol.phases:
+            for step in phase.steps:
+                started_ns = self.intervals.started_ns(step.event)
+                if step.duration and started_ns is not None and step.timer not in self.timers.timers:
+                    self.timers.start(step.timer, step.duration, step.timer, start_event=f"{step.event} START",
+                                      end_event=f"{step.event} END", done_message=step.done,
+                                      started_at=started_ns / 1e9)
+
+    def snapshot(self, since=0):
+        with self._lock:
+            return self.logs[since:]
+
+    def finish(self):
+        with self._lock:
+            if not self.finished:
+                self.finished = True
+                finish_session(self.journal, self.clock)
+
+
+# --- REGISTRY ---
+# Process-wide store of live sessions. The copilot keeps a single instance in
+# st.cache_resource, so every client of one server process sees the same state.
+# Each session anchors a clock of its own (new_clock()) when it starts or
+# resumes, so its header and resume records carry that moment; the registry's
+# clock only converts hardware wall times for the trigger sources.
+class SessionRegistry:
+    def __init__(self, directory=JOURNAL_DIR, clock=None, new_clock=EventClock):
+        self.directory = directory
+        self.new_clock = new_clock
+        self.clock = clock or new_clock()
+        self._sessions = {}
+        self._hooks = []
+        self._lock = threading.Lock()
+
+    def add_hook(self, hook):
+        # hook(session, entry) is called after every event logged in any session
+        self._hooks.append(hook)
+
+    def open(self, station, participant):
+        # Joins the live session for this key, else resumes its unfinished journal, else starts one
+        key = (station, participant)
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is not None and not session.finished:
+                return session
+            for summary in list_sessions(self.directory):
+                if not summary["finished"] and (summary["station"], summary["participant"]) == key:
+                    return self._resume(summary["path"])
+            return self._start(station, participant)
+
+    def start(self, station, participant, session_id=None):
+        # Always a new session (named session_id when given, e.g. by a replay)
+        with self._lock:
+            return self._start(station, participant, session_id)
+
+    def _start(self, station, participant, session_id=None):
+        clock = self.new_clock()
+        session_id, journal = start_session(clock, self.directory, session_id, station, participant)
+        return self._register(SharedSession(session_id, station, participant, journal, clock, hooks=self._hooks))
+
+    def resume(self, path):
+        with self._lock:
+            summary = summarize_journal(path)
+            session = self._sessions.get((summary["station"], summary["participant"]))
+            if session is not None and not session.finished:
+                return session
+            return self._resume(path)
+
+    def _resume(self, path):
+        clock = self.new_clock()
+        header, journal, logs = resume_session(path, clock)
+        intervals = IntervalIndex.from_records(iter_records(path))
+        return self._register(SharedSession(header.get("session_id"), header.get("station", ""),
+                                            header.get("participant", ""), journal, clock, logs,
+                                            hooks=self._hooks, intervals=intervals))
+
+    def _register(self, session):
+        self._sessions[session.key] = session
+        return session
+
+    def finish(self, session):
+        with self._lock:
+            session.finish()
+            if self._sessions.get(session.key) is session:
+                del self._sessions[session.key]
+
+    def for_station(self, station):
+        # The live session a station's hardware triggers belong to (latest opened wins)
+        with self._lock:
+            matches = [s for s in self._sessions.values() if s.station == station and not s.finished]
+            return matches[-1] if matches else None
+
+    def sessions(self):
+        with self._lock:
+            return sorted(self._sessions.values(), key=lambda s: s.key)
@@ -0,0 +1,292 @@
+import argparse
+import json
+import math
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+from protocol_clock import EventClock
+from protocol_journal import iter_records, read_journal, session_path
+from protocol_registry import SessionRegistry
+from protocol_spec import PROTOCOL_PATH, load_protocol
+from protocol_terminal import ProtocolRunner
+
+REPLAY_DIR = os.environ.get("PROTOCOL_REPLAY_DIR", "replays")
+# Scripts have no recorded anchor; they all start on the same fixed morning,
+# in UTC, so a scripted replay stamps the same times on every machine
+SCRIPT_WALL_NS = int(datetime(2025, 1, 6, 9, 0, tzinfo=timezone.utc).timestamp()) * 1_000_000_000
+SCRIPT_MONOTONIC_NS = 1_000_000_000_000
+
+
+# --- VIRTUAL CLOCK ---
+# Stands in for time.monotonic_ns / time.time_ns / time.monotonic. Time only
+# moves when the replay advances it, so the same input always produces the
+# same stamps, however fast (or instantly) it is played.
+class VirtualClock:
+    def __init__(self, monotonic_ns=SCRIPT_MONOTONIC_NS, wall_ns=SCRIPT_WALL_NS, speed=None):
+        self.now = monotonic_ns
+        self.wall_offset = wall_ns - monotonic_ns
+        self.speed = speed  # None: instant; 1.0: real time; 10.0: ten times faster
+
+    def monotonic_ns(self):
+        return self.now
+
+    def wall_ns(self):
+        return self.now + self.wall_offset
+
+    def monotonic(self):
+        return self.now / 1e9
+
+    def advance_to(self, ns):
+        if ns <= self.now:
+            return
+        if self.speed:
+            time.sleep((ns - self.now) / 1e9 / self.speed)
+        self.now = ns
+
+    def restart(self, monotonic_ns, wall_ns):
+        # A new process: the monotonic clock carries on from another base
+        if self.speed and wall_ns > self.wall_ns():
+            time.sleep((wall_ns - self.wall_ns()) / 1e9 / self.speed)
+        self.now = monotonic_ns
+        self.wall_offset = wall_ns - monotonic_ns
+
+
+# --- SCRIPTS ---
+# A script is a list of clicks, each {"at": seconds from the start (or
+# "at_ns"), "action": ...}:
+#   start    phase, step [, trigger: Seq of the press that started it]
+#   mark     phase, trial            toggles the trial's START/END
+#   confirm  phase                   the checklist confirm button
+#   trigger  key [, device]          a hardware press
+#   confirm_trigger  trigger, event  confirms a press as an event
+#   abort / pause / resume  [timer]
+#   tick                             poll timers now (journal replays only)
+#   log      event [, notes]         anything else
+#   restart  [anchor_monotonic_ns, anchor_wall_ns]
+#                                    the server restarts and resumes the session
+# Actions run in the order given; any action can carry latency_ms, how long
+# before "at" the click happened.
+def load_script(path):
+    with open(path, encoding="utf-8") as fh:
+        if path.endswith(".jsonl"):
+            return [json.loads(line) for line in fh if line.strip()]
+        if path.endswith(".json"):
+            return json.load(fh)
+        import yaml
+        return yaml.safe_load(fh)
+
+def script_from_journal(path, protocol):
+    # Turns a recorded session back into the clicks that produced it. Offsets
+    # come from wall time so sessions resumed in a later process line up.
+    header, _, _ = read_journal(path)
+    starts = {f"{step.event} START": (phase.id, step.id) for phase in protocol.phases for step in phase.steps}
+    timers = {f"{step.event} ABORTED": step.timer for phase in protocol.phases for step in phase.steps}
+    anchor = (header["anchor_wall_ns"], header["anchor_monotonic_ns"])
+    actions = []
+    for kind, record in iter_records(path):
+        if kind in ("session", "resume"):
+            anchor = (record["anchor_wall_ns"], record["anchor_monotonic_ns"])
+        if kind == "resume":
+            actions.append({"at_ns": record["anchor_wall_ns"] - header["anchor_wall_ns"], "action": "restart",
+                            "anchor_monotonic_ns": record["anchor_monotonic_ns"],
+                            "anchor_wall_ns": record["anchor_wall_ns"]})
+        if kind != "event":
+            continue
+        wall_ns = anchor[0] + (record["Monotonic (ns)"] - anchor[1])
+        action = {"at_ns": wall_ns - header["anchor_wall_ns"]}
+        if record.get("Latency (ms)") is not None:
+            action["latency_ms"] = record["Latency (ms)"]
+        name, notes = record["Event"], record.get("Notes") or ""
+        if record.get("Source") == "trigger":
+            action.update(action="trigger", key=name[len("Trigger "):], device=notes)
+        elif notes.startswith("Timer drift:"):
+            action.update(action="tick")
+        elif name in starts:
+            phase_id, step_id = starts[name]
+            action.update(action="start", phase=phase_id, step=step_id)
+            if record.get("Confirms") is not None:
+                action["trigger"] = record["Confirms"]
+        elif record.get("Confirms") is not None:
+            action.update(action="confirm_trigger", trigger=record["Confirms"], event=name)
+        elif name in timers:
+            action.update(action="abort", timer=timers[name])
+        else:
+            action.update(action="log", event=name, notes=notes)
+        actions.append(action)
+    return header, actions
+
+def _at_ns(action):
+    return action["at_ns"] if "at_ns" in action else round(action["at"] * 1e9)
+
+
+# --- REPLAY ---
+def apply(runner, action, at_ns):
+    kind = action["action"]
+    source_ns = at_ns - round(action["latency_ms"] * 1e6) if action.get("latency_ms") is not None else None
+    session = runner.session
+    if kind == "start":
+        runner.goto(action["phase"], step_id=action["step"])
+        trigger = _entry(session, action["trigger"]) if action.get("trigger") is not None else None
+        runner.start_step(runner.step, source_ns, trigger)
+    elif kind == "mark":
+        runner.goto(action["phase"], trial=action["trial"])
+        runner.mark_trial(source_ns)
+    elif kind == "confirm":
+        runner.goto(action["phase"])
+        runner.primary(source_ns)
+    elif kind == "trigger":
+        session.log_trigger(action["key"], at_ns, action.get("device", "replay"))
+    elif kind == "confirm_trigger":
+        session.confirm_trigger(_entry(session, action["trigger"]), action["event"], action.get("notes", ""))
+    elif kind == "abort":
+        runner.abort(source_ns, action.get("timer"))
+    elif kind in ("pause", "resume"):
+        runner.pause_resume()
+    elif kind == "tick":
+        runner.tick()
+    elif kind == "log":
+        runner.log(action["event"], action.get("notes", ""), source_ns)
+    else:
+        raise ValueError(f"Unknown replay action '{kind}'")
+
+def _entry(session, seq):
+    return next(e for e in session.logs if e["Seq"] == seq)
+
+def replay(protocol, actions, directory=REPLAY_DIR, station="replay", participant="", session_id="replay",
+           monotonic_ns=SCRIPT_MONOTONIC_NS, wall_ns=SCRIPT_WALL_NS, speed=None, auto_ticks=True, finish=True,
+           tz=timezone.utc):
+    # auto_ticks: timers complete exactly at their deadlines (scripts). Journal
+    # replays turn it off and complete timers where the recording did.
+    # tz: the zone wall times are written in; None is this machine's local zone.
+    path = session_path(session_id, directory)
+    if os.path.exists(path):
+        raise FileExistsError(f"{path} already exists")
+    clock = VirtualClock(monotonic_ns, wall_ns, speed)
+    new_clock = lambda: EventClock(clock.monotonic_ns, clock.wall_ns, tz)
+    registry = SessionRegistry(directory, new_clock=new_clock)
+    # Never resumes: another unfinished replay with this station/participant is left alone
+    session = registry.start(station, participant, session_id)
+    runner = ProtocolRunner(protocol, session)
+
+    def run_timers_until(limit_ns):
+        while auto_ticks:
+            deadline = runner.timers.next_deadline()
+            if deadline is None or deadline * 1e9 > limit_ns:
+                return
+            clock.advance_to(math.ceil(deadline * 1e9))
+            if not runner.tick():
+                clock.advance_to(clock.now + 1)  # float rounding left us a nanosecond short
+
+    for action in actions:
+        # In order, not sorted: presses are backdated to the hardware time, so a
+        # trigger can carry an earlier "at" than the click logged just before it
+        at_ns = wall_ns + _at_ns(action) - clock.wall_offset
+        run_timers_until(at_ns)
+        if action["action"] == "restart":
+            # As after a real restart: the journal is left unfinished, then a new
+            # registry resumes it on the new clock base and restores its timers
+            session.journal.close()
+            clock.restart(action.get("anchor_monotonic_ns", SCRIPT_MONOTONIC_NS),
+                          action.get("anchor_wall_ns", wall_ns + _at_ns(action)))
+            registry = SessionRegistry(directory, new_clock=new_clock)
+            session = registry.resume(session.journal.path)
+            runner = ProtocolRunner(protocol, session)
+            continue
+        clock.advance_to(at_ns)
+        apply(runner, action, at_ns)
+    run_timers_until(math.inf)
+    if finish:
+        registry.finish(session)
+    else:
+        session.journal.close()
+    return session
+
+def replay_journal(protocol, path, directory=REPLAY_DIR, speed=None, session_id=None):
+    header, actions = script_from_journal(path, protocol)
+    # Wall times keep the recording's UTC offset, whatever this machine's zone
+    # (older journals without an offset replay in local time)
+    tz = datetime.fromisoformat(header["started"]).tzinfo if header.get("started") else None
+    return replay(protocol, actions, directory, header.get("station", ""), header.get("participant", ""),
+                  session_id or f"{header['session_id']}-replay", header["anchor_monotonic_ns"],
+                  header["anchor_wall_ns"], speed, auto_ticks=False, finish=read_journal(path)[2], tz=tz)
+
+
+# --- CHECKING ---
+# Timer ENDs are re-derived from the deadline, so their drift notes and
+# latency may differ from a live recording by microseconds; everything the
+# protocol logic decides must match exactly. Wall Clock is compared as an
+# instant: a recording that crossed a DST change switched offsets mid-session,
+# the replay keeps the offset it started with.
+def compare_events(original, replayed):
+    problems = []
+    if len(original) != len(replayed):
+        problems.append(f"{len(original)} events recorded, {len(replayed)} replayed")
+    for a, b in zip(original, replayed):
+        same_instant = _instant(a.get("Wall Clock")) == _instant(b.get("Wall Clock"))
+        for field in ("Seq", "Event", "Time", "Wall Clock", "Monotonic (ns)", "Source", "Confirms", "Notes"):
+            if field == "Notes" and (a.get("Notes") or "").startswith("Timer drift:"):
+                continue
+            if field in ("Time", "Wall Clock") and same_instant:
+                continue
+            if a.get(field) != b.get(field):
+                problems.append(f"#{a.get('Seq')} {field}: {a.get(field)!r} != {b.get(field)!r}")
+    return problems
+
+def _instant(value):
+    stamp = datetime.fromisoformat(value) if value else None
+    return stamp.astimezone(timezone.utc) if stamp is not None else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a session journal or a click script on a virtual clock")
+    parser.add_argument("source", help="Recorded journal (.jsonl with a session header) or script (.yaml/.json/.jsonl)")
+    parser.add_argument("--speed", type=float, default=0, help="Playback speed; 0 (default) is instant, 1 is real time")
+    parser.add_argument("--spec", default=PROTOCOL_PATH)
+    parser.add_argument("--out", default=REPLAY_DIR, help="Directory for the replayed journal")
+    parser.add_argument("--session-id", help="Name of the replayed session (default: derived from the source)")
+    parser.add_argument("--force", action="store_true", help="Replace an earlier replay with the same session id")
+    parser.add_argument("--check", action="store_true", help="Compare the replay with the recorded journal")
+    parser.add_argument("--export", metavar="FILE", help="Also export the replayed log (.csv, .parquet or .arrow)")
+    args = parser.parse_args(argv)
+
+    protocol = load_protocol(args.spec)
+    speed = args.speed or None
+    is_journal = args.source.endswith(".jsonl") and next(iter_records(args.source), (None,))[0] == "session"
+    if is_journal:
+        session_id = args.session_id or f"{read_journal(args.source)[0]['session_id']}-replay"
+    else:
+        session_id = args.session_id or os.path.splitext(os.path.basename(args.source))[0]
+    path = session_path(session_id, args.out)
+    if os.path.exists(path):
+        if not args.force:
+            parser.error(f"{path} already exists (pass --force to replace it)")
+        os.remove(path)
+
+    started = time.perf_counter()
+    if is_journal:
+        session = replay_journal(protocol, args.source, args.out, speed, session_id)
+    else:
+        session = replay(protocol, load_script(args.source), args.out, session_id=session_id, speed=speed)
+    elapsed = time.perf_counter() - started
+    print(f"Replayed {len(session.logs)} events in {elapsed:.3f} s -> {session.journal.path}")
+
+    status = 0
+    if args.check:
+        if not is_journal:
+            parser.error("--check needs a recorded journal as the source")
+        problems = compare_events(read_journal(args.source)[1], session.logs)
+        for problem in problems:
+            print(problem)
+        print("Replay matches the recording." if not problems else f"{len(problems)} difference(s).")
+        status = 1 if problems else 0
+    if args.export:
+        from protocol_export import export_journal
+        export_journal(session.journal.path, args.export)
+        print(f"Exported {args.export}")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+from protocol_timers import ABORTED, DONE, PAUSED, format_remaining
+
+
+# --- RUNNER CORE ---
+# The protocol actions every front end shares: starting a timed step (from a
+# click or a confirmed hardware trigger), marking trials, pausing, aborting
+# and completing timers. The copilot and the terminal runner only decide how
+# to present the result, so both log the same events by the same rules.
+# log(event_name, notes, source_ns) and say(text) are the front end's own;
+# say gets the messages that don't come back as a return value.
+class ProtocolCore:
+    def __init__(self, protocol, session, log=None, say=None):
+        self.protocol = protocol
+        self.session = session
+        self.timers = session.timers
+        self.log = log or (lambda event_name, notes="", source_ns=None: session.log(event_name, notes, source_ns))
+        self.say = say or (lambda text: None)
+
+    def start_step(self, step, source_ns=None, trigger=None):
+        # With a hardware trigger, START is logged and the countdown begins at the press.
+        # Under the engine lock, so two tabs starting the same step log one START.
+        with self.timers.lock:
+            timer = self.timers.timers.get(step.timer)
+            if timer is not None and timer.state not in (DONE, ABORTED):
+                self.say(f"{step.timer} is already running.")
+                return None
+            started_at = None
+            if trigger is None:
+                self.log(f"{step.event} START", source_ns=source_ns)
+            elif self.session.confirm_trigger(trigger, f"{step.event} START") is not None:
+                started_at = trigger["Monotonic (ns)"] / 1e9
+            else:
+                return None
+            return self.timers.start(step.timer, step.duration, step.timer, start_event=f"{step.event} START",
+                                     end_event=f"{step.event} END", done_message=step.done, started_at=started_at)
+
+    def next_mark(self, phase, trial):
+        # The same press starts and stops a trial: END if its last mark was a START
+        event = phase.options["event"].format(n=trial)
+        last = next((e["Event"] for e in reversed(self.session.logs) if e["Event"].startswith(f"{event} ")), "")
+        return f"{event} END" if last.endswith("START") else f"{event} START"
+
+    def mark_trial(self, phase, trial, source_ns=None, trigger=None):
+        # Returns the logged entry (None if the trigger was already confirmed)
+        mark = self.next_mark(phase, trial)
+        if trigger is not None:
+            return self.session.confirm_trigger(trigger, mark)
+        return self.log(mark, source_ns=source_ns)
+
+    def pause_resume(self, key=None):
+        # Toggles the given timer, else the newest one still running
+        with self.timers.lock:
+            for timer_key, timer in reversed(self.timers.items()):
+                if key not in (None, timer_key):
+                    continue
+                if timer.state == PAUSED:
+                    return self.timers.resume(timer_key)
+                if timer.state not in (DONE, ABORTED):
+                    return self.timers.pause(timer_key)
+        return None
+
+    def abort(self, key=None, source_ns=None):
+        # Aborts the given timer, else the newest one still running, and logs ABORTED once
+        with self.timers.lock:
+            now = self.timers.clock()
+            for timer_key, timer in reversed(self.timers.items()):
+                if timer.state not in (DONE, ABORTED) and key in (None, timer_key):
+                    remaining = timer.remaining(now)
+                    self.timers.abort(timer_key)
+                    self.log(f"{timer.start_event.replace(' START', '')} ABORTED",
+                             notes=f"{format_remaining(remaining)} remaining", source_ns=source_ns)
+                    return timer
+        return None
+
+    def dismiss(self, key=None):
+        # The given timer, else every finished one
+        for timer_key, timer in self.timers.items():
+            if key in (None, timer_key) and timer.state in (DONE, ABORTED):
+                self.timers.dismiss(timer_key)
+
+    def tick(self):
+        # Logs END for every timer that completed and returns them. END is stamped
+        # when the poll sees it; the deadline is the source, so Latency is the poll lag
+        finished = self.timers.poll()
+        for timer in finished:
+            self.log(timer.end_event, notes=f"Timer drift: {timer.drift * 1000:+.1f} ms",
+                     source_ns=int(timer.deadline * 1e9))
+        return finished
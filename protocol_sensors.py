@@ -0,0 +1,289 @@
+import os
+import tempfile
+import threading
+import time
+import warnings
+
+import numpy as np
+
+SENSOR_SOURCE = os.environ.get("PROTOCOL_SENSOR_SOURCE", "")  # synthetic[:<channel>=<fault>,...] or lsl
+SENSOR_DIR = os.environ.get("PROTOCOL_SENSOR_DIR", os.path.join(
+    "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir(), "protocol-sensors"))
+
+RING_SECONDS = 60      # history kept per device; fixes the ring (and memory) size
+PREVIEW_SECONDS = 10   # window plotted and checked for quality
+PREVIEW_POINTS = 400   # points per channel sent to the browser, whatever the window holds
+
+# One ring per device. Ranges are the sensor's full scale, used for clipping.
+DEVICES = {
+    "opal": {"label": "OPAL", "rate": 128, "unit": "m/s²", "range": (-156.9, 156.9), "lsl": "OPAL",
+             "channels": ["Left Shin", "Right Shin", "Left Foot", "Right Foot", "Sacrum"]},
+    "equivital": {"label": "Equivital", "rate": 256, "unit": "mV", "range": (-5.0, 5.0), "lsl": "Equivital",
+                  "channels": ["ECG Lead 1", "ECG Lead 2", "Respiration"]},
+}
+
+FLAT_PTP = 1e-3        # peak-to-peak (in channel units) below which a channel is flat
+CLIP_MARGIN = 0.005    # fraction of full scale counted as "at the rail"
+CLIP_FRACTION = 0.01   # samples at the rail before a channel is flagged
+DROPOUT_FRACTION = 0.05
+
+
+# --- RING BUFFER ---
+# Fixed-size, memory-mapped (tmpfs when available): an int64 header
+# [capacity, channels, written, pending], a float64 time ring and a float32
+# sample ring. One writer thread; readers (here or in another process) only
+# copy the window they need, so memory is flat however long the session runs.
+# Sample i lives in slot i % capacity. The writer bumps `pending` before it
+# touches a slot and `written` after, so a reader can tell from `pending`
+# whether the slots it copied were overwritten meanwhile, and retries (or,
+# out of retries, drops the overwritten part).
+HEADER = 4
+READ_RETRIES = 3
+
+class RingBuffer:
+    def __init__(self, path, capacity=None, channels=None):
+        if capacity is not None:
+            size = HEADER * 8 + capacity * 8 + capacity * channels * 4
+            with open(path, "wb") as fh:
+                fh.truncate(size)
+            header = np.memmap(path, np.int64, "r+", shape=(HEADER,))
+            header[:] = (capacity, channels, 0, 0)
+            header.flush()
+        self.path = path
+        self._header = np.memmap(path, np.int64, "r+", shape=(HEADER,))
+        self.capacity, self.channels = int(self._header[0]), int(self._header[1])
+        self.times = np.memmap(path, np.float64, "r+", offset=HEADER * 8, shape=(self.capacity,))
+        self.values = np.memmap(path, np.float32, "r+", offset=HEADER * 8 + self.capacity * 8,
+                                shape=(self.capacity, self.channels))
+
+    @property
+    def written(self):
+        return int(self._header[2])
+
+    def write(self, times, values):
+        times, values = times[-self.capacity:], values[-self.capacity:]
+        n = len(times)
+        if not n:
+            return
+        written = self.written
+        self._header[3] = written + n
+        start = written % self.capacity
+        first = min(n, self.capacity - start)
+        self.times[start:start + first] = times[:first]
+        self.values[start:start + first] = values[:first]
+        if first < n:
+            self.times[:n - first] = times[first:]
+            self.values[:n - first] = values[first:]
+        self._header[2] = written + n  # published last, so readers never see unwritten slots
+
+    def window(self, seconds):
+        # Samples from the last `seconds`, oldest first, as copies
+        for _ in range(READ_RETRIES):
+            written = self.written
+            count = min(written, self.capacity)
+            if not count:
+                return np.empty(0), np.empty((0, self.channels), np.float32)
+            end = written % self.capacity
+            since = self.times[(written - 1) % self.capacity] - seconds
+            # Oldest samples are in [end:] once wrapped, newest in [:end]; each
+            # part is sorted, so a binary search finds the window start
+            # without touching the rest of the ring
+            if count == self.capacity and end and self.times[-1] >= since:
+                first = end + int(np.searchsorted(self.times[end:], since, side="left"))
+                times = np.concatenate((self.times[first:], self.times[:end]))
+                values = np.concatenate((self.values[first:], self.values[:end]))
+                oldest = written - (self.capacity - first) - end
+            else:
+                stop = end or count
+                first = int(np.searchsorted(self.times[:stop], since, side="left"))
+                times, values = np.array(self.times[first:stop]), np.array(self.values[first:stop])
+                oldest = written - (stop - first)
+            lapped = int(self._header[3]) - self.capacity - oldest  # copied samples overwritten meanwhile
+            if lapped <= 0:
+                return times, values
+        return times[lapped:], values[lapped:]  # still being lapped: only the part known to be intact
+
+
+# --- DOWNSAMPLING ---
+def minmax(times, values, points=PREVIEW_POINTS):
+    # Min/max envelope per bucket over all channels at once: every spike
+    # survives, and the output size is fixed by `points`, not the window.
+    buckets = points // 2
+    if len(times) <= points or buckets == 0:
+        return times, values
+    usable = len(times) // buckets * buckets
+    t = times[-usable:].reshape(buckets, -1)
+    v = values[-usable:].reshape(buckets, -1, values.shape[1])
+    out_t = np.column_stack((t[:, 0], t[:, -1])).ravel()
+    with warnings.catch_warnings():  # all-NaN buckets (dropouts) stay NaN and show as gaps
+        warnings.simplefilter("ignore", RuntimeWarning)
+        out_v = np.stack((np.nanmin(v, axis=1), np.nanmax(v, axis=1)), axis=1).reshape(-1, values.shape[1])
+    return out_t, out_v
+
+# --- QUALITY FLAGS ---
+def quality(times, values, rate, full_scale, seconds=PREVIEW_SECONDS):
+    # Per-channel flags over the window: flatline, clipping and dropouts
+    # (missing samples against the nominal rate, NaNs, gaps)
+    channels = values.shape[1]
+    if len(times) < 2:
+        return [{"flags": ["no data"], "dropout": 1.0} for _ in range(channels)]
+    span = min(seconds, times[-1] - times[0] + 1 / rate)
+    expected = max(span * rate, 1)
+    gaps = np.diff(times) > 2.5 / rate
+    missing_rate = max(0.0, 1 - len(times) / expected)
+    nan = np.isnan(values)
+    dropout = np.clip(missing_rate + nan.mean(axis=0), 0, 1)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        ptp = np.nanmax(values, axis=0) - np.nanmin(values, axis=0)
+    lo, hi = full_scale
+    margin = (hi - lo) * CLIP_MARGIN
+    clipped = ((values <= lo + margin) | (values >= hi - margin)).mean(axis=0)
+
+    report = []
+    for c in range(channels):
+        flags = []
+        if nan[:, c].all():
+            flags.append("no data")
+        elif ptp[c] < FLAT_PTP:
+            flags.append("flatline")
+        if clipped[c] > CLIP_FRACTION:
+            flags.append("clipping")
+        if dropout[c] > DROPOUT_FRACTION or gaps.any():
+            flags.append("dropouts")
+        report.append({"flags": flags, "dropout": float(dropout[c]), "clipped": float(clipped[c]),
+                       "ptp": float(ptp[c]) if not np.isnan(ptp[c]) else None})
+    return report
+
+
+# --- SOURCES ---
+# read(timeout) returns (times [n], values [n, channels]) or None.
+class SyntheticSource:
+    # Movement-like signals for tests and demos, generated in vectorized
+    # chunks. faults maps channel name -> "flatline" | "clipping" | "dropouts".
+    def __init__(self, device, faults=None, seed=0):
+        self.rate = device["rate"]
+        self.channels = device["channels"]
+        self.full_scale = device["range"]
+        self.faults = faults or {}
+        self._rng = np.random.default_rng(seed)
+        self._phase = self._rng.uniform(0, 2 * np.pi, len(self.channels))
+        self._next = time.monotonic()
+
+    def read(self, timeout):
+        time.sleep(timeout)
+        now = time.monotonic()
+        n = int((now - self._next) * self.rate)
+        if n <= 0:
+            return None
+        times = self._next + np.arange(n) / self.rate
+        self._next += n / self.rate
+        lo, hi = self.full_scale
+        amplitude = (hi - lo) * 0.1
+        values = (amplitude * np.sin(2 * np.pi * 1.2 * times[:, None] + self._phase)
+                  + self._rng.normal(0, amplitude * 0.05, (n, len(self.channels)))).astype(np.float32)
+        for c, name in enumerate(self.channels):
+            fault = self.faults.get(name)
+            if fault == "flatline":
+                values[:, c] = 0.25
+            elif fault == "clipping":
+                values[:, c] = np.clip(values[:, c] * 12, lo, hi)
+            elif fault == "dropouts":
+                values[self._rng.random(n) < 0.3, c] = np.nan
+        return times, values
+
+    def close(self):
+        pass
+
+
+class LslSource:
+    # Lab Streaming Layer inlet (the OPAL and Equivital bridges publish one
+    # stream each). pylsl is only needed when this source is used.
+    def __init__(self, device, timeout=2.0):
+        import pylsl
+        streams = pylsl.resolve_byprop("name", device["lsl"], timeout=timeout)
+        if not streams:
+            raise RuntimeError(f"No LSL stream named '{device['lsl']}'")
+        self._inlet = pylsl.StreamInlet(streams[0], max_chunklen=int(device["rate"] // 10) or 1)
+
+    def read(self, timeout):
+        samples, stamps = self._inlet.pull_chunk(timeout=timeout)
+        if not stamps:
+            return None
+        return np.asarray(stamps, dtype=np.float64), np.asarray(samples, dtype=np.float32)
+
+    def close(self):
+        self._inlet.close_stream()
+
+
+def open_sources(spec):
+    # "synthetic" or "synthetic:Right Foot=flatline,ECG Lead 2=clipping"; "lsl"
+    kind, _, arg = spec.partition(":")
+    if kind == "synthetic":
+        faults = dict(item.split("=", 1) for item in arg.split(",") if "=" in item)
+        return {key: SyntheticSource(device, faults, seed=i) for i, (key, device) in enumerate(DEVICES.items())}
+    if kind == "lsl":
+        return {key: LslSource(device) for key, device in DEVICES.items()}
+    raise ValueError(f"Unknown sensor source '{spec}' (use synthetic[:<channel>=<fault>,...] or lsl)")
+
+
+def _remove_stale_rings(directory, key):
+    # Rings are named <device>-<pid>.ring; drop those left by processes that died
+    for name in os.listdir(directory):
+        stem, _, pid = name[:-len(".ring")].rpartition("-")
+        if stem != key or not name.endswith(".ring") or not pid.isdigit():
+            continue
+        try:
+            os.kill(int(pid), 0)
+        except ProcessLookupError:
+            os.remove(os.path.join(directory, name))
+        except PermissionError:  # alive, owned by someone else
+            pass
+
+
+# --- FEED ---
+# Pulls chunks from a source on a daemon thread into the device's ring.
+class SensorFeed:
+    def __init__(self, key, source, directory=SENSOR_DIR, poll=0.05):
+        self.key = key
+        self.device = DEVICES[key]
+        self.source = source
+        self.poll = poll
+        os.makedirs(directory, exist_ok=True)
+        _remove_stale_rings(directory, key)
+        capacity = int(self.device["rate"] * RING_SECONDS)
+        self.ring = RingBuffer(os.path.join(directory, f"{key}-{os.getpid()}.ring"), capacity,
+                               len(self.device["channels"]))
+        self.last_error = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"sensor-{key}", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                chunk = self.source.read(self.poll)
+            except Exception as exc:  # a flaky device must not kill the feed
+                self.last_error = repr(exc)
+                time.sleep(1)
+                continue
+            if chunk is not None:
+                self.ring.write(*chunk)
+
+    def preview(self, seconds=PREVIEW_SECONDS, points=PREVIEW_POINTS):
+        # (plot times relative to now, plot values, per-channel quality) for one frame
+        times, values = self.ring.window(seconds)
+        report = quality(times, values, self.device["rate"], self.device["range"], seconds)
+        plot_t, plot_v = minmax(times, values, points)
+        if len(plot_t):
+            plot_t = plot_t - plot_t[-1]
+        return plot_t, plot_v, report
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.source.close()
+        os.remove(self.ring.path)
@@ -0,0 +1,197 @@
+import json
+import os
+from dataclasses import dataclass, field
+
+PROTOCOL_PATH = os.environ.get(
+    "PROTOCOL_SPEC", os.path.join(os.path.dirname(os.path.abspath(__file__)), "protocols", "lab_protocol.yaml"))
+
+PHASE_KINDS = ("checklist", "timed", "trials")
+MESSAGE_LEVELS = ("info", "warning", "error", "markdown")
+
+
+# --- COMPILED PROTOCOL ---
+@dataclass(frozen=True)
+class Step:
+    id: str
+    label: str
+    event: str
+    duration: int = 0
+    timer: str = ""
+    button: str = ""
+    done: str = ""
+    instruction: str = ""
+    camera: str = ""
+    keys: dict = field(default_factory=dict)
+    commands: tuple = ()
+    messages: tuple = ()
+    trigger: tuple = None  # (left hand, right hand)
+
+
+@dataclass(frozen=True)
+class Phase:
+    id: str
+    title: str
+    heading: str
+    kind: str
+    intro: str = ""
+    camera: str = ""
+    messages: tuple = ()
+    steps: tuple = ()
+    trigger: tuple = None
+    options: dict = field(default_factory=dict)  # kind-specific fields (checklists, trials, ...)
+    training: dict = field(default_factory=dict)
+
+    def step(self, step_id):
+        for step in self.steps:
+            if step.id == step_id:
+                return step
+        raise KeyError(f"Phase '{self.id}' has no step '{step_id}'")
+
+
+class Protocol:
+    def __init__(self, name, cameras, phases):
+        self.name = name
+        self.cameras = cameras
+        self.phases = tuple(phases)
+        self._by_id = {p.id: p for p in self.phases}
+        self._by_title = {p.title: p for p in self.phases}
+        # Step transitions of the state machine: (phase, step) -> next (phase, step),
+        # running through every step of every phase in protocol order.
+        order = [(p.id, s.id) for p in self.phases for s in p.steps]
+        self._next = dict(zip(order, order[1:]))
+
+    @property
+    def titles(self):
+        return [p.title for p in self.phases]
+
+    def phase(self, phase_id):
+        return self._by_id[phase_id]
+
+    def by_title(self, title):
+        return self._by_title.get(title)
+
+    def next_step(self, phase_id, step_id):
+        nxt = self._next.get((phase_id, step_id))
+        return (self._by_id[nxt[0]], self._by_id[nxt[0]].step(nxt[1])) if nxt else (None, None)
+
+    def trigger(self, phase_id, step_id=None):
+        phase = self._by_id[phase_id]
+        return phase.step(step_id).trigger if step_id else phase.trigger
+
+    def camera(self, phase_id, step_id=None):
+        phase = self._by_id[phase_id]
+        return self.cameras.get(phase.step(step_id).camera if step_id else phase.camera, "")
+
+
+# --- LOADING & VALIDATION ---
+def _fail(where, message):
+    raise ValueError(f"protocol spec: {where}: {message}")
+
+def _messages(raw, where):
+    messages = []
+    for item in raw or []:
+        if not isinstance(item, dict) or len(item) != 1:
+            _fail(where, f"message must be a single 'level: text' pair, got {item!r}")
+        (level, text), = item.items()
+        if level not in MESSAGE_LEVELS:
+            _fail(where, f"unknown message level '{level}' (use {', '.join(MESSAGE_LEVELS)})")
+        messages.append((level, str(text)))
+    return tuple(messages)
+
+def _trigger(raw, where):
+    if raw is None:
+        return None
+    if not isinstance(raw, dict) or set(raw) != {"left", "right"}:
+        _fail(where, "trigger needs exactly 'left' and 'right'")
+    return (raw["left"], raw["right"])
+
+def _alerts(raw, where):
+    # Keyed by trial number; JSON object keys are always strings
+    alerts = {}
+    for trial, text in (raw or {}).items():
+        try:
+            alerts[int(trial)] = str(text)
+        except (TypeError, ValueError):
+            _fail(where, f"alert key must be a trial number, got {trial!r}")
+    return alerts
+
+def _step(raw, where):
+    for required in ("id", "label", "event", "duration"):
+        if required not in raw:
+            _fail(where, f"step is missing '{required}'")
+    where = f"{where}.{raw['id']}"
+    if not isinstance(raw["duration"], int) or raw["duration"] <= 0:
+        _fail(where, "duration must be a positive number of seconds")
+    return Step(
+        id=raw["id"],
+        label=raw["label"],
+        event=raw["event"],
+        duration=raw["duration"],
+        timer=raw.get("timer", raw["label"]),
+        button=raw.get("button", f"Start {raw['label']}"),
+        done=raw.get("done", ""),
+        instruction=raw.get("instruction", ""),
+        camera=raw.get("camera", ""),
+        keys=dict(raw.get("keys", {})),
+        commands=tuple(raw.get("commands", ())),
+        messages=_messages(raw.get("messages"), where),
+        trigger=_trigger(raw.get("trigger"), where),
+    )
+
+def compile_protocol(spec):
+    cameras = dict(spec.get("cameras", {}))
+    phases, seen = [], set()
+    for raw in spec.get("phases", []):
+        where = raw.get("id", "<phase without id>")
+        for required in ("id", "title", "kind"):
+            if required not in raw:
+                _fail(where, f"phase is missing '{required}'")
+        if raw["id"] in seen:
+            _fail(where, "duplicate phase id")
+        seen.add(raw["id"])
+        if raw["kind"] not in PHASE_KINDS:
+            _fail(where, f"unknown kind '{raw['kind']}' (use {', '.join(PHASE_KINDS)})")
+        if raw.get("camera") and raw["camera"] not in cameras:
+            _fail(where, f"unknown camera '{raw['camera']}'")
+
+        steps = tuple(_step(s, where) for s in raw.get("steps", []))
+        if raw["kind"] == "timed" and not steps:
+            _fail(where, "timed phase needs at least one step")
+        if len({s.id for s in steps}) != len(steps):
+            _fail(where, "duplicate step id")
+        for step in steps:
+            if step.camera and step.camera not in cameras:
+                _fail(f"{where}.{step.id}", f"unknown camera '{step.camera}'")
+        simulation = raw.get("training", {}).get("simulation")
+        if simulation and simulation.get("step") and simulation["step"] not in {s.id for s in steps}:
+            _fail(where, f"training simulation refers to unknown step '{simulation['step']}'")
+
+        common = {"id", "title", "heading", "kind", "intro", "camera", "messages", "steps", "trigger", "training"}
+        options = {k: v for k, v in raw.items() if k not in common}
+        if "trial_messages" in options:
+            options["trial_messages"] = _messages(options["trial_messages"], where)
+        if "alerts" in options:
+            options["alerts"] = _alerts(options["alerts"], where)
+        phases.append(Phase(
+            id=raw["id"],
+            title=raw["title"],
+            heading=raw.get("heading", raw["title"]),
+            kind=raw["kind"],
+            intro=raw.get("intro", ""),
+            camera=raw.get("camera", ""),
+            messages=_messages(raw.get("messages"), where),
+            steps=steps,
+            trigger=_trigger(raw.get("trigger"), where),
+            options=options,
+            training=dict(raw.get("training", {})),
+        ))
+    return Protocol(spec.get("name", "Protocol"), cameras, phases)
+
+def load_protocol(path=PROTOCOL_PATH):
+    with open(path, encoding="utf-8") as fh:
+        if path.endswith(".json"):
+            spec = json.load(fh)
+        else:
+            import yaml
+            spec = yaml.safe_load(fh)
+    return compile_protocol(spec)
@@ -0,0 +1,310 @@
+import argparse
+import os
+import re
+import select
+import sys
+import time
+
+from protocol_journal import JOURNAL_DIR, JournalLocked
+from protocol_registry import DEFAULT_STATION, SessionRegistry
+from protocol_runner import ProtocolCore
+from protocol_spec import PROTOCOL_PATH, load_protocol
+from protocol_timers import ABORTED, DONE, PAUSED, format_remaining
+
+# Deliberately no streamlit or pandas: this runner must start in well under a
+# second on the lab laptop and keep nothing heavy between a key and its log.
+
+TICK = 0.1  # seconds between timer polls / screen refreshes
+
+
+# --- RUNNER ---
+# The copilot's protocol actions without a UI: the same compiled spec, the
+# same ProtocolCore rules, session timers and SharedSession.log journal, so a
+# session run here resumes and exports exactly like one recorded in the browser.
+class ProtocolRunner:
+    def __init__(self, protocol, session):
+        self.protocol = protocol
+        self.session = session
+        self.timers = session.timers
+        self.core = ProtocolCore(protocol, session, log=self.log, say=self.say)
+        session.restore_timers(protocol)
+        self.phase_index = 0
+        self.step_index = {}  # phase id -> selected step
+        self.trial = {}       # phase id -> current trial number
+        self.checked = set()  # (phase id, checklist item)
+        self.messages = []    # status lines, newest last
+
+    @property
+    def phase(self):
+        return self.protocol.phases[self.phase_index]
+
+    @property
+    def step(self):
+        phase = self.phase
+        return phase.steps[self.step_index.get(phase.id, 0)] if phase.kind == "timed" else None
+
+    @property
+    def trial_num(self):
+        return self.trial.get(self.phase.id, 1)
+
+    def say(self, text):
+        self.messages = self.messages[-20:] + [text]
+
+    def log(self, event_name, notes="", source_ns=None):
+        issues = self.session.intervals.issues
+        known = len(issues)
+        entry = self.session.log(event_name, notes, source_ns)
+        latency = f" ({entry['Latency (ms)'] * 1000:.0f} µs)" if entry["Latency (ms)"] is not None else ""
+        self.say(f"Logged: {event_name} at {entry['Time']}{latency}")
+        for issue in issues[known:]:
+            self.say(f"! {issue}")
+        return entry
+
+    # --- navigation ---
+    def move_phase(self, delta):
+        self.phase_index = (self.phase_index + delta) % len(self.protocol.phases)
+
+    def move(self, delta):
+        # Step within a timed phase, trial number within a trials phase
+        phase = self.phase
+        if phase.kind == "timed":
+            self.step_index[phase.id] = (self.step_index.get(phase.id, 0) + delta) % len(phase.steps)
+        elif phase.kind == "trials":
+            self.trial[phase.id] = min(max(self.trial_num + delta, 1), phase.options["trials"])
+
+    def goto(self, phase_id, step_id=None, trial=None):
+        phase = self.protocol.phase(phase_id)
+        self.phase_index = self.protocol.phases.index(phase)
+        if step_id is not None:
+            self.step_index[phase_id] = phase.steps.index(phase.step(step_id))
+        if trial is not None:
+            self.trial[phase_id] = trial
+
+    def toggle_check(self, number):
+        items = [item for c in self.phase.options.get("checklists", []) for item in c["items"]]
+        if 1 <= number <= len(items):
+            self.checked ^= {(self.phase.id, items[number - 1])}
+
+    # --- protocol actions ---
+    def primary(self, source_ns=None):
+        # Enter/space: whatever the phase's main button does in the copilot
+        phase = self.phase
+        if phase.kind == "checklist":
+            confirm = phase.options.get("confirm")
+            if confirm:
+                self.log(confirm["event"], source_ns=source_ns)
+                if confirm.get("success"):
+                    self.say(confirm["success"])
+        elif phase.kind == "timed":
+            self.start_step(self.step, source_ns)
+        else:
+            self.mark_trial(source_ns)
+
+    def start_step(self, step, source_ns=None, trigger=None):
+        return self.core.start_step(step, source_ns, trigger)
+
+    def next_mark(self):
+        return self.core.next_mark(self.phase, self.trial_num)
+
+    def mark_trial(self, source_ns=None):
+        entry = self.core.mark_trial(self.phase, self.trial_num, source_ns)
+        opts = self.phase.options
+        self.say(opts["start_logged"] if entry["Event"].endswith("START") else opts["stop_logged"])
+
+    def pause_resume(self):
+        self.core.pause_resume()
+
+    def abort(self, source_ns=None, key=None):
+        self.core.abort(key, source_ns)
+
+    def dismiss(self):
+        self.core.dismiss()
+
+    def tick(self):
+        finished = self.core.tick()
+        for timer in finished:
+            self.say(f"{timer.label}: TIME IS UP!" + (f" {timer.done_message}" if timer.done_message else ""))
+        return finished
+
+    # --- text rendering, shared by both front ends ---
+    def lines(self):
+        phase, session = self.phase, self.session
+        out = [f"{self.protocol.name} — {session.station} / {session.participant or '(no participant)'} — "
+               f"{session.session_id} ({len(session.logs)} events)", ""]
+        out.append("  ".join(f"[{p.title}]" if p is phase else p.title for p in self.protocol.phases))
+        out += ["", plain(phase.heading)]
+        if phase.intro:
+            out.append(plain(phase.intro))
+        out += [plain(text) for _, text in phase.messages]
+
+        if phase.kind == "checklist":
+            number = 0
+            for checklist in phase.options.get("checklists", []):
+                out.append(f"  {checklist['title']}")
+                for item in checklist["items"]:
+                    number += 1
+                    mark = "x" if (phase.id, item) in self.checked else " "
+                    out.append(f"    {number}. [{mark}] {item}")
+            if phase.options.get("confirm"):
+                out.append(f"  Enter: {phase.options['confirm']['label']}")
+        elif phase.kind == "timed":
+            for step in phase.steps:
+                out.append(f"  {'>' if step is self.step else ' '} {step.label} ({format_remaining(step.duration)})")
+            step = self.step
+            out.append(f"  {plain(step.instruction)}")
+            if step.camera:
+                out.append(f"    CAMERAS: {self.protocol.camera(phase.id, step.id)}")
+            out += [f"    {plain(text)}" for _, text in step.messages]
+            out += [f"    - {command}" for command in step.commands]
+            if "single" in step.keys:
+                out.append(f"    KEYS: {step.keys['single']}")
+            elif step.keys:
+                out.append(f"    LEFT: {step.keys['left']}   RIGHT: {step.keys['right']}")
+            out.append(f"  Enter: {step.button}")
+        else:
+            out.append(f"  Trial {self.trial_num} of {phase.options['trials']} — Enter logs {self.next_mark()}")
+            alert = phase.options.get("alerts", {}).get(self.trial_num)
+            if alert:
+                out.append(f"  {plain(alert)}")
+
+        out += ["", "Timers:"]
+        now = self.timers.clock()
+        for _, timer in self.timers.items():
+            if timer.state == DONE:
+                out.append(f"  {timer.label}: TIME IS UP (drift {timer.drift * 1000:+.1f} ms)")
+            elif timer.state == ABORTED:
+                out.append(f"  {timer.label}: ABORTED")
+            else:
+                paused = " (paused)" if timer.state == PAUSED else ""
+                out.append(f"  {timer.label}: {format_remaining(timer.remaining(now))}{paused}")
+        for key, elapsed in self.session.intervals.running(self.session.clock.now_ns()):
+            out.append(f"  {key}: {format_remaining(elapsed)} elapsed")
+        out += ["", *self.messages[-5:]]
+        return out
+
+
+def plain(text):
+    # Strip the markdown emphasis the spec uses for the browser
+    return re.sub(r"[*_`]{1,2}", "", text)
+
+HELP = "Enter/space: action  ←/→ or [/]: phase  ↑/↓ or k/j: step/trial  1-9: checklist  p: pause/resume  x: abort  d: dismiss  F: finish  q: quit"
+
+
+# --- KEYS ---
+# One table for both front ends. Each press is stamped before dispatch and
+# passed as source_ns, so the journal's Latency column is the key-to-journal
+# time for that press.
+def handle(runner, key, press_ns):
+    if key in ("\n", " ", "KEY_ENTER"):
+        runner.primary(press_ns)
+    elif key in ("]", "KEY_RIGHT"):
+        runner.move_phase(1)
+    elif key in ("[", "KEY_LEFT"):
+        runner.move_phase(-1)
+    elif key in ("j", "KEY_DOWN"):
+        runner.move(1)
+    elif key in ("k", "KEY_UP"):
+        runner.move(-1)
+    elif key.isdigit() and key != "0":
+        runner.toggle_check(int(key))
+    elif key == "p":
+        runner.pause_resume()
+    elif key == "x":
+        runner.abort(press_ns)
+    elif key == "d":
+        runner.dismiss()
+    elif key == "F":
+        return "finish"
+    elif key == "q":
+        return "quit"
+    return None
+
+
+# --- FRONT ENDS ---
+def run_curses(runner):
+    import curses
+
+    def loop(screen):
+        curses.curs_set(0)
+        screen.timeout(int(TICK * 1000))
+        while True:
+            try:
+                key = screen.get_wch()
+            except curses.error:  # timeout: nothing pressed
+                key = None
+            press_ns = time.monotonic_ns()
+            if key is not None:
+                key = curses.keyname(key).decode() if isinstance(key, int) else key
+                action = handle(runner, key, press_ns)
+                if action is not None:
+                    return action
+            runner.tick()
+            draw(screen, runner.lines() + ["", HELP])
+
+    def draw(screen, lines):
+        height, width = screen.getmaxyx()
+        screen.erase()
+        for row, line in enumerate(lines[:height]):
+            screen.addnstr(row, 0, line, width - 1)
+        screen.refresh()
+
+    return curses.wrapper(loop)
+
+def run_plain(runner):
+    # Line mode for dumb terminals and pipes: type a key then Enter (empty line = Enter)
+    print("\n".join(runner.lines() + ["", HELP]), flush=True)
+    while True:
+        ready, _, _ = select.select([sys.stdin], [], [], TICK)
+        before = len(runner.messages)
+        if ready:
+            line = sys.stdin.readline()
+            press_ns = time.monotonic_ns()
+            if not line:
+                return "quit"
+            action = handle(runner, line.rstrip("\n")[:1] or "\n", press_ns)
+            if action is not None:
+                return action
+            print("\n".join(runner.lines()), flush=True)
+        runner.tick()
+        for message in runner.messages[before:]:
+            print(message, flush=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Protocol Copilot in the terminal")
+    parser.add_argument("--station", default=DEFAULT_STATION)
+    parser.add_argument("--participant", default="")
+    parser.add_argument("--resume", metavar="JOURNAL", help="Resume this session journal instead of opening one")
+    parser.add_argument("--spec", default=PROTOCOL_PATH, help="Protocol spec (YAML or JSON)")
+    parser.add_argument("--journals", default=JOURNAL_DIR, help="Journal directory (shared with the copilot)")
+    parser.add_argument("--plain", action="store_true", help="Line-based prompt instead of curses")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.journals, exist_ok=True)
+    registry = SessionRegistry(args.journals)
+    try:
+        session = registry.resume(args.resume) if args.resume else registry.open(args.station, args.participant)
+    except JournalLocked as exc:
+        parser.exit(1, f"{exc}: close it there, or pass another --station/--participant.\n")
+    runner = ProtocolRunner(load_protocol(args.spec), session)
+
+    interactive = not args.plain and sys.stdin.isatty() and sys.stdout.isatty()
+    try:
+        action = run_curses(runner) if interactive else run_plain(runner)
+    except KeyboardInterrupt:
+        action = "quit"
+
+    if action == "finish":
+        registry.finish(session)
+        print(f"Session {session.session_id} finished ({len(session.logs)} events).")
+    else:
+        session.journal.close()
+        print(f"Session {session.session_id} left open ({len(session.logs)} events); "
+              f"the copilot offers it under 'Unfinished sessions'.")
+    print(f"Journal: {session.journal.path}")
+    print(f"Export:  python protocol_export.py {session.journal.path} session_logs_{session.session_id}.csv")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
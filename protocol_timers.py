@@ -0,0 +1,144 @@
+import math
+import threading
+import time
+from dataclasses import dataclass, field
+
+# --- TIMER STATES ---
+RUNNING = "running"
+PAUSED = "paused"
+DONE = "done"
+ABORTED = "aborted"
+
+
+@dataclass
+class Timer:
+    key: str
+    label: str
+    duration: float
+    deadline: float
+    state: str = RUNNING
+    paused_at: float = None
+    finished_at: float = None
+    start_event: str = ""
+    end_event: str = ""
+    done_message: str = ""
+
+    def remaining(self, now):
+        if self.state == PAUSED:
+            return max(self.deadline - self.paused_at, 0.0)
+        if self.state in (DONE, ABORTED):
+            return 0.0
+        return max(self.deadline - now, 0.0)
+
+    def fraction(self, now):
+        if self.duration <= 0:
+            return 1.0
+        return min(1.0, (self.duration - self.remaining(now)) / self.duration)
+
+    @property
+    def drift(self):
+        # How late the completion was observed relative to the scheduled deadline
+        if self.finished_at is None:
+            return None
+        return self.finished_at - self.deadline
+
+
+# --- ENGINE ---
+# Timers are scheduled against monotonic deadlines and advanced by poll(),
+# so nothing ever sleeps on the caller's thread. The clock is injectable.
+# One engine belongs to a session and is shared by every tab attached to it:
+# each call runs under a lock, so a completed timer is returned by exactly
+# one poll() and its END is logged once.
+@dataclass
+class TimerEngine:
+    clock: object = time.monotonic
+    timers: dict = field(default_factory=dict)
+    lock: object = field(default_factory=threading.RLock, repr=False, compare=False)
+
+    def start(self, key, seconds, label, start_event="", end_event="", done_message="", started_at=None):
+        # started_at lets a countdown begin at an earlier instant, e.g. a hardware trigger press
+        with self.lock:
+            timer = self.timers.get(key)
+            if timer is not None and timer.state in (RUNNING, PAUSED):
+                return timer
+            started_at = started_at if started_at is not None else self.clock()
+            timer = Timer(
+                key=key,
+                label=label,
+                duration=float(seconds),
+                deadline=started_at + seconds,
+                start_event=start_event,
+                end_event=end_event,
+                done_message=done_message,
+            )
+            self.timers[key] = timer
+            return timer
+
+    def pause(self, key):
+        with self.lock:
+            timer = self.timers[key]
+            if timer.state == RUNNING:
+                timer.paused_at = self.clock()
+                timer.state = PAUSED
+            return timer
+
+    def resume(self, key):
+        with self.lock:
+            timer = self.timers[key]
+            if timer.state == PAUSED:
+                timer.deadline += self.clock() - timer.paused_at
+                timer.paused_at = None
+                timer.state = RUNNING
+            return timer
+
+    def abort(self, key):
+        with self.lock:
+            timer = self.timers[key]
+            if timer.state in (RUNNING, PAUSED):
+                timer.finished_at = self.clock()
+                timer.state = ABORTED
+            return timer
+
+    def dismiss(self, key):
+        with self.lock:
+            return self.timers.pop(key, None)
+
+    def poll(self):
+        # Returns the timers that completed since the last poll
+        with self.lock:
+            now = self.clock()
+            finished = []
+            for timer in self.timers.values():
+                if timer.state == RUNNING and now >= timer.deadline:
+                    timer.finished_at = now
+                    timer.state = DONE
+                    finished.append(timer)
+            return finished
+
+    def fast_forward(self):
+        # Moves every running deadline to now so the next poll() completes them;
+        # used by benchmarks and tests that shouldn't wait out real countdowns
+        with self.lock:
+            now = self.clock()
+            for timer in self.timers.values():
+                if timer.state == RUNNING and timer.deadline > now:
+                    timer.deadline = now
+
+    def items(self):
+        # A stable copy for rendering while other tabs start or dismiss timers
+        with self.lock:
+            return list(self.timers.items())
+
+    def active(self):
+        with self.lock:
+            return [t for t in self.timers.values() if t.state in (RUNNING, PAUSED)]
+
+    def next_deadline(self):
+        with self.lock:
+            running = [t.deadline for t in self.timers.values() if t.state == RUNNING]
+            return min(running) if running else None
+
+
+def format_remaining(seconds):
+    mins, secs = divmod(int(math.ceil(seconds)), 60)
+    return '{:02d}:{:02d}'.format(mins, secs)
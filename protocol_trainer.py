@@ -1,7 +1,19 @@
 import streamlit as st
 import pandas as pd
+import os
 import time
 
+from protocol_assets import ASSET_DIR, AssetStore
+from protocol_drill import (ATTEMPT_TIMEOUT_MS, DRILL_DIR, MIN_ATTEMPTS, SKEW_P95_MS,
+                            DrillStore, make_attempt)
+from protocol_metrics import (METRICS, SNAPSHOT_KEY, RENDER_SECONDS, RERUN_SECONDS, MetricsExporter,
+                              rerun_trigger, widget_snapshot)
+from protocol_progress import PROGRESS_DB, ProgressStore
+from protocol_spec import PROTOCOL_PATH, load_protocol
+
+RERUN_STARTED_NS = time.monotonic_ns()
+RERUN_TRIGGER = rerun_trigger(st.session_state)
+
 # --- APP CONFIGURATION ---
 st.set_page_config(
     page_title="Lab Commander Training",
@@ -22,22 +34,153 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
+# --- INSTRUMENTATION ---
+@st.cache_resource
+def get_metrics_exporter():
+    return MetricsExporter()
+
+metrics_exporter = get_metrics_exporter()
+
+# --- PROTOCOL SPEC (shared with protocol_copilot.py) ---
+@st.cache_resource
+def get_protocol(path, mtime):
+    return load_protocol(path)
+
+protocol = get_protocol(PROTOCOL_PATH, os.path.getmtime(PROTOCOL_PATH))
+
+# --- OFFLINE ASSETS ---
+@st.cache_resource
+def get_assets(directory):
+    # Images ship with the repo and are read once per process; nothing is fetched over the network
+    return AssetStore(directory)
+
+assets = get_assets(ASSET_DIR)
+
+def show_asset(name, width=400):
+    st.image(assets.image(name), caption=assets.caption(name), width=width)
+
+# --- SIMULTANEITY DRILL ---
+@st.cache_resource
+def get_drill_store(directory):
+    return DrillStore(directory)
+
+drills = get_drill_store(DRILL_DIR)
+
+# --- PROGRESS STORE ---
+# Answers, completions and certification for every trainee, shared by all
+# browser sessions and kept across refreshes and restarts.
+@st.cache_resource
+def get_progress_store(path):
+    return ProgressStore(path)
+
+progress_store = get_progress_store(PROGRESS_DB)
+COHORT_REFRESH = 10.0  # seconds between cohort dashboard refreshes
+
+# Two-hand pad stamped in the browser with performance.now(). The left hand
+# presses the real key (or the left pad), the right hand taps the tablet pad;
+# both times go back together once the second hand lands, or alone after
+# the timeout, so the skew never includes network or rerun time.
+DRILL_PAD_JS = """
+export default function(component) {
+    const { data, setTriggerValue, parentElement } = component;
+    const root = parentElement.querySelector(".drill-pad") || document.createElement("div");
+    root.className = "drill-pad";
+    root.innerHTML = `<button class="pad left"></button><button class="pad right"></button><div class="status"></div>`;
+    parentElement.appendChild(root);
+    const left = root.querySelector(".left"), right = root.querySelector(".right"), status = root.querySelector(".status");
+    left.textContent = "LEFT: " + data.left;
+    right.textContent = "RIGHT: " + data.right;
+
+    let attempt = null, timer = null, counter = 0;
+    const send = () => {
+        clearTimeout(timer);
+        setTriggerValue("attempt", attempt);
+        status.textContent = attempt.left_ms != null && attempt.right_ms != null
+            ? `Skew ${(attempt.right_ms - attempt.left_ms).toFixed(1)} ms` : "Missed: only one hand pressed";
+        attempt = null;
+    };
+    const press = (side, key) => {
+        const t = performance.now();
+        if (attempt === null) {
+            attempt = { id: `${data.nonce}-${++counter}`, left_ms: null, right_ms: null, left_key: null };
+            timer = setTimeout(send, data.timeout_ms);
+        }
+        if (attempt[side + "_ms"] !== null) return;
+        attempt[side + "_ms"] = t;
+        if (side === "left") attempt.left_key = key;
+        if (attempt.left_ms !== null && attempt.right_ms !== null) send();
+    };
+    const keyLabel = (e) => {
+        if (e.key === "ArrowRight" || e.key === "PageDown") return "Remote > (Slide Forward)";
+        if (e.shiftKey && /^[a-z]$/i.test(e.key)) return "Shift + " + e.key.toUpperCase();
+        return null;
+    };
+    const onKey = (e) => {
+        if (e.repeat) return;
+        const label = keyLabel(e);
+        if (label) { e.preventDefault(); press("left", label); }
+    };
+    if (parentElement.__drillKey) document.removeEventListener("keydown", parentElement.__drillKey);
+    parentElement.__drillKey = onKey;
+    document.addEventListener("keydown", onKey);
+    left.onpointerdown = () => press("left", data.left);
+    right.onpointerdown = () => press("right", data.right);
+    return () => document.removeEventListener("keydown", onKey);
+}
+"""
+
+DRILL_PAD_CSS = """
+.drill-pad { display: grid; grid-template-columns: 1fr 1fr; gap: 12px; }
+.pad { height: 90px; font-size: 18px; font-weight: bold; border-radius: 8px; cursor: pointer;
+       border: 2px solid var(--st-primary-color); background: var(--st-secondary-background-color); color: inherit;
+       touch-action: manipulation; }
+.pad:active { background: var(--st-primary-color); }
+.status { grid-column: 1 / 3; font-family: monospace; }
+"""
+
+drill_pad = st.components.v2.component("drill_pad", js=DRILL_PAD_JS, css=DRILL_PAD_CSS)
+
 # --- SESSION STATE MANAGEMENT ---
+if 'checks' not in st.session_state:
+    st.session_state.checks = {}
 if 'progress' not in st.session_state:
     st.session_state.progress = {
         "setup": False,
         "baseline": False,
         "giladi": False,
-        "vr": False
+        "vr": False,
+        "drill": False
     }
+if '_drill_nonce' not in st.session_state:
+    st.session_state._drill_nonce = time.time_ns()
+
+# Without a name progress lives in this browser session only; with one it is
+# restored from the store (a refresh or another device picks it up).
+TRAINEE = st.session_state.get("trainee", "").strip()
+if TRAINEE and st.session_state.get("_progress_owner") != TRAINEE:
+    if st.session_state.get("_progress_owner") is None:
+        # Modules done before the name was entered count for this trainee
+        for module, done in st.session_state.progress.items():
+            if done:
+                progress_store.complete(TRAINEE, module)
+    completed = progress_store.completed(TRAINEE)
+    st.session_state.progress = {module: module in completed for module in st.session_state.progress}
+    st.session_state._progress_owner = TRAINEE
 
 # --- HELPER FUNCTIONS ---
 def mark_complete(module):
     st.session_state.progress[module] = True
+    if TRAINEE:
+        progress_store.complete(TRAINEE, module)
     st.balloons()
     st.success(f"✅ Module '{module.capitalize()}' Complete! Move to the next section.")
 
-def check_dual_hand(left_action, right_action, expected_left, expected_right, feedback_success):
+def record_answer(module, item, kind, answer, expected):
+    if TRAINEE:
+        progress_store.record_attempt(TRAINEE, module, item, kind, answer, expected, answer == expected)
+
+def check_dual_hand(module, item, left_action, right_action, expected_left, expected_right, feedback_success):
+    record_answer(module, item, "simulation", f"{left_action} | {right_action}", f"{expected_left} | {expected_right}")
     if left_action == expected_left and right_action == expected_right:
         st.markdown(f"<div class='success-box'><b>CORRECT!</b> {feedback_success}</div>", unsafe_allow_html=True)
         return True
@@ -45,44 +188,75 @@ def check_dual_hand(left_action, right_action, expected_left, expected_right, fe
         st.markdown(f"<div class='warning-box'><b>INCORRECT.</b><br>You selected: Left='{left_action}' | Right='{right_action}'<br>Expected: Left='{expected_left}' | Right='{expected_right}'</div>", unsafe_allow_html=True)
         return False
 
-# --- SIDEBAR NAVIGATION ---
-st.sidebar.title("🧪 Lab Academy")
-st.sidebar.write("Welcome, Trainee.")
-st.sidebar.progress(sum(st.session_state.progress.values()) / 4)
+MESSAGE_WRITERS = {"info": st.info, "warning": st.warning, "error": st.error, "markdown": st.markdown}
+
+def show_messages(messages):
+    for level, text in messages:
+        MESSAGE_WRITERS[level](text)
+
+def sticky_checkbox(label, key):
+    # Only the selected setup section is rendered, so keep ticks outside widget state
+    checked = st.checkbox(label, value=st.session_state.checks.get(key, False), key=f"check_{key}")
+    st.session_state.checks[key] = checked
+    return checked
+
+def simulate_dual_hand(phase_id, key):
+    # Renders the spec's dual-hand drill for a phase and grades it against the spec's trigger
+    phase = protocol.phase(phase_id)
+    sim = phase.training["simulation"]
+    expected_left, expected_right = protocol.trigger(phase_id, sim.get("step"))
 
-menu = st.sidebar.radio("Course Modules:", [
-    "1. Hardware & Setup",
-    "2. Baseline Protocols",
-    "3. Giladi Protocols",
-    "4. VR Protocols",
-    "5. Final Review"
-])
+    col1, col2 = st.columns(2)
+    with col1:
+        st.markdown(f"### {sim['left_title']}")
+        left = st.selectbox("Select Action:", sim["left_options"], key=f"{key}_L")
+    with col2:
+        st.markdown(f"### {sim['right_title']}")
+        right = st.selectbox("Select Action:", sim["right_options"], key=f"{key}_R")
+    return left, right, expected_left, expected_right, sim["feedback"]
+
+def quiz(module, question, options, expected, key, **radio_args):
+    # Every change of answer is recorded once, from the radio's callback rather than on each rerun
+    def on_change():
+        record_answer(module, key, "quiz", st.session_state[key], expected)
+    return st.radio(question, options, index=None, key=key, on_change=on_change, **radio_args)
+
+def camera_quiz(question, phase_id, key, correct_msg, wrong_msg):
+    cameras = list(protocol.cameras.values())
+    answer = quiz(phase_id, question, cameras, protocol.camera(phase_id), key, horizontal=True)
+    if answer == protocol.camera(phase_id):
+        st.success(correct_msg)
+    elif answer:
+        st.error(wrong_msg)
 
 # ==========================================
 # MODULE 1: HARDWARE & SETUP
 # ==========================================
-if menu == "1. Hardware & Setup":
+def module_setup():
     st.markdown("<div class='main-header'>Module 1: The Setup</div>", unsafe_allow_html=True)
     st.write("Before we test a patient, we must build the lab. Follow the steps below.")
 
-    tab1, tab2, tab3, tab4 = st.tabs(["🔵 OPAL Sensors", "🔴 GoPros", "🟢 Equivital", "💾 MobilityLab"])
+    # A radio instead of st.tabs: only the selected section (and its image) is rendered
+    tab = st.radio("Section:", ["🔵 OPAL Sensors", "🔴 GoPros", "🟢 Equivital", "💾 MobilityLab"],
+                   horizontal=True, label_visibility="collapsed", key="setup_tab")
 
-    with tab1:
+    if tab == "🔵 OPAL Sensors":
         st.markdown("### Setting up the OPALs")
-        st.image("https://support.apdm.com/hc/article_attachments/360000085206/Opals_in_Dock.png", caption="OPAL Docking Station", width=400)
+        show_asset("opal_dock")
         st.info("Goal: 5 Sensors (2 Shins, 2 Feet, 1 Lower Back).")
         
-        check_1 = st.checkbox("Plug Access Point into Stand & Dock")
-        check_2 = st.checkbox("Plug Power Cord to Wall")
-        check_3 = st.checkbox("Sensors are flashing GREEN (Charged)")
-        check_4 = st.checkbox("Remote is plugged into computer & Switch is ON (Green)")
+        check_1 = sticky_checkbox("Plug Access Point into Stand & Dock", "opal_ap")
+        check_2 = sticky_checkbox("Plug Power Cord to Wall", "opal_power")
+        check_3 = sticky_checkbox("Sensors are flashing GREEN (Charged)", "opal_green")
+        check_4 = sticky_checkbox("Remote is plugged into computer & Switch is ON (Green)", "opal_remote")
         
         if check_1 and check_2 and check_3 and check_4:
             st.success("OPAL Hardware Ready!")
 
-    with tab2:
+    elif tab == "🔴 GoPros":
         st.markdown("### Setting up the GoPros")
         st.warning("⚠️ CRITICAL: Always pair in the app BEFORE placing cameras on tripods.")
+        show_asset("gopro_pairing")
         
         st.markdown("""
         1. Turn on Cameras (Frontal & Sagittal).
@@ -94,13 +268,15 @@ if menu == "1. Hardware & Setup":
         7. Type `Record` -> Enter (Wait for pending message).
         """)
         
-        q_gopro = st.radio("What must you do immediately after the app finds the cameras?", 
-                           ["Put them on tripods", "Type 'All' to connect", "Start recording"], index=None)
+        q_gopro = quiz("setup", "What must you do immediately after the app finds the cameras?",
+                       ["Put them on tripods", "Type 'All' to connect", "Start recording"],
+                       "Type 'All' to connect", "quiz_gopro")
         if q_gopro == "Type 'All' to connect":
             st.success("Correct.")
 
-    with tab3:
+    elif tab == "🟢 Equivital":
         st.markdown("### Setting up Equivital")
+        show_asset("equivital_belt")
         st.markdown("""
         1. Connect SEM to Laptop via USB.
         2. **Equivital Manager:** 'SEM Configuration' -> Apply.
@@ -110,7 +286,7 @@ if menu == "1. Hardware & Setup":
         6. Unplug SEM -> Put in Belt -> Put on Patient.
         """)
 
-    with tab4:
+    elif tab == "💾 MobilityLab":
         st.markdown("### MobilityLab Config")
         st.markdown("""
         1. Open App -> Configure Hardware -> Rescan.
@@ -119,36 +295,28 @@ if menu == "1. Hardware & Setup":
         4. **Outfitting:** Place sensors on patient (Shins, Feet, Sacrum).
         """)
         
-        if st.button("I have completed all setup steps"):
+        if st.button("I have completed all setup steps", key="complete-setup"):
             mark_complete("setup")
 
 # ==========================================
 # MODULE 2: BASELINE
 # ==========================================
-elif menu == "2. Baseline Protocols":
+def module_baseline():
     st.markdown("<div class='main-header'>Module 2: Baseline Measurements</div>", unsafe_allow_html=True)
     st.write("We measure the patient in 3 states: Sitting, Standing, Walking (5 mins each).")
     
     st.markdown("<div class='instruction-box'>🧠 <b>The Concept: Simultaneous Triggers</b><br>We have 3 computers. You must start them at the EXACT same time using two hands.</div>", unsafe_allow_html=True)
 
     # --- SIMULATOR SECTION ---
-    st.markdown("### 🎮 Simulation: The 5-Minute Walk")
+    st.markdown(f"### {protocol.phase('baseline').training['simulation']['title']}")
     st.write("Imagine you are about to start the Walking Baseline. Configure your hands:")
     
-    col1, col2 = st.columns(2)
-    with col1:
-        st.markdown("### ✋ Left Hand (Equivital)")
-        left_hand = st.selectbox("Select Action:", ["(Nothing)", "Shift + A", "Shift + E", "Shift + S", "Remote >"], key="base_L")
-    with col2:
-        st.markdown("### ✋ Right Hand (Tablet)")
-        right_hand = st.selectbox("Select Action:", ["(Nothing)", "Start 5 min Sitting", "Start 5 min Walk", "End 5 min Walk", "Start 2 min Walk"], key="base_R")
+    left_hand, right_hand, expected_left, expected_right, feedback = simulate_dual_hand("baseline", "base")
 
     st.markdown("**Context:** You are starting the **WALKING** baseline.")
     
     if st.button("💥 EXECUTE SIMULTANEOUS PRESS", key="btn_base"):
-        # Logic: Baseline Walking Start = Shift+A & Start 5 min Walk
-        # Note: Script says Shift+A is for Baseline. 
-        if check_dual_hand(left_hand, right_hand, "Shift + A", "Start 5 min Walk", "You started the Equivital and the Sync Timer together."):
+        if check_dual_hand("baseline", "sim_base", left_hand, right_hand, expected_left, expected_right, feedback):
             st.markdown("...5 Minutes Later...")
             st.info("Now STOP the trial.")
             # Challenge them to stop it
@@ -156,21 +324,18 @@ elif menu == "2. Baseline Protocols":
 
     st.markdown("---")
     st.markdown("### 📷 Camera Check")
-    cam_pos = st.radio("Where do the cameras go for the Walking Baseline?", 
-                       ["Green Tape (Whiteboard)", "Blue Mark (Entry/Gait Carpet)"], horizontal=True)
-    if cam_pos == "Blue Mark (Entry/Gait Carpet)":
-        st.success("Correct. Always Blue for Baseline.")
-    elif cam_pos:
-        st.error("Wrong. Green is for Giladi.")
+    camera_quiz("Where do the cameras go for the Walking Baseline?", "baseline", "cam_base",
+                "Correct. Always Blue for Baseline.", "Wrong. Green is for Giladi.")
 
 # ==========================================
 # MODULE 3: GILADI PROTOCOL
 # ==========================================
-elif menu == "3. Giladi Protocols":
+def module_giladi():
+    giladi = protocol.phase("giladi")
     st.markdown("<div class='main-header'>Module 3: The Giladi Protocol</div>", unsafe_allow_html=True)
-    st.markdown("This involves 8 specific trials. The trigger logic changes here!")
+    st.markdown(f"This involves {giladi.options['trials']} specific trials. The trigger logic changes here!")
     
-    st.warning("⚠️ **Camera Change:** Move cameras to **GREEN TAPE** (Whiteboard + Window).")
+    st.warning(f"⚠️ **Camera Change:** Move cameras to **{protocol.camera('giladi').upper()}**.")
 
     st.markdown("### The Workflow Loop")
     st.code("""
@@ -181,81 +346,126 @@ elif menu == "3. Giladi Protocols":
     5. TRIGGER END (Remote + Tablet).
     """)
 
-    st.markdown("### 🎮 Simulation: Starting a Trial")
+    st.markdown(f"### {giladi.training['simulation']['title']}")
     st.write("The Investigator says: *'Any time after the BEEP'*.")
     
-    col1, col2 = st.columns(2)
-    with col1:
-        st.markdown("### ✋ Left Hand (Remote)")
-        gl_left = st.selectbox("Select Action:", ["(Nothing)", "Shift + A", "Remote > (Slide Forward)", "Shift + S"], key="gl_L")
-    with col2:
-        st.markdown("### ✋ Right Hand (Tablet)")
-        gl_right = st.selectbox("Select Action:", ["(Nothing)", "Start", "Stop", "Record"], key="gl_R")
+    gl_left, gl_right, expected_left, expected_right, feedback = simulate_dual_hand("giladi", "gl")
 
     if st.button("💥 EXECUTE TRIGGER", key="btn_gl"):
-        if check_dual_hand(gl_left, gl_right, "Remote > (Slide Forward)", "Start", "Beep sound occurs. Recording started."):
+        if check_dual_hand("giladi", "sim_gl", gl_left, gl_right, expected_left, expected_right, feedback):
             st.success("Great work.")
             mark_complete("giladi")
 
     st.markdown("### 🚪 The Trial 8 Trap")
     st.write("Trial 8 is the 'Doorway Trial'. What must you do differently?")
-    t8_ans = st.radio("Action:", ["Nothing", "Move Frontal Camera to Green Tape inside room", "Change sensors"], index=None)
+    t8_ans = quiz("giladi", "Action:", ["Nothing", "Move Frontal Camera to Green Tape inside room", "Change sensors"],
+                  "Move Frontal Camera to Green Tape inside room", "quiz_t8")
     if t8_ans == "Move Frontal Camera to Green Tape inside room":
         st.success("Correct. Don't forget this move!")
 
 # ==========================================
 # MODULE 4: VR PROTOCOLS
 # ==========================================
-elif menu == "4. VR Protocols":
+def module_vr():
     st.markdown("<div class='main-header'>Module 4: VR Familiarization & Repo</div>", unsafe_allow_html=True)
     st.write("The participant is now wearing the VR headset. The commands change again.")
 
-    tab_vr1, tab_vr2 = st.tabs(["Familiarization (Sit/Stand/Walk)", "Repositioned (30s)"])
+    repo = protocol.phase("vr_repositioned")
+    tab_vr1, tab_vr2 = st.tabs(["Familiarization (Sit/Stand/Walk)", f"Repositioned ({repo.steps[0].duration}s)"])
 
     with tab_vr1:
         st.markdown("### Familiarization Phase")
-        st.info("Sequence: 2 min Sit -> 2 min Stand -> 2 min Walk")
+        st.info(protocol.phase("vr_fam").intro)
         
         st.markdown("**Command Rule:** For VR Fam, we mostly use `Shift + S` on Equivital.")
         
-        st.markdown("#### 🎮 Simulation: VR Walking Start")
+        st.markdown(f"#### {protocol.phase('vr_fam').training['simulation']['title']}")
         st.write("Prepare to start the 2-min VR Walk.")
         
-        vr_l = st.selectbox("Left Hand:", ["Shift + A", "Shift + S", "Shift + W"], key="vr_L")
-        vr_r = st.selectbox("Right Hand:", ["Start 2 min Sitting", "Start 2 min Walk"], key="vr_R")
+        vr_l, vr_r, expected_left, expected_right, feedback = simulate_dual_hand("vr_fam", "vr")
         
         if st.button("💥 EXECUTE VR START", key="btn_vr"):
-            # Based on script: "Simultaneously press [Shift + S] & 'Start 2 min sitting'" 
-            # (Note: User script had a typo saying 'Sitting' for the walk phase, 
-            # but usually we want to log 'Walk'. I will look for 'Walk' to be safe, or 'Sit' if adhering strictly).
-            # Let's adhere to the LIKELY INTENT which is 'Start 2 min Walk'.
-            
-            if check_dual_hand(vr_l, vr_r, "Shift + S", "Start 2 min Walk", "Correct. Note: Ensure you press the 'Walk' button on tablet!"):
-                pass
+            check_dual_hand("vr", "sim_vr", vr_l, vr_r, expected_left, expected_right, feedback)
 
     with tab_vr2:
-        st.markdown("### Repositioned Trial (30s)")
-        st.error("⚠️ Cameras back to BLUE MARKINGS.")
-        
-        st.markdown("""
-        1. **PKMAS Start:** Press Start on PKMAS + Right Arrow on Remote.
-        2. **Verbal:** Say "Starting 30s".
-        3. **Equivital:** Shift + S (Sit) -> Wait 30s.
-        4. **Transition:** SyncApp Stop -> SyncApp Start + Shift + W (Walk).
-        """)
-        
-        if st.button("I understand the 30s protocol"):
+        st.markdown(f"### {repo.heading}")
+        show_messages(repo.messages)
+        # The spec's numbered instructions continue with one line per step
+        first = sum(level == "markdown" for level, _ in repo.messages) + 1
+        for n, step in enumerate(repo.steps, first):
+            st.markdown(f"{n}. **{step.label}:** {' + '.join(step.keys.values())} → wait {step.duration}s."
+                        + (f" Then: {step.done}" if step.done else ""))
+
+        if st.button("I understand the 30s protocol", key="complete-vr"):
             mark_complete("vr")
 
+# ==========================================
+# MODULE 5: SIMULTANEITY DRILL
+# ==========================================
+def module_drill():
+    st.markdown("<div class='main-header'>Module 5: Simultaneity Drill</div>", unsafe_allow_html=True)
+    st.write("Knowing the right keys is not enough: the Equivital key and the tablet tap must land together. "
+             "This drill times both hands in the browser and measures the gap (skew) in milliseconds.")
+
+    trainee = st.session_state.get("trainee", "").strip()
+    if not trainee:
+        st.info("Enter your name under **Trainee** in the sidebar to start the drill.")
+        return
+
+    drill_phases = {protocol.phase(pid).title: pid for pid in ("baseline", "giladi", "vr_fam")}
+    phase_id = drill_phases[st.radio("Drill:", list(drill_phases), horizontal=True, key="drill_phase")]
+    sim = protocol.phase(phase_id).training["simulation"]
+    expected_left, expected_right = protocol.trigger(phase_id, sim.get("step"))
+
+    st.markdown(f"**Left hand:** press `{expected_left}` on the keyboard (or the left pad). "
+                f"**Right hand:** tap the right pad. Both at once.")
+    result = drill_pad(key=f"drill_{phase_id}", on_attempt_change=lambda: None,
+                       data={"left": expected_left, "right": expected_right,
+                             "timeout_ms": ATTEMPT_TIMEOUT_MS, "nonce": st.session_state._drill_nonce})
+    if result.attempt:
+        attempt = drills.record(trainee, make_attempt(phase_id, expected_left, expected_right, result.attempt))
+        if attempt is not None and attempt["status"] == "wrong_key":
+            st.error(f"Wrong key: pressed {attempt['left_key']}, expected {expected_left}.")
+
+    history = drills.history(trainee)
+    summary = history.summary()
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("Valid Attempts", f"{summary['valid']} / {MIN_ATTEMPTS}")
+    c2.metric("Median Skew", f"{summary['p50_ms']} ms" if summary["p50_ms"] is not None else "–")
+    c3.metric("p95 Skew", f"{summary['p95_ms']} ms" if summary["p95_ms"] is not None else "–",
+              help=f"Certification needs p95 under {SKEW_P95_MS:g} ms")
+    c4.metric("Misses / Wrong Keys", f"{summary['misses']} / {summary['wrong_keys']}")
+
+    recent = [a for a in history.attempts if a["skew_ms"] is not None][-50:]
+    if recent:
+        st.bar_chart(pd.DataFrame({"Skew (ms)": [a["skew_ms"] for a in recent]}), height=200)
+        st.caption("Last 50 attempts. Above zero: tablet tap late; below zero: key press late.")
+        per_phase = {protocol.phase(pid).title: history.summary(pid) for pid in drill_phases.values()}
+        st.dataframe(pd.DataFrame(per_phase).T, width="stretch")
+
+    if history.certified():
+        if not st.session_state.progress["drill"]:
+            mark_complete("drill")
+    elif summary["valid"] >= MIN_ATTEMPTS:
+        st.warning(f"p95 skew is {summary['p95_ms']} ms; keep drilling until it is under {SKEW_P95_MS:g} ms.")
+
 # ==========================================
 # FINAL REVIEW
 # ==========================================
-elif menu == "5. Final Review":
+def module_final_review():
     st.title("🎓 Certification")
     
-    if all(st.session_state.progress.values()):
+    trainee = st.session_state.get("trainee", "").strip()
+    drill = drills.history(trainee).summary() if trainee else None
+    if drill is not None and drill["p95_ms"] is not None:
+        st.metric("Dual-hand p95 Skew", f"{drill['p95_ms']} ms", help=f"Must be under {SKEW_P95_MS:g} ms")
+
+    certified = bool(trainee) and drills.history(trainee).certified()
+
+    if all(st.session_state.progress.values()) and certified:
+        progress_store.certify(trainee)
         st.balloons()
-        st.markdown("""
+        st.markdown(f"""
         <div class='success-box'>
         <h2>🎉 CONGRATULATIONS!</h2>
         You have completed the Lab Commander Training Course.<br>
@@ -263,10 +473,84 @@ elif menu == "5. Final Review":
         <ul>
         <li>Equivital (Shift+A / Shift+S)</li>
         <li>MobilityLab & Video Sync</li>
-        <li>Dual-Hand Triggers</li>
+        <li>Dual-Hand Triggers (p95 skew {drill['p95_ms']} ms)</li>
         </ul>
         </div>
         """, unsafe_allow_html=True)
     else:
-        st.warning("You have not completed all modules yet. Please go back and finish the checklists/simulations.")
-        st.write(st.session_state.progress)
+        if not certified:
+            st.error(f"Certification needs at least {MIN_ATTEMPTS} valid drill attempts with p95 skew under {SKEW_P95_MS:g} ms.")
+        if not all(st.session_state.progress.values()):
+            st.warning("You have not completed all modules yet. Please go back and finish the checklists/simulations.")
+            st.write(st.session_state.progress)
+
+MODULES = {
+    "1. Hardware & Setup": module_setup,
+    "2. Baseline Protocols": module_baseline,
+    "3. Giladi Protocols": module_giladi,
+    "4. VR Protocols": module_vr,
+    "5. Simultaneity Drill": module_drill,
+    "6. Final Review": module_final_review,
+}
+
+# --- SIDEBAR NAVIGATION ---
+st.sidebar.title("🧪 Lab Academy")
+st.sidebar.text_input("Trainee", key="trainee", placeholder="Your name")
+st.sidebar.write(f"Welcome, {st.session_state.trainee.strip() or 'Trainee'}.")
+if not TRAINEE:
+    st.sidebar.caption("Enter your name to keep your progress across refreshes.")
+st.sidebar.progress(sum(st.session_state.progress.values()) / len(st.session_state.progress))
+
+menu = st.sidebar.radio("Course Modules:", list(MODULES), key="module")
+
+with st.sidebar.expander("🧑‍🏫 Trainers"):
+    cohort = st.toggle("Show cohort dashboard", key="cohort")
+with st.sidebar.expander("🩺 Diagnostics"):
+    diagnostics = st.toggle("Show diagnostics page", key="diagnostics")
+
+@st.fragment(run_every=COHORT_REFRESH)
+def cohort_dashboard():
+    # Refreshes on its own while trainees keep submitting; reads never wait for writers (WAL)
+    df = progress_store.cohort(st.session_state.progress)
+    if df.empty:
+        st.info("No trainee has entered a name and answered a question yet.")
+        return
+    certified = df["certified_at"].notna()
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("Trainees", len(df))
+    c2.metric("Certified", int(certified.sum()))
+    c3.metric("Median Completion", f"{df['completion'].median():.0%}")
+    c4.metric("Median Time to Certify", f"{df['hours_to_certify'].median():.1f} h" if certified.any() else "–")
+
+    st.markdown("### Trainees")
+    st.dataframe(df[["trainee", "completion", "attempts", "error_rate", "started_at", "last_seen",
+                     "certified_at", "hours_to_certify"]], hide_index=True, width="stretch",
+                 column_config={"completion": st.column_config.ProgressColumn("Completion", min_value=0, max_value=1),
+                                "error_rate": st.column_config.NumberColumn("Error Rate", format="percent")})
+
+    st.markdown("### Error Rate per Module")
+    modules = progress_store.module_stats()
+    st.bar_chart(modules, x="module", y="error_rate", color="kind", stack=False, height=250)
+    st.dataframe(modules, hide_index=True, width="stretch")
+    st.markdown("### Hardest Questions")
+    st.dataframe(progress_store.hardest_items(), hide_index=True, width="stretch")
+
+if cohort:
+    st.title("🧑‍🏫 Cohort Dashboard")
+    st.caption(f"Every trainee's answers from {PROGRESS_DB}, refreshed every {COHORT_REFRESH:g} s.")
+    cohort_dashboard()
+elif diagnostics:
+    st.title("🩺 Diagnostics")
+    st.write("Timings recorded by this server process since it started (all trainees).")
+    if metrics_exporter.address:
+        st.caption(f"Prometheus endpoint: {metrics_exporter.address}")
+    if metrics_exporter.last_error:
+        st.error(metrics_exporter.last_error)
+    st.dataframe(METRICS.rows(), hide_index=True)
+    st.download_button("📥 Download Metrics (Prometheus text)", METRICS.render, "trainer_metrics.prom", "text/plain")
+else:
+    with RENDER_SECONDS.time(app="trainer", page=menu):
+        MODULES[menu]()
+
+RERUN_SECONDS.observe((time.monotonic_ns() - RERUN_STARTED_NS) / 1e9, app="trainer", trigger=RERUN_TRIGGER)
+st.session_state[SNAPSHOT_KEY] = widget_snapshot(st.session_state)
@@ -0,0 +1,175 @@
+import collections
+import json
+import os
+import queue
+import selectors
+import socket
+import threading
+import time
+
+# Labels match the left-hand trigger names in protocols/lab_protocol.yaml
+SHIFT_KEYS = {"KEY_A": "Shift + A", "KEY_E": "Shift + E", "KEY_S": "Shift + S", "KEY_W": "Shift + W"}
+REMOTE_KEYS = {"KEY_RIGHT": "Remote > (Slide Forward)", "KEY_PAGEDOWN": "Remote > (Slide Forward)"}
+
+# e.g. evdev:/dev/input/event3 (or several: evdev:/dev/input/event3,/dev/input/event5), udp:0.0.0.0:5555, fake
+TRIGGER_SOURCE = os.environ.get("PROTOCOL_TRIGGER_SOURCE", "")
+TRIGGER_WINDOW_NS = 10 * 1_000_000_000  # how long a press stays available for confirmation
+
+
+# --- SOURCES ---
+# A source's read(timeout) returns (key label, monotonic ns of the press, device)
+# or None when nothing arrived within timeout.
+class FakeSource:
+    def __init__(self):
+        self._queue = queue.Queue()
+
+    def press(self, key, hw_ns=None, device="fake"):
+        self._queue.put((key, hw_ns if hw_ns is not None else time.monotonic_ns(), device))
+
+    def read(self, timeout):
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        pass
+
+
+class UdpSource:
+    # Datagrams are either a bare key label ("Shift + A") or JSON
+    # {"key": ..., "wall_ns": ..., "device": ...}. Without wall_ns the press is
+    # stamped on receipt; with it, the sender's (NTP-synced) wall time is mapped
+    # onto our monotonic clock through the session clock anchor.
+    def __init__(self, host, port, clock=None):
+        self.clock = clock
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind((host, port))
+
+    @property
+    def address(self):
+        return self._sock.getsockname()
+
+    def read(self, timeout):
+        self._sock.settimeout(timeout)
+        try:
+            data, sender = self._sock.recvfrom(4096)
+        except (socket.timeout, OSError):
+            return None
+        received_ns = time.monotonic_ns()
+        text = data.decode("utf-8", "replace").strip()
+        if not text.startswith("{"):
+            return text, received_ns, f"udp:{sender[0]}"
+        try:
+            message = json.loads(text)
+        except json.JSONDecodeError:
+            return None
+        hw_ns = received_ns
+        if message.get("wall_ns") is not None and self.clock is not None:
+            hw_ns = min(received_ns, self.clock.from_wall_ns(int(message["wall_ns"])))
+        return message["key"], hw_ns, message.get("device", f"udp:{sender[0]}")
+
+    def close(self):
+        self._sock.close()
+
+
+class EvdevSource:
+    # Reads Linux input devices (the Equivital keyboard and the presenter
+    # remote are usually two) through one selector. Kernel event times are
+    # CLOCK_REALTIME, so they go through the clock anchor as well. A device
+    # read returns its whole pending batch; every press in it is queued and
+    # handed out one per read(), so two quick presses are both logged.
+    def __init__(self, paths, clock=None):
+        import evdev
+        self._ecodes = evdev.ecodes
+        paths = [paths] if isinstance(paths, str) else list(paths)
+        self.devices = [evdev.InputDevice(path) for path in paths]
+        self.clock = clock
+        self._shift = {device.fd: False for device in self.devices}  # Shift held, per device
+        self._pending = collections.deque()
+        self._selector = selectors.DefaultSelector()
+        for device in self.devices:
+            self._selector.register(device.fd, selectors.EVENT_READ, device)
+
+    def read(self, timeout):
+        if not self._pending:
+            for key, _ in self._selector.select(timeout):
+                self._drain(key.data)
+        return self._pending.popleft() if self._pending else None
+
+    def _drain(self, device):
+        try:
+            events = list(device.read())
+        except BlockingIOError:  # another reader got there first
+            return
+        for event in events:
+            if event.type != self._ecodes.EV_KEY:
+                continue
+            name = self._ecodes.KEY.get(event.code)
+            if name in ("KEY_LEFTSHIFT", "KEY_RIGHTSHIFT"):
+                self._shift[device.fd] = event.value != 0
+                continue
+            if event.value != 1:  # key down only; ignore release and autorepeat
+                continue
+            label = SHIFT_KEYS.get(name) if self._shift[device.fd] else REMOTE_KEYS.get(name)
+            if label is None:
+                continue
+            wall_ns = event.sec * 1_000_000_000 + event.usec * 1000
+            hw_ns = self.clock.from_wall_ns(wall_ns) if self.clock is not None else time.monotonic_ns()
+            self._pending.append((label, hw_ns, device.name))
+
+    def close(self):
+        self._selector.close()
+        for device in self.devices:
+            device.close()
+
+
+def open_source(spec, clock=None):
+    kind, _, arg = spec.partition(":")
+    if kind == "fake":
+        return FakeSource()
+    if kind == "udp":
+        host, _, port = arg.rpartition(":")
+        return UdpSource(host or "0.0.0.0", int(port), clock)
+    if kind == "evdev":
+        return EvdevSource(arg.split(","), clock)
+    raise ValueError(f"Unknown trigger source '{spec}' (use evdev:<device>[,<device>...], udp:<host>:<port> or fake)")
+
+
+# --- LISTENER ---
+# Pulls presses off the source on a daemon thread and hands each to sink(key,
+# hw_ns, device) immediately, so a press is logged without waiting for a rerun.
+class TriggerListener:
+    def __init__(self, source, sink, poll=0.2):
+        self.source = source
+        self.sink = sink
+        self.poll = poll
+        self.received = 0
+        self.dropped = 0
+        self.last_error = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="trigger-listener", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.is_set():
+            item = self.source.read(self.poll)
+            if item is None:
+                continue
+            try:
+                if self.sink(*item) is None:
+                    self.dropped += 1
+                else:
+                    self.received += 1
+            except Exception as exc:  # keep listening; a bad press must not kill the thread
+                self.dropped += 1
+                self.last_error = repr(exc)
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.source.close()
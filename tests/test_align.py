@@ -0,0 +1,56 @@
+import pandas as pd
+
+from protocol_align import align, check_recorders, load_events, main
+from protocol_export import export_journal
+from protocol_registry import SessionRegistry
+
+
+def events(*rows):
+    return pd.DataFrame(rows, columns=["Session", "Seq", "Event", "Wall Clock"])
+
+
+def test_frame_and_sample_indexes():
+    recorders = check_recorders(pd.DataFrame([
+        {"session_id": "s1", "device": "gopro", "kind": "video", "start": "2025-01-06T09:00:00+00:00",
+         "rate": 59.94, "offset_ms": 0, "length_s": 60},
+        {"session_id": "s1", "device": "equivital", "kind": "samples", "start": "2025-01-06T09:00:01+00:00",
+         "rate": 256, "offset_ms": -500},
+    ]))
+    aligned = align(events(
+        ("s1", 1, "A", "2025-01-06T09:00:10.000000+00:00"),
+        ("s1", 2, "B", "2025-01-06T10:00:00.000000+01:00"),   # same instant in another offset: 09:00:00
+        ("s1", 3, "C", "2025-01-06T09:05:00.000000+00:00"),
+    ), recorders)
+    gopro = aligned[aligned["Device"] == "gopro"].set_index("Seq")
+    assert gopro.loc[1, "Index"] == 599 and gopro.loc[1, "Status"] == "ok"
+    assert gopro.loc[2, "Index"] == 0
+    assert pd.isna(gopro.loc[3, "Index"]) and gopro.loc[3, "Status"] == "after end"
+    equivital = aligned[aligned["Device"] == "equivital"].set_index("Seq")
+    assert equivital.loc[1, "Seconds"] == 8.5 and equivital.loc[1, "Index"] == 2176
+    assert equivital.loc[2, "Status"] == "before start"
+
+
+def test_sessions_come_from_the_export_not_its_file_name(tmp_path):
+    registry = SessionRegistry(str(tmp_path / "journals"))
+    ids = []
+    for participant in ("P1", "P2"):
+        session = registry.open("lab", participant)
+        session.log("Setup Complete")
+        session.log("Giladi Trial 1 START")
+        registry.finish(session)
+        ids.append(session.session_id)
+        # Every download is called session_logs.csv; each sits in its own folder
+        (tmp_path / participant).mkdir()
+        export_journal(session.journal.path, str(tmp_path / participant / "session_logs.csv"))
+    assert list(load_events(str(tmp_path / "P1" / "session_logs.csv"))["Session"].unique()) == [ids[0]]
+
+    start = pd.Timestamp.now(tz="UTC").floor("D").isoformat()
+    pd.DataFrame([{"session_id": sid, "device": "gopro", "start": start, "rate": 30} for sid in ids]) \
+        .to_csv(tmp_path / "recorders.csv", index=False)
+    out = tmp_path / "alignment"
+    # Journals and their exports together: each event is aligned once
+    assert main([str(tmp_path / "recorders.csv"), str(tmp_path / "journals"), str(tmp_path / "P1"),
+                 str(tmp_path / "P2"), "--out", str(out)]) == 0
+    for sid in ids:
+        sidecar = pd.read_csv(out / f"{sid}.align.csv")
+        assert sidecar["Seq"].tolist() == [1, 2]
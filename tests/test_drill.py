@@ -0,0 +1,25 @@
+from protocol_drill import DrillStore, make_attempt, trainee_path
+
+
+def attempt(n, skew=10.0):
+    return make_attempt("drill", "a", "b", {"id": n, "left_ms": 0.0, "right_ms": skew, "left_key": "a"})
+
+
+def test_similar_names_keep_separate_histories(tmp_path):
+    assert trainee_path("A. Smith", str(tmp_path)) != trainee_path("a smith", str(tmp_path))
+    store = DrillStore(str(tmp_path))
+    store.record("A. Smith", attempt(1))
+    store.record("a smith", attempt(2))
+    store.close()
+    store = DrillStore(str(tmp_path))
+    assert [a["attempt"] for a in store.history("A. Smith").attempts] == [1]
+    assert store.trainees() == ["A. Smith", "a smith"]
+
+
+def test_open_journals_are_bounded(tmp_path):
+    store = DrillStore(str(tmp_path), open_journals=2)
+    for n, trainee in enumerate(["t1", "t2", "t3", "t1"]):
+        store.record(trainee, attempt(n))
+    assert list(store._journals) == ["t3", "t1"]
+    store.close()
+    assert len(DrillStore(str(tmp_path)).history("t1").attempts) == 2
@@ -0,0 +1,64 @@
+import threading
+
+from protocol_export import ExportCache
+
+
+def event(seq):
+    return {"Seq": seq, "Event": f"E{seq}", "Time": "", "Notes": "",
+            "Wall Clock": "2026-01-01T12:00:00.000000+00:00", "Monotonic (ns)": seq}
+
+
+class AppendingLog(list):
+    # Another thread appends right after the cache has sliced the new rows
+    def __getitem__(self, index):
+        rows = super().__getitem__(index)
+        if isinstance(index, slice):
+            self.append(event(len(self) + 1))
+        return rows
+
+
+def test_update_is_incremental():
+    cache = ExportCache()
+    logs = [event(1), event(2)]
+    assert len(cache.update(logs)) == 2
+    logs.append(event(3))
+    frame = cache.update(logs)
+    assert frame["Seq"].tolist() == [1, 2, 3]
+    assert cache.update(logs) is frame
+
+
+def test_append_during_update_is_not_lost():
+    cache = ExportCache()
+    logs = AppendingLog([event(1)])
+    cache.update(logs)
+    assert cache.rows == len(cache.frame) == 1
+    cache.update(logs)
+    cache.update(logs)
+    assert cache.frame["Seq"].tolist() == list(range(1, cache.rows + 1))
+    assert len(logs) == cache.rows + 1
+
+
+def test_concurrent_appends():
+    cache = ExportCache()
+    logs = []
+    done = threading.Event()
+
+    def writer():
+        for seq in range(1, 5001):
+            logs.append(event(seq))
+        done.set()
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    while not done.is_set():
+        cache.update(logs)
+    thread.join()
+    frame = cache.update(logs)
+    assert cache.rows == len(logs) == len(frame) == 5000
+    assert frame["Seq"].tolist() == list(range(1, 5001))
+
+
+def test_new_list_rebuilds():
+    cache = ExportCache()
+    cache.update([event(1), event(2)])
+    assert cache.update([event(7)])["Seq"].tolist() == [7]
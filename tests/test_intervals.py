@@ -0,0 +1,49 @@
+from protocol_intervals import IntervalIndex
+
+
+def mark(seq, event, mono_ns, source="ui"):
+    return {"Seq": seq, "Event": event, "Time": f"t{seq}", "Monotonic (ns)": mono_ns, "Source": source}
+
+
+def test_pairs_start_and_end():
+    index = IntervalIndex([mark(1, "Giladi Trial 1 START", 0), mark(2, "Giladi Trial 1 END", 2_500_000_000)])
+    [row] = index.rows()
+    assert (row["Phase"], row["Trial"], row["Start Seq"], row["End Seq"]) == ("Giladi", 1, 1, 2)
+    assert (row["Duration (s)"], row["Status"]) == (2.5, "complete")
+    assert index.issues == []
+
+
+def test_flags_missing_and_doubled_marks():
+    index = IntervalIndex([mark(1, "Baseline Sitting END", 0),
+                           mark(2, "Giladi Trial 1 START", 1), mark(3, "Giladi Trial 1 START", 2),
+                           mark(4, "Giladi Trial 1 ABORTED", 3)])
+    assert [r["Status"] for r in index.rows()] == ["unmatched", "unmatched", "aborted"]
+    assert len(index.issues) == 2
+
+
+def test_triggers_and_other_events_are_ignored():
+    index = IntervalIndex([mark(1, "Trigger Shift + S", 0, "trigger"), mark(2, "Setup Complete", 1)])
+    assert index.rows() == [] and index.issues == []
+
+
+def test_interval_across_a_resume_keeps_its_duration():
+    # The machine rebooted 10 s of wall time after the START; monotonic restarted near zero
+    records = [
+        ("session", {"anchor_wall_ns": 1_000_000_000_000, "anchor_monotonic_ns": 500_000_000_000}),
+        ("event", mark(1, "Baseline Sitting START", 501_000_000_000)),
+        ("resume", {"anchor_wall_ns": 1_011_000_000_000, "anchor_monotonic_ns": 3_000_000_000}),
+        ("event", mark(2, "Baseline Sitting END", 8_000_000_000)),
+    ]
+    [row] = IntervalIndex.from_records(records).rows()
+    assert row["Duration (s)"] == 15.0
+
+
+def test_running_and_started_ns_on_the_current_base():
+    records = [
+        ("session", {"anchor_wall_ns": 1_000_000_000_000, "anchor_monotonic_ns": 500_000_000_000}),
+        ("event", mark(1, "Baseline Walking START", 501_000_000_000)),
+    ]
+    index = IntervalIndex.from_records(records)
+    index.anchor(1_011_000_000_000, 3_000_000_000)
+    assert index.started_ns("Baseline Walking") == -7_000_000_000
+    assert index.running(4_000_000_000) == [("Baseline Walking", 11.0)]
@@ -0,0 +1,44 @@
+import pytest
+
+from protocol_journal import Journal, JournalLocked, iter_records, read_journal, repair_tail
+from protocol_registry import SessionRegistry
+
+
+def test_second_writer_is_refused(tmp_path):
+    path = str(tmp_path / "s.jsonl")
+    journal = Journal(path)
+    with pytest.raises(JournalLocked):
+        Journal(path)
+    journal.close()
+    Journal(path).close()
+
+
+def test_repair_tail_cuts_a_torn_line(tmp_path):
+    path = tmp_path / "s.jsonl"
+    path.write_text('{"type": "event", "Seq": 1}\n{"type": "ev')
+    repair_tail(str(path))
+    assert path.read_text() == '{"type": "event", "Seq": 1}\n'
+    repair_tail(str(path))
+    assert path.read_text() == '{"type": "event", "Seq": 1}\n'
+
+
+def test_resume_after_a_crash_mid_append(tmp_path):
+    registry = SessionRegistry(str(tmp_path))
+    session = registry.open("lab", "P001")
+    session.log("Baseline Sitting START")
+    session.log("Note")
+    session.journal.close()  # the process dies here...
+    with open(session.journal.path, "a", encoding="utf-8") as fh:
+        fh.write('{"type": "event", "Seq": 3, "Ev')  # ...halfway through the next line
+
+    resumed = SessionRegistry(str(tmp_path)).open("lab", "P001")
+    assert resumed.session_id == session.session_id
+    assert [e["Seq"] for e in resumed.logs] == [1, 2]
+    assert resumed.intervals.started_ns("Baseline Sitting") is not None
+    resumed.log("Baseline Sitting END")
+
+    kinds = [kind for kind, _ in iter_records(resumed.journal.path)]
+    assert kinds == ["session", "event", "event", "resume", "event"]
+    _, events, finished = read_journal(resumed.journal.path)
+    assert [e["Seq"] for e in events] == [1, 2, 3] and not finished
+    assert resumed.intervals.rows()[0]["Status"] == "complete"
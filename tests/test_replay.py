@@ -0,0 +1,72 @@
+from datetime import timezone
+
+from protocol_clock import EventClock
+from protocol_journal import iter_records, read_journal
+from protocol_registry import SessionRegistry
+from protocol_replay import (SCRIPT_WALL_NS, VirtualClock, compare_events, load_script, replay,
+                             replay_journal)
+from protocol_spec import PROTOCOL_PATH, load_protocol
+from protocol_terminal import ProtocolRunner
+
+SCRIPT = "protocols/scripts/full_session.yaml"
+
+
+def registry_on(clock, directory):
+    return SessionRegistry(str(directory), new_clock=lambda: EventClock(clock.monotonic_ns, clock.wall_ns, timezone.utc))
+
+
+def test_script_replay_matches_its_journal_replay(tmp_path):
+    protocol = load_protocol(PROTOCOL_PATH)
+    recorded = replay(protocol, load_script(SCRIPT), str(tmp_path / "a"), session_id="full")
+    replayed = replay_journal(protocol, recorded.journal.path, str(tmp_path / "b"))
+    assert compare_events(read_journal(recorded.journal.path)[1], replayed.logs) == []
+
+
+def test_replay_across_a_restart(tmp_path):
+    # Sitting starts, the server restarts mid-countdown on a new monotonic
+    # base, and the restored timer ends the step after the restart
+    protocol = load_protocol(PROTOCOL_PATH)
+    clock = VirtualClock(7_000_000_000, SCRIPT_WALL_NS)
+    session = registry_on(clock, tmp_path / "journals").open("lab", "P001")
+    runner = ProtocolRunner(protocol, session)
+    clock.advance_to(clock.now + 2_000_000_000)
+    runner.goto("baseline", step_id="sitting")
+    runner.start_step(runner.step)
+    clock.advance_to(clock.now + 30_000_000_000)
+    runner.log("Note", "before the restart")
+    session.journal.close()
+
+    clock.restart(400_000_000, clock.wall_ns() + 45_000_000_000)
+    registry = registry_on(clock, tmp_path / "journals")
+    session = registry.resume(session.journal.path)
+    runner = ProtocolRunner(protocol, session)
+    clock.advance_to(clock.now + 5_000_000_000)
+    runner.log("Note", "after the restart")
+    clock.advance_to(clock.now + 10**12)
+    assert [t.end_event for t in runner.tick()] == ["Baseline Sitting END"]
+    registry.finish(session)
+
+    path = session.journal.path
+    replayed = replay_journal(protocol, path, str(tmp_path / "replays"))
+    assert compare_events(read_journal(path)[1], replayed.logs) == []
+    anchors = [(r["anchor_wall_ns"], r["anchor_monotonic_ns"])
+               for source in (path, replayed.journal.path)
+               for kind, r in iter_records(source) if kind == "resume"]
+    assert len(anchors) == 2 and anchors[0] == anchors[1]
+
+
+def test_unfinished_replays_stay_separate(tmp_path):
+    protocol = load_protocol(PROTOCOL_PATH)
+    actions = load_script(SCRIPT)[:3]
+    first = replay(protocol, actions, str(tmp_path), session_id="one", finish=False)
+    second = replay(protocol, actions, str(tmp_path), session_id="two", finish=False)
+    assert first.journal.path != second.journal.path
+    assert [kind for kind, _ in iter_records(first.journal.path)].count("resume") == 0
+
+
+def test_check_command(tmp_path, capsys):
+    from protocol_replay import main
+    out = str(tmp_path)
+    assert main([SCRIPT, "--out", out]) == 0
+    assert main([str(tmp_path / "full_session.jsonl"), "--out", out, "--check"]) == 0
+    assert "Replay matches the recording." in capsys.readouterr().out